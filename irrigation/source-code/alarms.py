@@ -25,7 +25,7 @@ the files keep failing before actual call to an AWS endpoint.
 
 Individual alarm files are augmented by dura_file functionality.
 
-NOTE: the identifier 'boto3' is overidden in the class alarms()
+NOTE: the boto3 session is created on first use; see alarms._session()
 
 Alarm files must follow a stict naming standard.  Specifically, the
 alarm's creation year must follow the second'_' in the name, the
@@ -50,57 +50,152 @@ beyond the maximum age threshold, at which point the file will be
 placed in a special directory that a different Python module will 
 access in order to upload the file to the AWS backend for future 
 forensic analysis.
+
+Alarms may also be waiting in the alarms comms_mailbox() (see 
+comms_mailbox.py) rather than in individual files.  Mailbox messages
+are named as the files would be and are handled the same way, except
+that the message's state in the mailbox is updated (i.e., 
+'acknowledged' or 'failed') instead of deleting / moving a file.
+Compacting the mailbox (see irr_cntrl.py) writes failed messages to
+the special directory for suspect files.
 """
 class alarms():
   import logging
-  import boto3
-  import boto3.session
-  import requests
-  from   requests_aws4auth import AWS4Auth
+  import time
   from   pathlib           import Path
   from   datetime          import datetime, timedelta
 
   import dura_file
   import lv_paths
+  import comms_mailbox
+
+  import lazy_import    #heavy SDKs are imported on first use
+  boto3    = lazy_import.lazy_import('boto3')
+  requests = lazy_import.lazy_import('requests')
+  AWS4Auth = lazy_import.lazy_import('requests_aws4auth', 'AWS4Auth')
 
 
   def __init__(self):
     """
-    NOTE: identifier 'boto3' overidden to refer to a boto3 session
+    NOTE: the boto3 session is created on first use; see _session()
     """
     self.logger = self.logging.getLogger(__name__)
 
     self.logger.info('entering: __init__()')
+    self.session = None      #boto3 session; see _session()
+    self.auth    = None      #API Gwy signer; see _auth()
+    self.auth_keys = None
+    self.http    = None      #requests session; see _http()
+    self.budget  = None      #shared time budget; see send()
     self.env          = 'debug'                   #set to 'deubg' or 'prod'
     self.max_age_days = 2  # upload files aged past threshold to S3
     self.df           = self.dura_file.dura_file()
     self.paths        = self.lv_paths.lv_paths()
+    self.mailbox      = self.comms_mailbox.comms_mailbox('alarms',
+                                                    paths=self.paths)
     
     if(self.env   == 'debug'):
       self.config = {'end_point' : 
         'https://abcdefghij.execute-api.us-east-1.amazonaws.com/prod',
                      'region' : 'us-east-1'}
-      #overide identifier 'boto3' (session using IAM credentials below)
-      try:
-        self.boto3 = self.boto3.Session(
-          aws_access_key_id     = '12345678901234567890', 
-          aws_secret_access_key = '123456789012345678901234567890123',
-          region_name           = self.config['region'])
-      except Exception as e:
-        self.logger.error(f'1 Could not create boto3 session.  Exception: {e}')
+      #session using IAM credentials below
+      self.session_args = {
+        'aws_access_key_id'     : '12345678901234567890',
+        'aws_secret_access_key' : '123456789012345678901234567890123',
+        'region_name'           : self.config['region']}
     else: 
       self.config = {'end_point' : 
         'https://abcdefghij.execute-api.us-east-1.amazonaws.com/prod',
                      'region' : 'us-east-1'}
-      #overide identifier 'boto3' (session using AWS CLI default profile)
-      try:
-        self.boto3 = self.boto3.session.Session()
-      except Exception as e:
-        self.logger.error(f'2 Cloud not create boto3 session. Exception: {e}')
+      #session using AWS CLI default profile
+      self.session_args = {}
 
     self._reset_status()
 
 
+  def _session(self):
+    """
+    The boto3 session, created on first use.  Creating it imports boto3
+    so it is not done in __init__(); most cron cycles never call AWS.
+
+    Returns:
+      None        boto3 session could not be created
+      session     boto3 session
+    """
+    self.logger.info('entering: _session()')
+
+    if(self.session == None):
+      if(self.session_args):
+        try:
+          self.session = self.boto3.Session(**self.session_args)
+        except Exception as e:
+          self.logger.error(f'1 Could not create boto3 session. ' +
+                            f'Exception: {e}')
+      else:
+        try:
+          self.session = self.boto3.session.Session()
+        except Exception as e:
+          self.logger.error(f'2 Cloud not create boto3 session. ' +
+                            f'Exception: {e}')
+    return(self.session)
+
+
+  def _auth(self):
+    """
+    The AWS SigV4 signer for API Gwy calls.  Kept between calls and
+    rebuilt only if the session's credentials change (e.g., a refreshed
+    CLI profile.)
+
+    Returns:
+      None        boto3 session or credentials unavailable
+      AWS4Auth    signer
+    """
+    self.logger.info('entering: _auth()')
+
+    session = self._session()
+    if(session):
+      credentials = session.get_credentials()
+      if(credentials):
+        keys = (credentials.access_key, credentials.secret_key)
+        if((self.auth == None) or (self.auth_keys != keys)):
+          self.auth      = self.AWS4Auth(credentials.access_key,
+                                         credentials.secret_key,
+                                         self.config['region'],
+                                         'execute-api')
+          self.auth_keys = keys
+    return(self.auth)
+
+
+  def _http(self):
+    """
+    The requests session used to invoke API Gwy endpoints.  Reused so
+    that a long lived object (see irr_cntrl.supervise()) keeps its
+    connection, and TLS session, to the endpoint open between calls.
+    """
+    self.logger.info('entering: _http()')
+
+    if(self.http == None):
+      self.http = self.requests.Session()
+    return(self.http)
+
+
+  def _proceed(self):
+    """
+    Returns:
+      True      go ahead with the next transmission
+      False     the shared time budget is spent (see send_budget.py)
+    """
+    return((self.budget == None) or self.budget.proceed('alarms'))
+
+
+  def _note(self, secs, num_bytes):
+    """
+    Account for a transmission against the shared time budget
+    """
+    if(self.budget):
+      self.budget.note('alarms', secs, num_bytes)
+
+
   def _alarm_file_aged_past_limit(self, file_name):
     """
     Args
@@ -149,6 +244,7 @@ class alarms():
     self.clean_bad  = []     # all files that couldnt be deleted
     self.move_good =  []     # all suspect files successfuly moved
     self.move_bad  =  []     # all suspect files that couldnt be moved
+    self.mb_names  =  []     # names of all mailbox messages handled
 
 
   def good_comms(self):
@@ -203,7 +299,7 @@ class alarms():
     if(path):
       if(path.exists() and path.is_file()):
         try:
-          with path.open('r') as fd:
+          with path.open('rb') as fd:
             contents = fd.read()
             if(self.df.check_object(json_object=contents)):
               result = True
@@ -278,29 +374,8 @@ class alarms():
         if(file_name):
           try:
             with path.open('r') as fd:
-              credentials = self.boto3.get_credentials()
-              auth        = self.AWS4Auth(credentials.access_key, 
-                                          credentials.secret_key,
-                                          self.config['region'], 
-                                          'execute-api')
-              endpoint    = self.config['end_point']
-              method      = 'GET'
-              headers     = {}
-              body        = fd.read()
-            
-              try:
-                response    = self.requests.request(method, endpoint, auth=auth, 
-                                                    data=body, headers=headers)
-                status_code = response.status_code
-                #print(f'99 response: {response.text}')   #handy for debugging
-                if(status_code == 200):
-                  result = True
-                else:
-                  result = False
-                  self.logger.error('9 API returned bad status code: ' +
-                                    f'{str(status_code)}')
-              except Exception as e:
-                self.logger.error(f'10 Error invoking API. Exception: {e}')
+              body = fd.read()
+            result = self._post_alarm(body)
           except Exception as e:
             self.logger.error(f'11 Couldnt open alarm file. Exception: {e}')
         else:
@@ -312,6 +387,89 @@ class alarms():
     return(result)
 
 
+  def _post_alarm(self, body):
+    """
+    Args:
+      body(str/bytes)     alarm in the dura_file format
+
+    Returns:
+      None                Error before invoking API Gwy endpoint
+      True                API Gwy endpoint successfully called
+      False               Error invoking API Gwy endpoint
+    """
+    self.logger.info('entering: _post_alarm()')
+
+    result      = None
+    auth        = self._auth()
+    endpoint    = self.config['end_point']
+    method      = 'GET'
+    headers     = {}
+
+    try:
+      if(not auth):
+        raise ValueError('no AWS credentials to sign the request')
+      started     = self.time.monotonic()
+      response    = self._http().request(method, endpoint, auth=auth,
+                                         data=body, headers=headers)
+      self._note(self.time.monotonic() - started,
+                 len(body.encode() if(type(body) == str) else body))
+      status_code = response.status_code
+      #print(f'99 response: {response.text}')   #handy for debugging
+      if(status_code == 200):
+        result = True
+      else:
+        result = False
+        self.logger.error('9 API returned bad status code: ' +
+                          f'{str(status_code)}')
+    except Exception as e:
+      self.logger.error(f'10 Error invoking API. Exception: {e}')
+    return(result)
+
+
+  def _send_mailbox_messages(self):
+    """
+    Send every pending alarm in the alarms mailbox (see comms_mailbox.py).
+    Mirrors send() for alarm files; a message's state is updated instead
+    of deleting / moving a file.  The API is called with the same bytes
+    an alarm file would hold.
+    """
+    self.logger.info('entering: _send_mailbox_messages()')
+
+    messages = self.mailbox.pending()
+    if(messages == None):
+      self.logger.error('25 Could not read the alarms mailbox')
+      return
+
+    states = {'acknowledged' : [], 'failed' : []}
+    for msg_id, name, data, record in messages:
+      if(not self._proceed()):
+        break
+      self.mb_names.append(name)
+      try:
+        result = self._post_alarm(record)
+      except Exception as e:
+        result = None
+        self.logger.error(f'26 Exception: {e}')
+      if(result):
+        self.trans_good.append(name)
+        self.clean_good.append(name)
+        states['acknowledged'].append(msg_id)
+      elif(result == False):
+        self.logger.error(f'27 Error invoking API Gwy using message: {name}')
+        self.trans_bad.append(name)
+        self.move_good.append(name)
+        states['failed'].append(msg_id)
+      elif(self._alarm_file_aged_past_limit(name)):
+        self.move_good.append(name)
+        states['failed'].append(msg_id)
+      #else (leave message, subsequent call to this mod will retry)
+
+    for state, ids in states.items():
+      if(self.mailbox.mark(ids, state) != True):
+        self.move_bad.append(state)
+        self.logger.error(f'28 Could not mark mailbox messages: {state}')
+
+
   def _clean_up_local_files(self):
     """
     Delete alarm files for which an API Gateway API call was made
@@ -322,6 +480,8 @@ class alarms():
     self.logger.info('entering: _clean_up_local_files()')
 
     for file_name in self.trans_good:
+      if(file_name in self.mb_names):     #mailbox message; no file
+        continue
       file_path = (self.paths.get_path('alarms') + 
                    self.paths.divider + file_name)
       try:
@@ -334,6 +494,8 @@ class alarms():
                           f'Exception: {e}')
 
     for file_name in self.trans_bad:
+      if(file_name in self.mb_names):     #mailbox message; no file
+        continue
       file_path = (self.paths.get_path('alarms') + 
                    self.paths.divider + file_name)
       try:
@@ -349,7 +511,7 @@ class alarms():
                           f'Exception : {e}')
 
 
-  def send(self):
+  def send(self, budget=None):
     """
     Attempt to send all alarm flat files, in special directory, to the 
     AWS backend.  Alarms across all alarm types are housed in this
@@ -357,6 +519,11 @@ class alarms():
     Alarm files are named using a standard that encodes the alarm name,
     date, irrigation schedule id, and irrigation event sequence number.
 
+    Args:
+      budget(send_budget)  time budget shared with other senders; alarms
+                             not sent before it is spent are left for
+                             the next call
+
     Returns:
       None          issue arose before attempt to send alarm data 
                       or no alarm files needed to be sent
@@ -366,13 +533,16 @@ class alarms():
     self.logger.info('entering: send()')
 
     self._reset_status()
+    self.budget = budget
     path = self.paths.get_path('alarms')
     if(path):
       try:
         directory = self.Path(path)
         if(directory.exists() and directory.is_dir()):
-          for file in directory.iterdir():
-            file_name = file.name
+          for file_name in self.paths.files(path):
+            if(not self._proceed()):
+              break
+            file = self.Path(path, file_name)
             if(self._file_valid(file)):
               result = self._call_alarm_api(file)
               if(result):
@@ -404,6 +574,7 @@ class alarms():
                 self.move_bad.append(file_name)
                 self.logger.error('21 Could not move corrupt file: ' +
                                   f'{file_name}.')
+          self._send_mailbox_messages()
           self._clean_up_local_files()
         else:
           self.logger.error('22 Nonexistant directory path supplied for ' +
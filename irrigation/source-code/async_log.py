@@ -0,0 +1,236 @@
+"""
+Jaye Hicks 2021
+
+Obligatory legal disclaimer:
+  You are free to use this source code (this file and all other files
+  referenced in this file) "AS IS" WITHOUT WARRANTY OF ANY KIND, EITHER
+  EXPRESSED OR IMPLIED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+  THE ENTIRE RISK AS TO THE QUALITY AND PERFORMANCE OF THIS SOURCE CODE
+  IS WITH YOU.  SHOULD THE SOURCE CODE PROVE DEFECTIVE, YOU ASSUME THE
+  COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU
+  GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
+
+An object of type async_log() is the single handler on the root logger
+of an OS process executing irr_cntrl.py.  It keeps writes to the system
+log file (i.e., on the PI 4's SD card) off of the threads doing the
+real work, in particular the GPIO callback thread that receives water
+flow sensor pulses.
+
+  - INFO and above: the record is put on a queue and the calling thread
+    moves on.  A background writer thread formats queued records and
+    writes them to the system log file, flushing once per burst of
+    records rather than once per record.
+  - DEBUG: the record is kept in an in-memory ring holding the most
+    recent 'ring_size' DEBUG records; nothing is written.  When an ERROR
+    (or worse) is logged the ring is flushed to the file ahead of the
+    error so the detail leading up to it is not lost.
+
+INFO records go straight to the queue while DEBUG records wait in the
+ring, so flushed DEBUG records land in the file after INFO records
+logged later than they were.  A flushed ring is therefore framed by a
+'begin DEBUG ring dump' and an 'end DEBUG ring dump' line; the time
+stamps of the records between them, oldest first, place them in time.
+
+Code on hot paths (e.g., once per flow sensor pulse, once per flow
+check) logs 'entering: ...' at DEBUG.  By default (i.e., 'ring_size'
+of 500, as irr_cntrl.py uses) the root logger is set to DEBUG, so such
+a call builds a record and appends it to the ring; no formatting or
+file I/O happens.  With 'ring_size' of 0 the root logger is set to the
+file's level and, as logging caches whether DEBUG is enabled per
+logger, such calls are skipped for the cost of a dict lookup.  Chatty
+third party loggers (e.g., botocore) are held at INFO so they don't
+crowd the ring.
+
+Records still on the queue when the OS process exits normally are
+written by stop(), which is registered with atexit.  A process taken
+down hard (i.e., kill -9) loses any records not yet written.
+
+Usage:
+  >>> import async_log
+  >>> log = async_log.async_log()
+  >>> log.start('/home/pi/lonesome/sys_logs/2021_08_21_23_05_irr_cntrl.log')
+  >>> ...
+  >>> log.dump_ring()                       #optional; write DEBUG ring
+  >>> log.stop()                            #optional; runs at exit
+"""
+import logging
+
+
+class async_log(logging.Handler):
+  import atexit
+  import queue
+  import threading
+  from   collections import deque
+
+
+  def __init__(self, ring_size=500):
+    """
+    Args:
+      ring_size(int)    number of recent DEBUG records held in memory; 0
+                          disables DEBUG altogether
+    """
+    super().__init__(level=logging.DEBUG)
+    self.logger = logging.getLogger(__name__)
+
+    self.ring_size   = max(int(ring_size), 0)
+    self.ring        = self.deque(maxlen=max(self.ring_size, 1))
+    self.records     = self.queue.SimpleQueue()
+    self.writer      = None
+    self.file_level  = logging.INFO
+    self.stream      = None
+    self.buffer_size = 64 * 1024      #bytes; file writes happen per burst
+    self.quiet_loggers = ['boto3', 'botocore', 'urllib3', 's3transfer',
+                          'AWSIoTPythonSDK']
+
+
+  def start(self, file_name, level=logging.INFO,
+            log_format='%(asctime)s %(name)s %(levelname)s:%(message)s'):
+    """
+    Open the system log file, start the writer thread, and make this the
+    root logger's only handler.
+
+    Args:
+      file_name(str)    full path of the system log file
+      level(int)        lowest level written to the file
+      log_format(str)   logging format string for the file
+
+    Returns:
+      True              logging started
+      False             log file could not be opened
+    """
+    result = False
+    try:
+      self.stream = open(file_name, 'a', buffering=self.buffer_size)
+      self.setFormatter(logging.Formatter(log_format))
+      self.file_level = level
+      self.writer = self.threading.Thread(target=self._write_records,
+                                          name='async_log', daemon=True)
+      self.writer.start()
+
+      root = logging.getLogger()
+      for handler in list(root.handlers):
+        root.removeHandler(handler)
+      root.addHandler(self)
+      if(self.ring_size):
+        root.setLevel(min(logging.DEBUG, level))
+        for name in self.quiet_loggers:
+          logging.getLogger(name).setLevel(max(logging.INFO, level))
+      else:
+        root.setLevel(level)
+      self.atexit.register(self.stop)
+      result = True
+    except Exception as e:
+      print(f'async_log start() exception: {e}')
+    return(result)
+
+
+  def _prepare(self, record):
+    """
+    Fix the message text while still on the calling thread; later
+    changes to arguments (or a traceback going out of scope) must not
+    alter what gets written.
+    """
+    record.msg  = record.getMessage()
+    record.args = None
+    if(record.exc_info):
+      record.exc_text = self.formatter.formatException(record.exc_info)
+      record.exc_info = None
+    return(record)
+
+
+  def emit(self, record):
+    """
+    Called, by the logging module, on the thread that logged the record.
+    Must be quick; no formatting or file I/O happens here.
+    """
+    try:
+      if(record.levelno < self.file_level):
+        if(self.ring_size):
+          self.ring.append(record)
+        return
+      if(record.levelno >= logging.ERROR):
+        self._flush_ring()
+      self.records.put(self._prepare(record))
+    except Exception:
+      self.handleError(record)
+
+
+  def _write_records(self):
+    """
+    Runs in the writer thread.  Write each burst of queued records then
+    flush the file once.  A None on the queue ends the thread.
+    """
+    running = True
+    while(running):
+      record = self.records.get()
+      while(record != None):
+        try:
+          self.stream.write(self.format(record) + '\n')
+        except Exception:
+          self.handleError(record)
+        try:
+          record = self.records.get_nowait()
+        except self.queue.Empty:
+          break
+      if(record == None):
+        running = False
+      try:
+        self.stream.flush()
+      except Exception as e:
+        print(f'async_log flush() exception: {e}')
+
+
+  def _ring_marker(self, text):
+    """
+    Returns:
+      LogRecord      a line framing a flushed ring (see module doc string)
+    """
+    return(logging.makeLogRecord({'name'      : __name__,
+                                  'levelno'   : logging.INFO,
+                                  'levelname' : 'INFO',
+                                  'msg'       : text}))
+
+
+  def _flush_ring(self):
+    """
+    Queue the DEBUG ring, oldest first, between a begin and an end
+    marker line.
+    """
+    records = []
+    while(self.ring):
+      try:
+        records.append(self.ring.popleft())
+      except IndexError:
+        break
+    if(records):
+      self.records.put(self._ring_marker(
+        f'begin DEBUG ring dump; {len(records)} records, oldest first'))
+      for record in records:
+        self.records.put(self._prepare(record))
+      self.records.put(self._ring_marker('end DEBUG ring dump'))
+
+
+  def dump_ring(self):
+    """
+    Push the DEBUG ring to the file without waiting for an error (e.g.,
+    when investigating a problem that doesnt log one.)
+    """
+    self._flush_ring()
+
+
+  def stop(self):
+    """
+    Write every queued record, stop the writer thread, and close the
+    system log file.  Safe to call more than once.
+    """
+    if(self.writer):
+      writer      = self.writer
+      self.writer = None
+      self.records.put(None)
+      writer.join(10)
+      logging.getLogger().removeHandler(self)
+      try:
+        self.stream.close()
+      except Exception as e:
+        print(f'async_log stop() exception: {e}')
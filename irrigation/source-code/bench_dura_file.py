@@ -0,0 +1,339 @@
+"""
+Jaye Hicks 2021
+
+Obligatory legal disclaimer:
+  You are free to use this source code (this file and all other files
+  referenced in this file) "AS IS" WITHOUT WARRANTY OF ANY KIND, EITHER
+  EXPRESSED OR IMPLIED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+  THE ENTIRE RISK AS TO THE QUALITY AND PERFORMANCE OF THIS SOURCE CODE
+  IS WITH YOU.  SHOULD THE SOURCE CODE PROVE DEFECTIVE, YOU ASSUME THE
+  COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU
+  GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
+
+Benchmark dura_file, which sits on the path of every checkpoint,
+schedule read, and message send.  Each operation is timed for each
+payload, from a tiny alarm up to a multi-hour pulse count file, in both
+file formats (JSON text and binary container) and on each target
+directory: tmpfs (i.e., /dev/shm; no storage cost) and a directory on
+real storage (e.g., the PI 4's SD card) so the cost of fsync and rename
+can be told apart from the cost of hashing and JSON.
+
+  operation      dura_file call
+  write          write_data()
+  read           read_data()
+  validate       file_valid()
+  check_object   check_object() on the file's bytes
+  read_valid     read_valid() served from the validated content cache
+
+For each operation the following is reported:
+
+  - latency percentiles (p50, p90, p99, max) in usecs
+  - throughput in operations and MB per second
+  - peak bytes allocated by one call (a second pass run under
+    tracemalloc so as not to skew the timings)
+
+Results can be saved as a baseline and later runs compared against it.
+An operation whose p50 latency or peak allocation grew by more than
+'tolerance' (and by more than a small absolute amount, to ride out
+timer noise) is a regression; every regression is listed and the
+script exits with status 1.  Baselines are only comparable on the same
+hardware.
+
+Usage:
+  python bench_dura_file.py --save-baseline dura_file_baseline.json
+  python bench_dura_file.py --baseline dura_file_baseline.json
+  python bench_dura_file.py --payloads alarm,pulse_12h --formats json
+"""
+import                 argparse
+import                 json
+import                 logging
+import                 os
+import                 shutil
+import                 sys
+import                 tempfile
+import                 time
+import                 tracemalloc
+from   array    import array
+
+import dura_file
+
+
+OPERATIONS = ['write', 'read', 'validate', 'check_object', 'read_valid']
+
+
+def _percentile(sorted_values, percent):
+  """
+  Args:
+    sorted_values(array)  values sorted in ascending order
+    percent(float)        0 - 100
+
+  Returns:
+    value at the percentile (nearest rank); 0 if no values
+  """
+  if(not len(sorted_values)):
+    return(0)
+  rank = max(int(round(percent / 100 * len(sorted_values))) - 1, 0)
+  return(sorted_values[min(rank, len(sorted_values) - 1)])
+
+
+def _pulse_count(hours, points=False):
+  """
+  Build a pulse count data structure (see irr_event.py) for an
+  irrigation event of 'hours' at 15 gallons per minute.
+
+  Args:
+    hours(int)      length of the irrigation event
+    points(bool)    True for files written before per-minute buckets
+                      (i.e., one cumulative data point per pulse)
+  """
+  start = 1635696000
+  if(points):
+    pulses = [{str(start + (count * 4)) : count + 1}
+              for count in range(hours * 60 * 15)]
+  else:
+    pulses = [[start + (minute * 60), 15] for minute in range(hours * 60)]
+  data = {'whatami'  : 'pulse_count',
+          'sched_id' : 99,
+          'date'     : '2021-10-31',
+          'day'      : 'sun',
+          'sequence' : 1,
+          'block'    : 'a',
+          'pulses'   : [{'1234' : pulses}]}
+  if(not points):
+    data['format'] = 'buckets'
+  return(data)
+
+
+def _payloads():
+  """
+  Returns:
+    {}        payload name -> data written to the file
+  """
+  logging.info('entering: _payloads()')
+
+  event = {'start' : '06:00', 'duration' : '02:00', 'exp_flow' : 15,
+           'under_flow_tol' : 25, 'over_flow_tol' : 25, 'block' : 'a'}
+  schedule = {'whatami' : 'irrigation-schedule-fixed', 'id' : 99}
+  for day in ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']:
+    schedule[day] = {'events' : [dict(event, sequence=number + 1,
+                                      block='abcdefg'[number])
+                                 for number in range(7)]}
+
+  return({'alarm'           : {'whatami'  : 'underflow-alarm',
+                               'date'     : '2021-10-31',
+                               'sched_id' : 99,
+                               'sequence' : 1,
+                               'block'    : 'a',
+                               'percent'  : 40},
+          'gals_disp'       : {'whatami'  : 'gallons-dispensed',
+                               'date'     : '2021-10-31',
+                               'sched_id' : 99,
+                               'sequence' : 1,
+                               'block'    : 'block_a',
+                               'gallons'  : 1800,
+                               'flow'     : 15},
+          'schedule'        : schedule,
+          'pulse_4h'        : _pulse_count(4),
+          'pulse_12h'       : _pulse_count(12),
+          'pulse_4h_points' : _pulse_count(4, points=True)})
+
+
+def _operations(df, file_path, data):
+  """
+  Returns:
+    {}        operation name -> function making one dura_file call
+  """
+  df.write_data(file_path, data)
+  with open(file_path, 'rb') as fd:
+    contents = fd.read()
+  df.read_valid(file_path)               #warm the cache for 'read_valid'
+  return({'write'        : lambda: df.write_data(file_path, data),
+          'read'         : lambda: df.read_data(file_path),
+          'validate'     : lambda: df.file_valid(file_path),
+          'check_object' : lambda: df.check_object(json_object=contents),
+          'read_valid'   : lambda: df.read_valid(file_path)})
+
+
+def _time_operation(function, args):
+  """
+  Call 'function' repeatedly for about 'args.secs' seconds (within
+  'args.min_iterations' and 'args.max_iterations' calls)
+
+  Returns:
+    array       latency of every call in nsecs
+  """
+  latencies = array('q')
+  deadline  = time.perf_counter() + args.secs
+  while((len(latencies) < args.max_iterations) and
+        ((len(latencies) < args.min_iterations) or
+         (time.perf_counter() < deadline))):
+    start = time.perf_counter_ns()
+    function()
+    latencies.append(time.perf_counter_ns() - start)
+  return(latencies)
+
+
+def _peak_allocation(function, repeats=5):
+  """
+  Returns:
+    int         median, over 'repeats' calls, of the peak bytes
+                  allocated during one call
+  """
+  peaks = []
+  for count in range(repeats):
+    tracemalloc.start()     #a fresh peak; reset_peak() is Python 3.9+
+    try:
+      base = tracemalloc.get_traced_memory()[0]
+      function()
+      peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+      tracemalloc.stop()
+  return(sorted(peaks)[len(peaks) // 2])
+
+
+def _bench_target(target, directory, args):
+  """
+  Benchmark every format / payload / operation in one directory.
+
+  Returns:
+    {}          '<target>/<format>/<payload>/<operation>' -> results
+  """
+  logging.info('entering: _bench_target()')
+
+  results  = {}
+  root_dir = tempfile.mkdtemp(prefix='bench_dura_file_', dir=directory)
+  try:
+    payloads = _payloads()
+    for file_format in args.formats:
+      df = dura_file.dura_file(binary=(file_format == 'binary'))
+      for payload in args.payloads:
+        file_path  = os.path.join(root_dir, f'{payload}.{file_format}')
+        operations = _operations(df, file_path, payloads[payload])
+        file_bytes = os.path.getsize(file_path)
+        for operation in args.operations:
+          ordered = array('q', sorted(_time_operation(operations[operation],
+                                                      args)))
+          mean    = sum(ordered) / len(ordered)
+          results[f'{target}/{file_format}/{payload}/{operation}'] = {
+            'file_bytes'  : file_bytes,
+            'iterations'  : len(ordered),
+            'p50_usecs'   : round(_percentile(ordered, 50) / 1000, 2),
+            'p90_usecs'   : round(_percentile(ordered, 90) / 1000, 2),
+            'p99_usecs'   : round(_percentile(ordered, 99) / 1000, 2),
+            'max_usecs'   : round(ordered[-1] / 1000, 2),
+            'ops_per_sec' : round(1e9 / mean, 1),
+            'mb_per_sec'  : round(file_bytes * 1e3 / mean, 2),
+            'alloc_peak_bytes' : _peak_allocation(operations[operation])}
+  finally:
+    shutil.rmtree(root_dir, ignore_errors=True)
+  return(results)
+
+
+def _compare(results, baseline, args):
+  """
+  Compare results against a saved baseline.
+
+  Returns:
+    []          one line of text per regression
+  """
+  logging.info('entering: _compare()')
+
+  regressions = []
+  limit = 1 + args.tolerance
+  for key, result in results.items():
+    base = baseline.get(key)
+    if(not base):
+      continue
+    if((result['p50_usecs'] > base['p50_usecs'] * limit) and
+       (result['p50_usecs'] - base['p50_usecs'] > args.noise_usecs)):
+      regressions.append(f'{key}: p50 {base["p50_usecs"]} -> ' +
+                         f'{result["p50_usecs"]} usecs')
+    if((result['alloc_peak_bytes'] > base['alloc_peak_bytes'] * limit) and
+       (result['alloc_peak_bytes'] - base['alloc_peak_bytes'] >
+        args.noise_bytes)):
+      regressions.append(f'{key}: peak allocation ' +
+                         f'{base["alloc_peak_bytes"]} -> ' +
+                         f'{result["alloc_peak_bytes"]} bytes')
+  return(regressions)
+
+
+def _targets(args):
+  """
+  Returns:
+    [()]        (target name, directory) for every usable target
+  """
+  targets = []
+  if(args.tmpfs_dir and os.path.isdir(args.tmpfs_dir)):
+    targets.append(('tmpfs', args.tmpfs_dir))
+  elif(args.tmpfs_dir):
+    print(f'tmpfs directory: {args.tmpfs_dir} not found; skipped',
+          file=sys.stderr)
+  if(args.disk_dir):
+    targets.append(('disk', args.disk_dir))
+  return(targets)
+
+
+def main():
+  parser = argparse.ArgumentParser(description='dura_file benchmark')
+  parser.add_argument('--tmpfs-dir', default='/dev/shm')
+  parser.add_argument('--disk-dir', default='.',
+                      help='directory on real storage (e.g., SD card)')
+  parser.add_argument('--payloads',
+                      default='alarm,gals_disp,schedule,pulse_4h,pulse_12h,' +
+                              'pulse_4h_points')
+  parser.add_argument('--formats', default='json,binary')
+  parser.add_argument('--operations', default=','.join(OPERATIONS))
+  parser.add_argument('--secs', type=float, default=0.5,
+                      help='time spent on each operation')
+  parser.add_argument('--min-iterations', type=int, default=5)
+  parser.add_argument('--max-iterations', type=int, default=2000)
+  parser.add_argument('--baseline', default=None,
+                      help='compare against this saved baseline')
+  parser.add_argument('--save-baseline', default=None,
+                      help='save results as a baseline to this file')
+  parser.add_argument('--tolerance', type=float, default=0.25,
+                      help='allowed growth over the baseline (0.25 = 25%%)')
+  parser.add_argument('--noise-usecs', type=float, default=5)
+  parser.add_argument('--noise-bytes', type=int, default=1024)
+  parser.add_argument('--json', default=None,
+                      help='also write results to this file')
+  args = parser.parse_args()
+  args.payloads   = args.payloads.split(',')
+  args.formats    = args.formats.split(',')
+  args.operations = args.operations.split(',')
+
+  logging.basicConfig(level=logging.ERROR)
+  results = {}
+  for target, directory in _targets(args):
+    results.update(_bench_target(target, directory, args))
+
+  for key, result in results.items():
+    print(f'{key:<44} p50 {result["p50_usecs"]:>10} us  ' +
+          f'p99 {result["p99_usecs"]:>10} us  ' +
+          f'{result["mb_per_sec"]:>9} MB/s  ' +
+          f'peak {result["alloc_peak_bytes"]:>9} B')
+  if(args.json):
+    with open(args.json, 'w') as fd:
+      json.dump(results, fd, indent=2)
+  if(args.save_baseline):
+    with open(args.save_baseline, 'w') as fd:
+      json.dump(results, fd, indent=2)
+    print(f'baseline saved: {args.save_baseline}')
+
+  if(args.baseline):
+    with open(args.baseline, 'r') as fd:
+      baseline = json.load(fd)
+    regressions = _compare(results, baseline, args)
+    if(regressions):
+      print(f'\nREGRESSION: {len(regressions)} operation(s) slower or ' +
+            f'allocating more than the baseline (tolerance ' +
+            f'{args.tolerance:.0%})', file=sys.stderr)
+      for regression in regressions:
+        print(f'  {regression}', file=sys.stderr)
+      sys.exit(1)
+    print(f'no regressions against baseline: {args.baseline}')
+
+
+if __name__ == '__main__':
+  main()
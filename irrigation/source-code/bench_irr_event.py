@@ -0,0 +1,235 @@
+"""
+Jaye Hicks 2021
+
+Obligatory legal disclaimer:
+  You are free to use this source code (this file and all other files
+  referenced in this file) "AS IS" WITHOUT WARRANTY OF ANY KIND, EITHER
+  EXPRESSED OR IMPLIED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+  THE ENTIRE RISK AS TO THE QUALITY AND PERFORMANCE OF THIS SOURCE CODE
+  IS WITH YOU.  SHOULD THE SOURCE CODE PROVE DEFECTIVE, YOU ASSUME THE
+  COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU
+  GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
+
+Benchmark the pulse handling hot path of irr_event off of the PI 4.
+An irr_event() object is driven by a gpio_sim() object that injects
+flow sensor pulses, following a flow pattern, across a multi-hour
+simulated irrigation event.  All files are written beneath a temporary
+directory; the lonesome directory tree is not touched.
+
+Every 'check_secs' simulated seconds the flow rate check is run and
+every 'checkpoint_secs' simulated seconds the pulse count data is
+checkpointed, mirroring irr_event._manage_irr_event().  The following
+is reported:
+
+  - pulse callback latency percentiles (p50, p90, p99, max) in usecs
+  - CPU time per pulse in usecs (excludes checks and checkpoints)
+  - memory growth in bytes (total and per pulse; second pass run
+    under tracemalloc so as not to skew the timings).  Growth is
+    attributed to this code base; growth of the whole process, which
+    includes one time stdlib caches, is reported separately
+  - checkpoint cost (count, mean / max msecs) and checkpoint file size
+  - valve pin writes (HIGH opens, LOW closes) recorded by the simulator
+    and any valve left open after the event is stopped
+
+Usage:
+  python bench_irr_event.py --hours 4 --gpm 15 --pattern bursty
+  python bench_irr_event.py --checkpoint file --json results.json
+"""
+import                 argparse
+import                 json
+import                 logging
+import                 os
+import                 shutil
+import                 tempfile
+import                 time
+import                 tracemalloc
+from   array    import array
+
+import gpio_sim
+import irr_event
+
+
+def _percentile(sorted_values, percent):
+  """
+  Args:
+    sorted_values(array)  values sorted in ascending order
+    percent(float)        0 - 100
+
+  Returns:
+    value at the percentile (nearest rank); 0 if no values
+  """
+  if(not len(sorted_values)):
+    return(0)
+  rank = max(int(round(percent / 100 * len(sorted_values))) - 1, 0)
+  return(sorted_values[min(rank, len(sorted_values) - 1)])
+
+
+def _build_irr_event(root_dir, sim, args):
+  """
+  Create an irr_event() object whose files live beneath 'root_dir' and
+  whose GPIO and clock are supplied by 'sim'.  The event is started but
+  _manage_irr_event() is skipped; the benchmark drives it instead.
+  """
+  logging.info('entering: _build_irr_event()')
+
+  an_irr_ev = irr_event.irr_event(gpio=sim)
+  an_irr_ev.clock = sim.clock
+  an_irr_ev.paths.prefix = root_dir
+  for dir_name in an_irr_ev.paths.unix_dirs:
+    path = an_irr_ev.paths.get_path(dir_name)
+    if(path):
+      os.makedirs(path, exist_ok=True)
+  an_irr_ev.channel.socket_path = (an_irr_ev.paths.get_path('irr_event') +
+                                   an_irr_ev.paths.divider +
+                                   an_irr_ev.channel.socket_name)
+
+  an_irr_ev.config['pulse_journal'] = (args.checkpoint == 'journal')
+  an_irr_ev._manage_irr_event = lambda: None
+  sim_date = time.strftime('%Y-%m-%d', time.localtime(sim.clock()))
+  an_irr_ev.start_irr_ev({'start'          : '00:00',
+                          'duration'       : f'{int(args.hours):02d}:00',
+                          'exp_flow'       : int(args.gpm),
+                          'under_flow_tol' : 50,
+                          'over_flow_tol'  : 50,
+                          'sched_id'       : 1,
+                          'sequence'       : 1,
+                          'block'          : args.block,
+                          'date'           : sim_date,
+                          'day'            : 'mon'})
+  return(an_irr_ev)
+
+
+def _simulate(args, measure_memory=False):
+  """
+  Run one simulated irrigation event.
+
+  Returns:
+    {}          measurements taken during the run
+  """
+  logging.info('entering: _simulate()')
+
+  root_dir  = tempfile.mkdtemp(prefix='bench_irr_event_')
+  results   = {}
+  try:
+    sim       = gpio_sim.gpio_sim(start=1635696000)
+    an_irr_ev = _build_irr_event(root_dir, sim, args)
+    pin       = an_irr_ev.config['flow_sensor']
+    callback  = sim.callbacks[pin]
+    latencies = array('q')
+    checkpoints = array('d')
+    tick_cpu  = [0.0]
+    since_checkpoint = [0]
+
+    def timed_callback(channel):
+      start = time.perf_counter_ns()
+      callback(channel)
+      latencies.append(time.perf_counter_ns() - start)
+
+    def on_tick(now):
+      cpu_start = time.process_time()
+      an_irr_ev._check_flow_rate()
+      since_checkpoint[0] += args.check_secs
+      if(since_checkpoint[0] >= args.checkpoint_secs):
+        since_checkpoint[0] = 0
+        start = time.perf_counter()
+        an_irr_ev._write_pulse_count_file()
+        checkpoints.append(time.perf_counter() - start)
+      tick_cpu[0] += time.process_time() - cpu_start
+
+    if(not measure_memory):
+      sim.callbacks[pin] = timed_callback
+    else:
+      tracemalloc.start()
+      mem_start  = tracemalloc.get_traced_memory()[0]
+      snap_start = tracemalloc.take_snapshot()
+
+    cpu_start = time.process_time()
+    pulses = sim.run(pattern=args.pattern, gpm=args.gpm,
+                     secs=int(args.hours * 3600), pin=pin,
+                     on_tick=on_tick, tick_secs=args.check_secs)
+    cpu_secs = time.process_time() - cpu_start - tick_cpu[0]
+
+    if(measure_memory):
+      mem_end, mem_peak = tracemalloc.get_traced_memory()
+      snap_end = tracemalloc.take_snapshot()
+      tracemalloc.stop()
+
+      #growth attributed to this code base; excludes one time stdlib caches
+      source_dir = os.path.dirname(os.path.abspath(__file__))
+      only_ours  = [tracemalloc.Filter(True, source_dir + os.sep + '*')]
+      ours = sum(stat.size_diff for stat in
+                 snap_end.filter_traces(only_ours).compare_to(
+                   snap_start.filter_traces(only_ours), 'filename'))
+      results['memory_growth_bytes']     = ours
+      results['memory_bytes_per_pulse']  = round(ours / max(pulses, 1), 2)
+      results['memory_growth_bytes_all'] = mem_end - mem_start
+      results['memory_peak_bytes_all']   = mem_peak - mem_start
+    else:
+      ordered = array('q', sorted(latencies))
+      results['pulses'] = pulses
+      results['latency_usecs'] = {
+        'p50' : round(_percentile(ordered, 50) / 1000, 2),
+        'p90' : round(_percentile(ordered, 90) / 1000, 2),
+        'p99' : round(_percentile(ordered, 99) / 1000, 2),
+        'max' : round((ordered[-1] if(len(ordered)) else 0) / 1000, 2)}
+      results['cpu_usecs_per_pulse'] = round(cpu_secs * 1e6 / max(pulses, 1), 2)
+      results['checkpoints'] = {
+        'count'      : len(checkpoints),
+        'mean_msecs' : round(sum(checkpoints) * 1000 /
+                             max(len(checkpoints), 1), 3),
+        'max_msecs'  : round(max(checkpoints, default=0) * 1000, 3)}
+      if(args.checkpoint == 'journal'):
+        file_path = an_irr_ev.config['journal_file_path']
+      else:
+        file_path = an_irr_ev.config['pulse_file_path']
+      if(os.path.isfile(file_path)):
+        results['checkpoints']['file_bytes'] = os.path.getsize(file_path)
+      an_irr_ev.all_pulse_data = an_irr_ev.ledger.to_pulse_data()
+      results['gals_disp'] = an_irr_ev._calculate_total_gals_disp()
+      results['av_flow']   = an_irr_ev._calculate_average_flow_rate()
+
+    an_irr_ev._stop_irr_event()
+    if(not measure_memory):
+      results['valve_calls'] = {
+        'high_writes' : sum(1 for entry in sim.valve_log
+                              if(entry[2] == sim.HIGH)),
+        'low_writes'  : sum(1 for entry in sim.valve_log
+                              if(entry[2] == sim.LOW)),
+        'open_after_stop' : sim.open_pins()}
+  finally:
+    shutil.rmtree(root_dir, ignore_errors=True)
+  return(results)
+
+
+def main():
+  parser = argparse.ArgumentParser(description='irr_event pulse benchmark')
+  parser.add_argument('--hours', type=float, default=4)
+  parser.add_argument('--gpm', type=float, default=15)
+  parser.add_argument('--pattern', default='steady',
+                      choices=['steady', 'ramp', 'bursty', 'dropout'])
+  parser.add_argument('--block', default='a')
+  parser.add_argument('--checkpoint', default='journal',
+                      choices=['journal', 'file'])
+  parser.add_argument('--checkpoint-secs', type=int, default=300)
+  parser.add_argument('--check-secs', type=int, default=10)
+  parser.add_argument('--json', default=None,
+                      help='also write results to this file')
+  args = parser.parse_args()
+
+  logging.basicConfig(level=logging.ERROR)
+  results = {'hours'      : args.hours,
+             'gpm'        : args.gpm,
+             'pattern'    : args.pattern,
+             'checkpoint' : args.checkpoint}
+  results.update(_simulate(args))
+  results.update(_simulate(args, measure_memory=True))
+
+  print(json.dumps(results, indent=2))
+  if(args.json):
+    with open(args.json, 'w') as fd:
+      json.dump(results, fd, indent=2)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,194 @@
+"""
+Jaye Hicks 2021
+
+Obligatory legal disclaimer:
+  You are free to use this source code (this file and all other files
+  referenced in this file) "AS IS" WITHOUT WARRANTY OF ANY KIND, EITHER
+  EXPRESSED OR IMPLIED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+  THE ENTIRE RISK AS TO THE QUALITY AND PERFORMANCE OF THIS SOURCE CODE
+  IS WITH YOU.  SHOULD THE SOURCE CODE PROVE DEFECTIVE, YOU ASSUME THE
+  COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU
+  GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
+
+Benchmark the start up of the cron launched irr_cntrl.py script.  Each
+run is a new Python interpreter, as it is when cron launches the
+script, that imports irr_cntrl and then makes the schedule decision
+that _execute_schedule() makes (i.e., is the current schedule usable,
+what irr ev is underway, what irr ev should be underway).  No valve is
+opened and no AWS call is made.  All files are written beneath a
+temporary directory (see LV_PATHS_PREFIX in lv_paths.py) seeded with
+the default fixed schedule; the lonesome directory tree is not touched.
+
+The following is reported (median and max across runs; the first run,
+which compiles .pyc files, is discarded):
+
+  - wall time, in msecs, from process start to the schedule decision
+  - time spent importing irr_cntrl (and everything it imports)
+  - per module import time in msecs, self and cumulative, as measured
+    by the interpreter's -X importtime option.  Modules of this code
+    base and the heavy SDKs are listed; 'other' sums the remainder
+  - the heavy SDKs (boto3, requests, psutil, ...) loaded by the time
+    the decision was made; with deferred imports (see lazy_import.py)
+    none should be
+
+Usage:
+  python bench_startup.py --runs 10
+  python bench_startup.py --json results.json
+"""
+import                 argparse
+import                 json
+import                 logging
+import                 os
+import                 shutil
+import                 subprocess
+import                 sys
+import                 tempfile
+import                 time
+
+import dura_file
+import irr_sched
+import lv_paths
+
+
+HEAVY_SDKS = ['boto3', 'botocore', 'requests', 'requests_aws4auth', 'psutil',
+              'AWSIoTPythonSDK']
+
+#runs in each new interpreter; kept to what a cron launch of irr_cntrl does
+CHILD_CODE = """
+import time
+import irr_cntrl
+imported = time.time()
+a_sched_obj = irr_cntrl.irr_sched.irr_sched()
+decision = {'usable' : a_sched_obj.curr_sched_usable()}
+if(decision['usable']):
+  decision['underway']  = a_sched_obj.irr_ev_underway()
+  decision['scheduled'] = a_sched_obj.irr_ev_should_be_underway()
+decided = time.time()
+import json, sys
+print(json.dumps({'imported' : imported, 'decided' : decided,
+                  'decision' : str(decision),
+                  'heavy'    : [name for name in %r if(name in sys.modules)]}))
+""" % (HEAVY_SDKS,)
+
+
+def _median(values):
+  values = sorted(values)
+  if(not values):
+    return(0)
+  return(values[len(values) // 2])
+
+
+def _build_tree(root_dir):
+  """
+  Create the directory tree beneath 'root_dir' and place the default
+  fixed schedule in force.
+
+  Returns:
+    str              value for LV_PATHS_PREFIX
+  """
+  logging.info('entering: _build_tree()')
+
+  prefix = root_dir + os.sep + 'lonesome'
+  os.environ[lv_paths.lv_paths.prefix_env] = prefix
+  paths = lv_paths.lv_paths()
+  for dir_name in paths.unix_dirs:
+    os.makedirs(paths.get_path(dir_name), exist_ok=True)
+
+  schedule  = irr_sched.irr_sched().default_sched
+  file_name = (schedule['created_date'].replace('-', '_') + '_fixed_' +
+               str(schedule['id']) + '.json')
+  dura_file.dura_file().write_data(paths.get_path('cur_irr_sched') +
+                                   paths.divider + file_name, schedule)
+  return(prefix)
+
+
+def _parse_importtime(stderr):
+  """
+  Args:
+    stderr(str)       output of -X importtime
+
+  Returns:
+    {}                module name -> [self usecs, cumulative usecs] for
+                        modules imported directly or by this code base
+  """
+  local   = {name[:-3] for name in os.listdir(os.path.dirname(
+                                     os.path.abspath(__file__)))
+             if(name.endswith('.py'))}
+  modules = {}
+  for line in stderr.splitlines():
+    if(not line.startswith('import time:') or ('[us]' in line)):
+      continue
+    self_us, cumulative_us, name = line[len('import time:'):].split('|')
+    name = name.strip()
+    top  = name.split('.')[0]
+    if((name in local) or (top in HEAVY_SDKS and name == top)):
+      modules[name] = [int(self_us), int(cumulative_us)]
+    else:
+      modules.setdefault('other', [0, 0])
+      modules['other'][0] += int(self_us)
+  return(modules)
+
+
+def _run_once(source_dir, prefix):
+  """
+  Returns:
+    {}               start / import / decision times and import times
+  """
+  env = dict(os.environ)
+  env[lv_paths.lv_paths.prefix_env] = prefix
+  start  = time.time()
+  child  = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                           CHILD_CODE], cwd=source_dir, env=env,
+                          capture_output=True, text=True)
+  result = json.loads(child.stdout.strip().splitlines()[-1])
+  result['import_msecs'] = (result['imported'] - start) * 1000
+  result['wall_msecs']   = (result['decided'] - start) * 1000
+  result['modules']      = _parse_importtime(child.stderr)
+  return(result)
+
+
+def main():
+  parser = argparse.ArgumentParser(description='irr_cntrl start up benchmark')
+  parser.add_argument('--runs', type=int, default=5)
+  parser.add_argument('--json', default=None,
+                      help='also write results to this file')
+  args = parser.parse_args()
+
+  logging.basicConfig(level=logging.ERROR)
+  source_dir = os.path.dirname(os.path.abspath(__file__))
+  root_dir   = tempfile.mkdtemp(prefix='bench_startup_')
+  try:
+    prefix = _build_tree(root_dir)
+    _run_once(source_dir, prefix)                 #compiles .pyc files
+    runs = [_run_once(source_dir, prefix) for index in range(args.runs)]
+  finally:
+    shutil.rmtree(root_dir, ignore_errors=True)
+
+  modules = {}
+  for name in runs[0]['modules']:
+    self_ms = [run['modules'].get(name, [0, 0])[0] / 1000 for run in runs]
+    cum_ms  = [run['modules'].get(name, [0, 0])[1] / 1000 for run in runs]
+    modules[name] = {'self_msecs'       : round(_median(self_ms), 2),
+                     'cumulative_msecs' : round(_median(cum_ms), 2)}
+  results = {'runs'               : args.runs,
+             'wall_msecs'         : round(_median([run['wall_msecs']
+                                                   for run in runs]), 1),
+             'wall_msecs_max'     : round(max(run['wall_msecs']
+                                              for run in runs), 1),
+             'import_msecs'       : round(_median([run['import_msecs']
+                                                   for run in runs]), 1),
+             'decision'           : runs[-1]['decision'],
+             'heavy_sdks_loaded'  : runs[-1]['heavy'],
+             'modules'            : dict(sorted(modules.items(),
+                                       key=lambda item:
+                                         -item[1]['cumulative_msecs']))}
+
+  print(json.dumps(results, indent=2))
+  if(args.json):
+    with open(args.json, 'w') as fd:
+      json.dump(results, fd, indent=2)
+
+
+if __name__ == '__main__':
+  main()
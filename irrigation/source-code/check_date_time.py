@@ -18,16 +18,25 @@ when it powered down.  The PI 4 will attempt, approximately every
 and obtain the current date / time.
 
 The time_synch class will validate the platform's date time setting. 
-A list of public API endpoints are accessed to obtain the current
-date time.  If the current date time cannot be obtained from any of
-the public APIs then a list of publicly accessable serverrs are 
-accessed, via a socket connection, to obtain the current date time.
+A list of public API endpoints and a list of publicly accessable
+servers (via a socket connection) are queried, all at the same time,
+to obtain the current date time.  Whatever answers arrive before a
+shared deadline ('DEADLINE_SECS') are combined: each answer gives an
+offset from the platform's clock, offsets far from the median (i.e.,
+a source that is wrong) are rejected, and the median of the rest is
+taken.  On a flaky WAN the check costs at most the deadline rather
+than a string of timeouts one after another.
 
 With the current date time value, provided by a trusted external 
 source, compare it to the PI 4's value (i.e., what is running this
 Python code).  If the two vary beyond the defined threhold, set the
 the attribute 'check_date_time.acceptable' to False
 
+A verified offset is kept, for the OS process, for 'VALID_SECS'.  A
+check within that period uses it and contacts nothing.  The offset is
+kept against the monotonic clock so that a step to the platform's
+clock (e.g., NTP setting it after a reboot) is still caught.
+
 Note, it is imperative that you configure the PI 4 to the correct
 timezone.  I believe this information is passed into the requests
 to time/date servers publicly accessible on the Internet.
@@ -42,6 +51,13 @@ Usage: # assuming the platforms date / time value is out of tolerance
   False
   >>> cdt.check()
   False
+
+kernel_synched() asks the kernel, without any network access, whether
+the clock is being disciplined by NTP (i.e., the PI 4's own periodic
+synch is working); when it is there is no need to call out.
+  >>> cdt = check_date_time.check_date_time(check=False)
+  >>> cdt.kernel_synched()
+  True
 """
 
 
@@ -53,7 +69,32 @@ class check_date_time():
   import logging
   import json
   import datetime
-  import urllib.request
+  import sys
+  try:
+    import ctypes
+  except ImportError:
+    ctypes = None
+
+  import os
+  import statistics
+  import threading
+  import time
+  import concurrent.futures
+
+  TIME_ERROR = 5           #adjtimex(2) clock state: not synchronized
+  STA_UNSYNC = 0x0040      #adjtimex(2) status bit: not synchronized
+
+  #verified offset; shared by all check_date_time objects in an OS process
+  verified      = {'reference' : None,  #true epoch secs - monotonic secs
+                   'at'        : None,  #monotonic secs when verified
+                   'sources'   : {}}    #source -> offset secs; diagnostic
+  verified_lock = threading.Lock()
+  #a forked child cant wait on a lock its parent's threads held
+  if(hasattr(os, 'register_at_fork')):
+    os.register_at_fork(after_in_child=lambda: check_date_time._after_fork())
+
+  import lazy_import    #imported on first use; most cycles skip the check
+  urllib_request = lazy_import.lazy_import('urllib.request')
   
   
   class _source_from_server():
@@ -74,17 +115,23 @@ class check_date_time():
     import struct
 
 
-    def __init__(self):
+    servers = ['ntp.iitb.ac.in', 'time.nist.gov', 
+               'time.windows.com', 'pool.ntp.org']
+
+
+    def __init__(self, servers=None, timeout=5.0):
       """
+      Args:
+        servers([])      servers to try, in turn; default is all
+        timeout(float)   socket timeout, secs, per server
       """
       self.logger = self.logging.getLogger('_source_from_server')
 
       self.logger.info('entering: __init__()')
-      self.servers        = ['ntp.iitb.ac.in', 'time.nist.gov', 
-                             'time.windows.com', 'pool.ntp.org']
+      self.servers        = servers or self.servers
       self.sourced_time   = None 
       self.TIME_1970      = 2208988800
-      self.SOCKET_TIMEOUT = 5.0
+      self.SOCKET_TIMEOUT = timeout
       self.BUFFER_SIZE    = 1024
       
       for server in self.servers:
@@ -120,8 +167,19 @@ class check_date_time():
       return(result)
       
     
-  def __init__(self):
+  @classmethod
+  def _after_fork(cls):
+    """
+    Runs in a child OS process created by fork (see os.register_at_fork)
     """
+    cls.verified_lock = cls.threading.Lock()
+
+
+  def __init__(self, check=True):
+    """
+    Args:
+      check(bool)     run check() now; False to call it, or
+                        kernel_synched(), later
     """
     self.logger = self.logging.getLogger(__name__)
 
@@ -134,16 +192,23 @@ class check_date_time():
         {'url' : 'http://worldclockapi.com/api/json/cst/now', 
          'key' : 'currentDateTime'}}
     self.ACCEPTABLE_VARIANCE = 3600        # 3600 seconds in 1 hour
+    self.URL_TIMEOUT         = 10.0        # secs; per API endpoint
+    self.DEADLINE_SECS       = 8.0         # secs; for all sources at once
+    self.OUTLIER_SECS        = 90          # secs; API answers are per minute
+    self.VALID_SECS          = 3600        # secs; verified offset is reused
+    self.offset              = None        # secs; sourced - platform time
     self.sourced_time        = None
     self.acceptable          = None
-    self.check()
+    if(check):
+      self.check()
   
 
   def check(self):
     """
-    Try to source current date time from a public API endpoint.  If
-    it cannot be sourced from an API endpoint, try to source via a 
-    socket connection to a publicly accessable server.
+    Source current date time from every public API endpoint and every
+    publicly accessable server at once, and take the consensus of the
+    answers that arrive in time (see module doc string.)  A verified
+    offset less than 'VALID_SECS' old is used instead.
 
     If date time can be sourced from an external source, compare it
     to the platforms date time.  Set the attribute
@@ -160,21 +225,21 @@ class check_date_time():
 
     self.acceptable   = None
     self.sourced_time = None
+    self.offset       = None
 
-    #Priority/preference is to source from an API endpoint
-    for api_provider in self.api_providers:
-      self._source_from_api(api_provider)
-      if(self.sourced_time):
-        break
-    
-    #If no API endpoint access succeeded, try socket connection to server
-    if(not self.sourced_time):                                
-      self.server_synch = self._source_from_server()
-      self.sourced_time = self.server_synch.sourced_time
-
-    if(self.sourced_time):
-      platform_time = int(self.datetime.datetime.now().timestamp())
-      if(abs((platform_time - self.sourced_time)) < self.ACCEPTABLE_VARIANCE):
+    with self.verified_lock:
+      reference = self.verified['reference']
+      if((reference != None) and
+         (self.time.monotonic() - self.verified['at'] > self.VALID_SECS)):
+        reference = None
+    if(reference == None):
+      reference = self._consensus()
+
+    if(reference != None):
+      platform_time     = self.time.time()
+      self.sourced_time = int(self.time.monotonic() + reference)
+      self.offset       = self.sourced_time - platform_time
+      if(abs(self.offset) < self.ACCEPTABLE_VARIANCE):
         self.acceptable = True
       else:
         self.acceptable = False
@@ -182,6 +247,129 @@ class check_date_time():
     return(self.acceptable)
 
 
+  def _query_source(self, source):
+    """
+    Runs on a pool thread.  Query one source.
+
+    Args:
+      source(str)     an API provider name or a server name
+
+    Returns:
+      None            no answer
+      float           sourced epoch secs minus monotonic secs at arrival
+    """
+    result = None
+    if(source in self.api_providers):
+      sourced_time = self._source_from_api(source)
+    else:
+      sourced_time = self._source_from_server(
+                       servers=[source], timeout=self.DEADLINE_SECS
+                     ).sourced_time
+    if(sourced_time):
+      result = sourced_time - self.time.monotonic()
+    return(result)
+
+
+  def _consensus(self):
+    """
+    Query all sources at once and combine the answers that arrive
+    before the deadline; the median offset after rejecting any farther
+    than 'OUTLIER_SECS' (or 3 median absolute deviations, if larger)
+    from the median.  Sources still outstanding at the deadline are
+    abandoned; their threads end with their own timeouts.
+
+    Returns:
+      None            no source answered in time
+      float           true epoch secs minus monotonic secs
+    """
+    self.logger.info('entering: _consensus()')
+
+    sources = (list(self.api_providers) +
+               list(self._source_from_server.servers))
+    answers = {}
+    pool    = self.concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(sources), thread_name_prefix='time_source')
+    try:
+      futures = {pool.submit(self._query_source, source) : source
+                 for source in sources}
+      done, not_done = self.concurrent.futures.wait(
+                         futures, timeout=self.DEADLINE_SECS)
+      for future in done:
+        try:
+          if(future.result() != None):
+            answers[futures[future]] = future.result()
+        except Exception as e:
+          self.logger.error(f'8 Source: {futures[future]} failed. ' +
+                            f'Exception: {e}')
+      if(not_done):
+        self.logger.info('Sources past the deadline: ' +
+                         f'{sorted(futures[future] for future in not_done)}')
+    finally:
+      pool.shutdown(wait=False)    #every source is already running
+
+    reference = None
+    if(answers):
+      median    = self.statistics.median(answers.values())
+      deviation = self.statistics.median(abs(value - median)
+                                         for value in answers.values())
+      limit     = max(self.OUTLIER_SECS, 3 * deviation)
+      agreeing  = [value for value in answers.values()
+                   if(abs(value - median) <= limit)]
+      reference = self.statistics.median(agreeing)
+      rejected  = len(answers) - len(agreeing)
+      if(rejected):
+        self.logger.error(f'9 Rejected {rejected} of {len(answers)} ' +
+                          'date / time sources as outliers')
+      now = self.time.monotonic()
+      with self.verified_lock:
+        self.verified['reference'] = reference
+        self.verified['at']        = now
+        self.verified['sources']   = {
+          source : round(value + now - self.time.time(), 3)
+          for source, value in answers.items()}
+    return(reference)
+
+
+  def kernel_synched(self):
+    """
+    Does the kernel report the platform's clock as synchronized?  Read
+    using adjtimex(2), in read only mode; no network access.
+
+    Returns:
+      None      cant be determined (e.g., not linux)
+      False     clock is not synchronized
+      True      clock is synchronized
+    """
+    self.logger.info('entering: kernel_synched()')
+
+    result = None
+    if(self.ctypes and self.sys.platform.startswith('linux')):
+      ctypes = self.ctypes
+
+      class timex(ctypes.Structure):       #struct timex; see adjtimex(2)
+        _fields_ = [('modes',    ctypes.c_uint),
+                    ('offset',   ctypes.c_long),
+                    ('freq',     ctypes.c_long),
+                    ('maxerror', ctypes.c_long),
+                    ('esterror', ctypes.c_long),
+                    ('status',   ctypes.c_int),
+                    ('rest',     ctypes.c_char * 256)]  #fields not read
+
+      try:
+        libc    = ctypes.CDLL(None, use_errno=True)
+        a_timex = timex()                    #modes == 0; read only
+        state   = libc.adjtimex(ctypes.byref(a_timex))
+        if(state < 0):
+          self.logger.error('6 adjtimex() failed. errno: ' +
+                            f'{ctypes.get_errno()}')
+        else:
+          result = ((state != self.TIME_ERROR) and
+                    (not (a_timex.status & self.STA_UNSYNC)))
+      except Exception as e:
+        self.logger.error(f'7 Couldnt read kernel clock state. Exception: {e}')
+    return(result)
+
+
   def _generate_ts(self, date_time_string):
     """
     Generate a epoch time stamp (i.e., 10 digits representing number of
@@ -213,15 +401,21 @@ class check_date_time():
   def _source_from_api(self, api_provider):
     """
     Source the current date time from the api provider
+
+    Returns:
+      None      date time could not be sourced
+      int       epoch time stamp
     """
     self.logger.info('entering: _source_from_api()')
 
+    sourced_time = None
     if(api_provider):
       if(api_provider in self.api_providers):
         try:
           url = self.api_providers[api_provider]['url']
           key = self.api_providers[api_provider]['key']
-          with self.urllib.request.urlopen(url) as response:
+          with self.urllib_request.urlopen(
+                 url, timeout=self.URL_TIMEOUT) as response:
             RAW_HTML_BYTES = response.read()
             RAW_HTML_STRING = RAW_HTML_BYTES.decode()
         except Exception as e:
@@ -232,7 +426,8 @@ class check_date_time():
         if(RAW_HTML_STRING):
           try:
             JSON_RESPONSE = self.json.loads(RAW_HTML_STRING)
-            self.sourced_time =  self._generate_ts(JSON_RESPONSE[key])
+            sourced_time  = self._generate_ts(JSON_RESPONSE[key])
           except Exception as e:
             self.logger.error('5 Cant extract datetime from response of ' +
-                              f'endpoint: {api_provider}. Exception: {e}')
\ No newline at end of file
+                              f'endpoint: {api_provider}. Exception: {e}')
+    return(sourced_time)
\ No newline at end of file
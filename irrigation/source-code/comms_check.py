@@ -15,7 +15,7 @@ Obligatory legal disclaimer:
   COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU 
   GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
 
-NOTE: the identifier 'boto3' is overidden in the comms_check()
+NOTE: the boto3 session is created on first use; see comms_check._session()
   
 This class is used to determine if a communication link is available
 from the platform executing this module to the AWS backend.  This is
@@ -35,42 +35,107 @@ Usage:
 """
 class comms_check():
   import logging
-  import boto3
-  import boto3.session
-  import requests
-  from   requests_aws4auth import AWS4Auth
+
+  import lazy_import    #heavy SDKs are imported on first use
+  boto3    = lazy_import.lazy_import('boto3')
+  requests = lazy_import.lazy_import('requests')
+  AWS4Auth = lazy_import.lazy_import('requests_aws4auth', 'AWS4Auth')
 
 
   def __init__(self):
     """
-    NOTE: identifier 'boto3' overidden to refer to a boto3 session
+    NOTE: the boto3 session is created on first use; see _session()
     """
     self.logger = self.logging.getLogger(__name__)
 
     self.logger.info('entering: __init__()')
+    self.session = None      #boto3 session; see _session()
+    self.auth    = None      #API Gwy signer; see _auth()
+    self.auth_keys = None
+    self.http    = None      #requests session; see _http()
     self.env    = 'debug'  #set to 'debug' or 'prod'
     
     if(self.env   == 'debug'):
       self.config = {'end_point' : 
         'https://abcdefghji.execute-api.us-east-1.amazonaws.com/prod',
                      'region' : 'us-east-1'}
-      #overide identifier 'boto3' (session using IAM credentials below)
-      try:
-        self.boto3 = self.boto3.Session(
-          aws_access_key_id     = '123456789012345678901', 
-          aws_secret_access_key = '1234567890123456789012345678901234567890',
-          region_name           = self.config['region'])
-      except Exception as e:
-        self.logger.error(f'1 Could not create boto3 session.  Exception: {e}')
+      #session using IAM credentials below
+      self.session_args = {
+        'aws_access_key_id'     : '123456789012345678901',
+        'aws_secret_access_key' : '1234567890123456789012345678901234567890',
+        'region_name'           : self.config['region']}
     else: 
       self.config = {'end_point' : 
         'https://abcdefghij.execute-api.us-east-1.amazonaws.com/prod',
                      'region' : 'us-east-1'}
-      #overide identifier 'boto3' (session using AWS CLI default profile)
-      try:
-        self.boto3 = self.boto3.session.Session()
-      except Exception as e:
-        self.logger.error(f'2 Could not create boto3 session. Exception: {e}')
+      #session using AWS CLI default profile
+      self.session_args = {}
+
+
+  def _session(self):
+    """
+    The boto3 session, created on first use.  Creating it imports boto3
+    so it is not done in __init__(); most cron cycles never call AWS.
+
+    Returns:
+      None        boto3 session could not be created
+      session     boto3 session
+    """
+    self.logger.info('entering: _session()')
+
+    if(self.session == None):
+      if(self.session_args):
+        try:
+          self.session = self.boto3.Session(**self.session_args)
+        except Exception as e:
+          self.logger.error(f'1 Could not create boto3 session. ' +
+                            f'Exception: {e}')
+      else:
+        try:
+          self.session = self.boto3.session.Session()
+        except Exception as e:
+          self.logger.error(f'2 Could not create boto3 session. ' +
+                            f'Exception: {e}')
+    return(self.session)
+
+
+  def _auth(self):
+    """
+    The AWS SigV4 signer for API Gwy calls.  Kept between calls and
+    rebuilt only if the session's credentials change (e.g., a refreshed
+    CLI profile.)
+
+    Returns:
+      None        boto3 session or credentials unavailable
+      AWS4Auth    signer
+    """
+    self.logger.info('entering: _auth()')
+
+    session = self._session()
+    if(session):
+      credentials = session.get_credentials()
+      if(credentials):
+        keys = (credentials.access_key, credentials.secret_key)
+        if((self.auth == None) or (self.auth_keys != keys)):
+          self.auth      = self.AWS4Auth(credentials.access_key,
+                                         credentials.secret_key,
+                                         self.config['region'],
+                                         'execute-api')
+          self.auth_keys = keys
+    return(self.auth)
+
+
+  def _http(self):
+    """
+    The requests session used to invoke API Gwy endpoints.  Reused so
+    that a long lived object (see irr_cntrl.supervise()) keeps its
+    connection, and TLS session, to the endpoint open between calls.
+    """
+    self.logger.info('entering: _http()')
+
+    if(self.http == None):
+      self.http = self.requests.Session()
+    return(self.http)
 
 
   def contact_aws(self):
@@ -86,19 +151,15 @@ class comms_check():
 
     result      = None
     try:
-      credentials = self.boto3.get_credentials()
-      auth        = self.AWS4Auth(credentials.access_key, 
-                                  credentials.secret_key,
-                                  self.config['region'], 
-                                  'execute-api')
+      auth        = self._auth()
       endpoint    = self.config['end_point']
       method      = 'GET'
       headers     = {}
       body        = ''
     
       try:
-        response    = self.requests.request(method, endpoint, auth=auth, 
-                                            data=body, headers=headers)
+        response    = self._http().request(method, endpoint, auth=auth,
+                                           data=body, headers=headers)
         #status_code = response.status_code
         #print(f'99 response: {response.text}')   #handy for debugging
 
@@ -0,0 +1,525 @@
+"""
+Jaye Hicks 2021
+
+Obligatory legal disclaimer:
+  You are free to use this source code (this file and all other files
+  referenced in this file) "AS IS" WITHOUT WARRANTY OF ANY KIND, EITHER
+  EXPRESSED OR IMPLIED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+  THE ENTIRE RISK AS TO THE QUALITY AND PERFORMANCE OF THIS SOURCE CODE
+  IS WITH YOU.  SHOULD THE SOURCE CODE PROVE DEFECTIVE, YOU ASSUME THE
+  COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU
+  GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
+
+Objects of type comms_mailbox() hold outbound messages (e.g., gallons
+dispensed messages, alarms) waiting to be sent to the AWS backend.
+Rather than one small dura_file per message, messages are appended to
+segment files, many messages per segment, and a small index records
+where each message lives and how far along it is.  Each mailbox lives
+in its own directory:
+
+  comms/mailboxes/<mailbox name>/seg_<nnnnnnnn>.log    segments
+  comms/mailboxes/<mailbox name>/index                 index
+  comms/mailboxes/<mailbox name>/.lock                 lock file
+
+A segment is a text file holding one message per line.  A line is the
+message name (i.e., the file name the message would have had as an
+individual file), a tab, and the message in the dura_file format laid
+out exactly as dura_file().write_data() lays out a file:
+
+  gals_disp_2021_10_31_99_1_a.json\t{"hash_info": {...}, "data": {...}}
+
+Every message is therefore self checksummed, and the bytes following
+the tab are byte for byte the contents the message's individual file
+would have had.  Segments are only appended to; once a segment reaches
+'segment_bytes' the next message starts a new segment.
+
+The index is a dura_file (binary container) holding, for every
+segment, one entry per message: [id, offset, length, state, name].
+Offset and length locate the message's dura_file bytes in the segment.
+A message moves through the states:
+
+  pending       -> sent -> acknowledged
+                          -> failed
+  corrupt       (failed its integrity check when read)
+
+Senders call pending() and receive every pending / sent message with
+one sequential read per segment, then report results with mark().
+compact() deletes segments whose messages are all resolved (i.e.,
+acknowledged, failed, or corrupt); failed messages are first written,
+as individual dura_files, to the bad_comms directory and corrupt
+messages to the corrupt_files directory so that upload_files() sends
+them for forensic analysis exactly as before.
+
+Irrigation events (i.e., a separate OS process) post messages while
+the senders run so every change to a mailbox is made while holding an
+exclusive lock (fcntl.flock() on the lock file; no locking on win32).
+A power loss between appending a message and updating the index is
+repaired the next time the index is loaded: complete lines past the
+end of the index are added as pending messages and a partially written
+line is cut off.  If the index itself is lost or corrupt it is rebuilt
+from the segments with every message pending; gallons dispensed and
+alarm processing on the AWS backend tolerates a message being sent
+more than once.
+
+Usage:
+  >>> import comms_mailbox
+  >>> a_mailbox = comms_mailbox.comms_mailbox('gals_disp')
+  >>> a_mailbox.post('gals_disp_2021_10_31_99_1_a.json', {'gallons' : 1})
+  >>> for msg_id, name, data, record in a_mailbox.pending():
+  ...   <send data>
+  >>> a_mailbox.mark([msg_id], 'acknowledged')
+  >>> a_mailbox.compact()
+"""
+class comms_mailbox():
+  import logging
+  import copy
+  import json
+  import os
+  try:
+    import fcntl
+  except ImportError:             #win32 (development)
+    fcntl = None
+
+  import dura_file
+  import lv_paths
+
+  STATES   = ('pending', 'sent', 'acknowledged', 'failed', 'corrupt')
+  RESOLVED = ('acknowledged', 'failed', 'corrupt')
+
+
+  def __init__(self, name, segment_bytes=64 * 1024, paths=None):
+    """
+    Args:
+      name(str)             mailbox name (e.g., 'gals_disp', 'alarms')
+      segment_bytes(int)    size at which a new segment is started
+      paths                 lv_paths() object to use; default is a new one
+    """
+    self.logger = self.logging.getLogger(__name__)
+    self.logger.info('entering: __init__()')
+
+    self.name          = name
+    self.segment_bytes = segment_bytes
+    self.df            = self.dura_file.dura_file()
+    self.index_df      = self.dura_file.dura_file(binary=True)
+    self.paths         = paths if(paths) else self.lv_paths.lv_paths()
+
+
+  def _path(self, file_name=''):
+    """
+    Returns:
+      None       couldnt retrieve path to mailboxes directory
+      str        path to this mailbox's directory or to a file in it
+    """
+    path = self.paths.get_path('mailboxes')
+    if(path):
+      path += self.paths.divider + self.name
+      if(file_name):
+        path += self.paths.divider + file_name
+    return(path)
+
+
+  def _lock(self):
+    """
+    Take the mailbox's exclusive lock, creating the mailbox directory
+    if need be.
+
+    Returns:
+      None       lock not taken
+      file obj   open lock file; hand to _unlock()
+    """
+    lock_file = None
+    try:
+      self.os.makedirs(self._path(), exist_ok=True)
+      lock_file = open(self._path('.lock'), 'a')
+      if(self.fcntl):
+        self.fcntl.flock(lock_file.fileno(), self.fcntl.LOCK_EX)
+    except Exception as e:
+      self.logger.error(f'1 Could not lock mailbox: {self.name}. ' +
+                        f'Exception: {e}')
+      if(lock_file):
+        lock_file.close()
+        lock_file = None
+    return(lock_file)
+
+
+  def _unlock(self, lock_file):
+    if(lock_file):
+      try:
+        if(self.fcntl):
+          self.fcntl.flock(lock_file.fileno(), self.fcntl.LOCK_UN)
+      finally:
+        lock_file.close()
+
+
+  def _encode_record(self, name, data):
+    """
+    Returns:
+      (bytes, int, int)   the line to append, offset and length of the
+                            dura_file bytes within the line
+    """
+    data_string = self.json.dumps(data)
+    record = (self.df.header_template.format(
+                self.df.hash_string(data_string)) + data_string + '}').encode()
+    prefix = name.encode() + b'\t'
+    return(prefix + record + b'\n', len(prefix), len(record))
+
+
+  def _scan_segment(self, segment, start, index):
+    """
+    Add the complete, valid lines of a segment, from byte offset 'start'
+    onward, to the index as pending messages.  Anything following the
+    last good line (e.g., a line partially written when power was lost)
+    is cut off so later appends follow a good line.
+
+    Returns:
+      int        number of messages added
+    """
+    self.logger.info('entering: _scan_segment()')
+
+    added   = 0
+    entries = index['segments'].setdefault(segment, [])
+    try:
+      with open(self._path(segment), 'r+b') as fd:
+        fd.seek(start)
+        good_end = start
+        for line in fd:
+          name, tab, record = line.rstrip(b'\n').partition(b'\t')
+          if((not line.endswith(b'\n')) or (not tab) or
+             (not self.df.check_object(json_object=record))):
+            break
+          entries.append([index['next_id'], good_end + len(name) + 1,
+                          len(record), 'pending', name.decode()])
+          index['next_id'] += 1
+          good_end += len(line)
+          added    += 1
+        if(fd.seek(0, 2) > good_end):
+          self.logger.error(f'2 Cut off {fd.tell() - good_end} damaged ' +
+                            f'bytes from: {segment}')
+          fd.truncate(good_end)
+    except Exception as e:
+      self.logger.error(f'3 Could not scan segment: {segment}. Exception: {e}')
+    return(added)
+
+
+  def _load_index(self):
+    """
+    Read the index, repairing it from the segments if need be.  Call
+    while holding the lock.
+
+    Returns:
+      (dict, bool)    the index and True if it was repaired (i.e., it
+                        needs to be written)
+    """
+    self.logger.info('entering: _load_index()')
+
+    repaired = False
+    index    = self.index_df.read_valid(self._path('index'))
+    if(index):
+      index = self.copy.deepcopy(index)     #read_valid() data is shared
+    else:
+      if(index == False):
+        self.logger.error(f'4 Index of mailbox: {self.name} is corrupt; ' +
+                          'rebuilding it from the segments')
+      index    = {'next_id' : 1, 'next_segment' : 1, 'segments' : {}}
+      repaired = True
+
+    #segments (or the tail of a segment) not yet in the index
+    on_disk = sorted(name for name in self.os.listdir(self._path())
+                     if(name.startswith('seg_') and name.endswith('.log')))
+    for segment in on_disk:
+      size = self.os.path.getsize(self._path(segment))
+      if(segment in index['segments']):
+        entries = index['segments'][segment]
+        end     = (entries[-1][1] + entries[-1][2] + 1) if(entries) else 0
+      else:
+        end     = 0
+      if(size > end):
+        self._scan_segment(segment, end, index)
+        repaired = True
+      number = int(segment[4:-4])
+      if(number >= index['next_segment']):
+        index['next_segment'] = number + 1
+    for segment in list(index['segments']):
+      if(not segment in on_disk):
+        del index['segments'][segment]
+        repaired = True
+    return(index, repaired)
+
+
+  def _save_index(self, index):
+    """
+    Returns:
+      True       index written
+      False      index could not be written
+    """
+    result = bool(self.index_df.write_data(self._path('index'), index))
+    if(not result):
+      self.logger.error(f'5 Could not write index of mailbox: {self.name}')
+    return(result)
+
+
+  def post(self, name, data, unique=False):
+    """
+    Append a message to the mailbox and force it to disk.
+
+    Args:
+      name(str)      message name; the file name the message would have
+                       as an individual file (see senders' naming rules)
+      data(dict)     the message
+      unique(bool)   dont post if a message of this name is still in the
+                       mailbox
+
+    Returns:
+      None           bad arguments or mailbox couldnt be locked
+      True           message posted (or already present if 'unique')
+      False          message could not be posted
+    """
+    self.logger.info('entering: post()')
+
+    result = None
+    if((not name) or (type(name) != str) or ('\t' in name) or
+       ('\n' in name) or (not data) or (type(data) != dict)):
+      self.logger.error('6 Bad parameters passed into post()')
+      return(result)
+
+    lock_file = self._lock()
+    if(lock_file):
+      result = False
+      try:
+        index, repaired = self._load_index()
+        if(unique and any(entry[4] == name
+                          for entries in index['segments'].values()
+                            for entry in entries)):
+          result = True
+          if(repaired):
+            self._save_index(index)
+        else:
+          segment = None
+          if(index['segments']):
+            segment = max(index['segments'])
+            if(self.os.path.getsize(self._path(segment)) >=
+               self.segment_bytes):
+              segment = None
+          if(not segment):
+            segment = f'seg_{index["next_segment"]:08d}.log'
+            index['next_segment'] += 1
+            index['segments'][segment] = []
+
+          line, skip, length = self._encode_record(name, data)
+          with open(self._path(segment), 'ab') as fd:
+            offset = fd.seek(0, 2)
+            fd.write(line)
+            fd.flush()
+            self.os.fsync(fd.fileno())
+          index['segments'][segment].append([index['next_id'], offset + skip,
+                                             length, 'pending', name])
+          index['next_id'] += 1
+          result = self._save_index(index)
+      except Exception as e:
+        self.logger.error(f'7 Could not post message: {name}. Exception: {e}')
+      finally:
+        self._unlock(lock_file)
+    return(result)
+
+
+  def pending(self, states=('pending', 'sent')):
+    """
+    Read every message in the given states.  Each segment holding such
+    messages is read once, start to finish.  Messages failing their
+    integrity check are marked 'corrupt' and not returned.
+
+    Args:
+      states(())      message states to return
+
+    Returns:
+      None            mailbox couldnt be locked
+      [()]            (id, name, data, dura_file bytes) per message, in
+                        the order posted
+    """
+    self.logger.info('entering: pending()')
+
+    messages  = None
+    lock_file = self._lock()
+    if(lock_file):
+      messages = []
+      try:
+        index, changed = self._load_index()
+        for segment in sorted(index['segments']):
+          wanted = [entry for entry in index['segments'][segment]
+                    if(entry[3] in states)]
+          if(wanted):
+            with open(self._path(segment), 'rb') as fd:
+              contents = fd.read()
+            for entry in wanted:
+              record = contents[entry[1]:entry[1] + entry[2]]
+              try:
+                if(self.df.check_object(json_object=record)):
+                  messages.append((entry[0], entry[4],
+                                   self.json.loads(
+                                     record[self.df.data_start:-1]),
+                                   record))
+                  continue
+              except Exception:
+                pass
+              self.logger.error(f'8 Corrupt message: {entry[4]} in ' +
+                                f'segment: {segment}')
+              entry[3] = 'corrupt'
+              changed  = True
+        if(changed):
+          self._save_index(index)
+      except Exception as e:
+        self.logger.error(f'9 Could not read mailbox: {self.name}. ' +
+                          f'Exception: {e}')
+      finally:
+        self._unlock(lock_file)
+    return(messages)
+
+
+  def mark(self, msg_ids, state):
+    """
+    Record the progress of messages.
+
+    Args:
+      msg_ids([])     ids returned by pending()
+      state(str)      one of STATES
+
+    Returns:
+      None            bad arguments or mailbox couldnt be locked
+      True            states recorded
+      False           states could not be recorded
+    """
+    self.logger.info('entering: mark()')
+
+    result = None
+    if(not state in self.STATES):
+      self.logger.error(f'10 Invalid message state: {state}')
+      return(result)
+    msg_ids = set(msg_ids)
+    if(not msg_ids):
+      return(True)
+
+    lock_file = self._lock()
+    if(lock_file):
+      result = False
+      try:
+        index, repaired = self._load_index()
+        for entries in index['segments'].values():
+          for entry in entries:
+            if(entry[0] in msg_ids):
+              entry[3] = state
+        result = self._save_index(index)
+      except Exception as e:
+        self.logger.error(f'11 Could not mark messages. Exception: {e}')
+      finally:
+        self._unlock(lock_file)
+    return(result)
+
+
+  def counts(self):
+    """
+    Returns:
+      None            mailbox couldnt be locked
+      dict            number of messages in each state
+    """
+    self.logger.info('entering: counts()')
+
+    counts    = None
+    lock_file = self._lock()
+    if(lock_file):
+      try:
+        index, repaired = self._load_index()
+        counts = {}
+        for entries in index['segments'].values():
+          for entry in entries:
+            counts[entry[3]] = counts.get(entry[3], 0) + 1
+        if(repaired):
+          self._save_index(index)
+      except Exception as e:
+        self.logger.error(f'14 Could not count messages. Exception: {e}')
+      finally:
+        self._unlock(lock_file)
+    return(counts)
+
+
+  def _export(self, target, file_name, contents):
+    """
+    Write a message, as an individual file, to 'bad_comms' or
+    'corrupt_files' for upload by upload_files().  The file is written
+    in the mailbox directory then renamed into place so upload_files(),
+    possibly running at the same time, never sees a partial file.
+
+    Returns:
+      True       file written
+      False      file could not be written
+    """
+    result = False
+    try:
+      path = self.paths.get_path(target) + self.paths.divider + file_name
+      if(self.os.path.exists(path)):
+        path += '.' + str(self.os.getpid())
+      temp_path = self._path('.export.tmp')
+      with open(temp_path, 'wb') as fd:
+        fd.write(contents)
+        fd.flush()
+        self.os.fsync(fd.fileno())
+      self.os.replace(temp_path, path)
+      result = True
+    except Exception as e:
+      self.logger.error(f'12 Could not write: {file_name} to {target}. ' +
+                        f'Exception: {e}')
+    return(result)
+
+
+  def compact(self):
+    """
+    Delete every segment whose messages are all resolved.  Before a
+    segment is deleted its failed messages are written to 'bad_comms'
+    and its corrupt messages to 'corrupt_files'; a segment whose
+    messages cant be written out is kept and retried next time.
+
+    Returns:
+      None            mailbox couldnt be locked
+      True            compaction completed
+      False           one or more segments could not be compacted
+    """
+    self.logger.info('entering: compact()')
+
+    result    = None
+    lock_file = self._lock()
+    if(lock_file):
+      result = True
+      try:
+        index, changed = self._load_index()
+        for segment in sorted(index['segments']):
+          entries = index['segments'][segment]
+          if(not all(entry[3] in self.RESOLVED for entry in entries)):
+            continue
+          exported = True
+          suspects = [entry for entry in entries if(entry[3] != 'acknowledged')]
+          if(suspects):
+            with open(self._path(segment), 'rb') as fd:
+              contents = fd.read()
+            for entry in suspects:
+              record = contents[entry[1]:entry[1] + entry[2]]
+              if(entry[3] == 'failed'):
+                exported &= self._export('bad_comms', entry[4], record)
+              else:
+                exported &= self._export('corrupt_files',
+                                         f'{self.name}_{segment}_' +
+                                         f'{entry[0]}.corrupt', record)
+          if(exported):
+            self.os.remove(self._path(segment))
+            del index['segments'][segment]
+            changed = True
+          else:
+            result = False
+        if(changed):
+          result = self._save_index(index) and result
+      except Exception as e:
+        result = False
+        self.logger.error(f'13 Could not compact mailbox: {self.name}. ' +
+                          f'Exception: {e}')
+      finally:
+        self._unlock(lock_file)
+    return(result)
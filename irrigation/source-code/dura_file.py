@@ -36,6 +36,35 @@ for a given input will vary from platform to platorm.  The hash
 values generated by dura_class are consistant across all platforms
 (e.g., Windows, Linux, AWS Lambda service)
 
+Optionally (i.e., dura_file(binary=True)) files are written in a compact
+binary container instead of JSON text.  All reads auto-detect the 
+container so both formats can coexist.  Layout (little endian):
+
+  offset  size  content
+  0       4     magic b'LVDF'
+  4       1     container version (1)
+  5       1     payload type (1 = compact JSON, UTF-8)
+  6       1     digest algorithm (1 = keyed BLAKE2b)
+  7       1     digest length in bytes (16)
+  8       4     payload length in bytes
+  12      n     digest of the payload bytes
+  12 + n  ...   payload (i.e., the data to the right of the "data" key)
+
+The digest is computed over the stored payload bytes so a reader can
+memory-map the file and verify it without decoding the payload.  The
+key of the keyed digest namespaces it to dura_file; it guards against
+corruption, not tampering.  The payload is compact JSON (no spaces)
+because the C JSON parser decodes it faster, on the PI 4, than any 
+pure Python binary decoder; the payload type byte leaves room for other
+encodings.
+
+Validated files are cached for the life of the OS process (i.e., shared
+by every dura_file object) so that a file opened and checked several
+times in one cron cycle is only read, verified, and decoded once; see
+read_valid().  Entries are keyed by path and the file's (inode,
+mtime_ns, size) so a file replaced by any writer is seen as new.  The
+least recently used entries are evicted to stay within a byte budget.
+write_data() drops the entry of the file it writes.
 """
 class dura_file():
   """
@@ -64,16 +93,65 @@ class dura_file():
     dura_file are the values returned by hashlib.hexdigest()
   """
   import logging
-  import sys
+  import os
   import hashlib
   import json
-  from   pathlib import Path
+  import mmap
+  import struct
+  import threading
+  from   collections import OrderedDict
+  from   pathlib     import Path
+
+  BINARY_MAGIC   = b'LVDF'
+  BINARY_HEADER  = '<4sBBBBI'    #magic, version, type, algorithm, digest
+                                 #  length, payload length
+  BINARY_KEY     = b'lonesome-vine-dura-file'
+  BINARY_DIGEST_SIZE = 16
+
+  #validated content cache; shared by all dura_file objects in an OS process
+  cache         = OrderedDict()   #abs path -> ((inode, mtime_ns, size), data)
+  cache_budget  = 512 * 1024      #max bytes of cached files; larger files
+                                  #  are not cached
+  cache_lock    = threading.Lock()
+
+  #a lock held by another thread when this OS process forks is never
+  #released in the child; the child gets a new one
+  if(hasattr(os, 'register_at_fork')):
+    os.register_at_fork(after_in_child=lambda: dura_file._after_fork())
+  cache_stats   = {'hits': 0, 'misses': 0, 'evictions': 0, 'bytes': 0}
+
+
+  @classmethod
+  def _after_fork(cls):
+    """
+    Runs in a child OS process created by fork (see os.register_at_fork)
+    """
+    cls.cache_lock = cls.threading.Lock()
 
 
-  def __init__(self):
+  def __init__(self, binary=False):
+    """
+    Args:
+      binary(bool)   write files in the binary container (see module
+                       doc string); reads handle either format
+    """
     self.logger = self.logging.getLogger(__name__)
     self.logger.info('entering: __init__()')
 
+    self.binary = binary
+    self.binary_header_size = self.struct.calcsize(self.BINARY_HEADER)
+
+    #file layout produced by json.dump() of {"hash_info":{}, "data":{}}
+    self.header_template = ('{{"hash_info": {{"algorithm": "sha256", ' +
+                            '"format": "hexdigest", "hash_value": "{}"}}, ' +
+                            '"data": ')
+
+    #byte offsets of the hash and the data in files written by write_data()
+    head = self.header_template.format('|').encode().split(b'|')
+    self.head_start = head[0]
+    self.head_end   = head[1]
+    self.data_start = len(self.head_start) + 64 + len(self.head_end)
+
 
   def file_valid(self, file_name):
     """
@@ -85,6 +163,11 @@ class dura_file():
     level and they will be ignored by dura_file functionality.  
     dura_file only works on the data contained on the value side of 
     the root key named "data"
+
+    Files laid out the way write_data() lays them out are verified by
+    hashing the stored bytes of the "data" section; no JSON is decoded
+    (see _stored_bytes_valid()).  Any other file is decoded and its
+    "data" section re-serialized and hashed.
     
     Args:
       file_name(str)  <file name> or <path + file name>
@@ -102,6 +185,10 @@ class dura_file():
       self.logger.error(f'1 The file: {file_name} does not exist')
     elif(the_file  == None):
       result = False 
+    elif(self._is_binary(file_name)):
+      result = self._read_binary(file_name, decode=False)[0]
+    elif(self._stored_bytes_valid(self._read_bytes(file_name))):
+      result = True
     else:
       json_object = self._extract_file_contents(file_name)   
       if(json_object):
@@ -171,8 +258,16 @@ class dura_file():
     hexdigest (i.e., a hex encoded string representing the hash value 
     generated on this data)
 
+    If the dura_file object was created with binary=True the file is
+    written in the binary container (see module doc string) instead.
+
     Any preexisting file in the same directory with the same file name
-    will be over written
+    will be over written.  The data is serialized once; the same bytes
+    are hashed and written.  The bytes are written to a temporary file
+    (.<file name>.tmp in the same directory), flushed to storage, and
+    then renamed over the target so that a power loss mid-write leaves
+    either the old file or the new file, never a partial one.  Files 
+    are byte for byte the same as those written by earlier versions.
     
     Args:
       file_name(str)         <file name> or <path + file name>
@@ -193,46 +288,187 @@ class dura_file():
         ((not json_object) or (not file_name))):
       self.logger.error('5 Invalid parameter type or value')
     else:
-      json_staging_obj = {
-        'hash_info' : { 
-          'algorithm' : 'sha256',
-          'format' : 'hexdigest',
-          'hash_value' : ''},
-        'data' : {}}
+      data = None
       if(type(json_object) == dict):
-        try:
-          json_staging_obj['data'] = json_object
-        except Exception as e:
-          self.logger.error(f'6 Malformed dict parameter. Exception:{e}')
+        data = json_object
       else:
         try:
-          data_as_json = self.json.loads(json_object)
-          json_staging_obj['data'] = data_as_json
+          data = self.json.loads(json_object)
         except Exception as e:
           self.logger.error(f'7 Malformed str json_object parameter {e}')
           
-      if(json_staging_obj['data']):
+      if(data and self.binary):
+        contents = self._encode_binary(data)
+        if(contents):
+          results = self._write_atomically(file_name, contents)
+      elif(data):
         try:
-          data_as_string = self.json.dumps(json_staging_obj['data'])
-          hash_value_object = self.hashlib.sha256(data_as_string.encode())
-          hash_value = hash_value_object.hexdigest()
-          json_staging_obj['hash_info']['hash_value'] = hash_value
-          try:
-            with open(file_name, 'w+') as data_file:
-              try:
-                self.json.dump(json_staging_obj, data_file)
-                self.sys.stdout.flush()
-                results = True
-              except Exception as e:
-                results = False
-                self.logger.error('8 Could not save JSON object to file. ' +
-                                  f'Exception: {e}')
-          except Exception as e:
-            results = False
-            self.logger.error(f'9 Could not open file: {file_name}. ' +
-                              f'Exception {e}')
+          data_as_bytes = self.json.dumps(data).encode()
+          hash_value = self.hashlib.sha256(data_as_bytes).hexdigest()
         except Exception as e:
           self.logger.error(f'10 Could not hash data. Exception: {e}')
+        else:
+          results = self._write_atomically(
+                      file_name,
+                      self.header_template.format(hash_value).encode() +
+                      data_as_bytes + b'}')
+    self._cache_forget(file_name)
+    return(results)
+
+
+  def read_valid(self, file_name):
+    """
+    Return the data to the right of the "data" key, but only if the file
+    passes its integrity check.  The result is served from the validated
+    content cache (see module doc string) when the file is unchanged
+    since it was last read; otherwise the file is read, verified, decoded
+    and cached.
+
+    The returned data is shared with later callers.  Treat it as read
+    only; copy it before making changes.
+
+    Args:
+      file_name(str)  <file name> or <path + file name>
+
+    Returns:
+      None   the file does not exist
+      False  issue reading the file or integrity check failed
+      <{}>   the JSON object on value side of "data" key
+    """
+    self.logger.info('entering: read_valid()')
+
+    data = None
+    try:
+      key  = self.os.path.abspath(file_name)
+      info = self.os.stat(key)
+    except FileNotFoundError:
+      return(data)
+    except Exception as e:
+      self.logger.error(f'34 Could not stat file: {file_name}. Exception: {e}')
+      return(False)
+
+    identity = (info.st_ino, info.st_mtime_ns, info.st_size)
+    with self.cache_lock:
+      entry = self.cache.get(key)
+      if(entry and (entry[0] == identity)):
+        self.cache.move_to_end(key)
+        self.cache_stats['hits'] += 1
+        return(entry[1])
+      self.cache_stats['misses'] += 1
+
+    data     = False
+    contents = self._read_bytes(key)
+    if(contents == None):
+      pass
+    elif(contents.startswith(self.BINARY_MAGIC)):
+      valid, decoded, digest = self._check_binary(contents)
+      if(valid):
+        data = decoded
+    else:
+      try:
+        if(self._stored_bytes_valid(contents)):
+          data = self.json.loads(contents[self.data_start:-1])
+        else:
+          json_object = self.json.loads(contents)
+          if(json_object['hash_info']['hash_value'] ==
+             self._hash_data(json_object=json_object)):
+            data = json_object['data']
+      except Exception as e:
+        self.logger.error('35 Invalid / damaged JSON object in: ' +
+                          f'{file_name}. Exception: {e}')
+    if(data == False):
+      self.logger.error(f'36 File failed integrity check: {file_name}')
+      self._cache_forget(key)
+    else:
+      self._cache_store(key, identity, data)
+    return(data)
+
+
+  def _cache_store(self, key, identity, data):
+    """
+    Add an entry to the validated content cache, evicting the least
+    recently used entries to stay within the byte budget.
+    """
+    size = identity[2]
+    with self.cache_lock:
+      if(key in self.cache):
+        self.cache_stats['bytes'] -= self.cache.pop(key)[0][2]
+      if(size <= self.cache_budget):
+        self.cache[key] = (identity, data)
+        self.cache_stats['bytes'] += size
+        while(self.cache_stats['bytes'] > self.cache_budget):
+          evicted = self.cache.popitem(last=False)
+          self.cache_stats['bytes'] -= evicted[1][0][2]
+          self.cache_stats['evictions'] += 1
+
+
+  def _cache_forget(self, file_name):
+    """
+    Drop the validated content cache entry for a file, if any.
+    """
+    try:
+      key = self.os.path.abspath(file_name)
+      with self.cache_lock:
+        if(key in self.cache):
+          self.cache_stats['bytes'] -= self.cache.pop(key)[0][2]
+    except Exception:
+      pass
+
+
+  def _write_atomically(self, file_name, contents):
+    """
+    Write 'contents' to a temporary file, fsync it, rename it over
+    'file_name', then fsync the directory so the rename itself survives
+    a power loss.
+
+    Args:
+      file_name(str)    <file name> or <path + file name>
+      contents(bytes)   complete file contents
+
+    Returns:
+      True      file write succeeded
+      False     file write failed; 'file_name' untouched
+    """
+    self.logger.info('entering: _write_atomically()')
+
+    results   = False
+    target    = self.Path(file_name)
+    temp_file = target.with_name('.' + target.name + '.tmp')
+    try:
+      with open(temp_file, 'wb') as data_file:
+        try:
+          data_file.write(contents)
+          data_file.flush()
+          self.os.fsync(data_file.fileno())
+          results = True
+        except Exception as e:
+          self.logger.error('8 Could not save JSON object to file. ' +
+                            f'Exception: {e}')
+    except Exception as e:
+      self.logger.error(f'9 Could not open file: {file_name}. ' +
+                        f'Exception {e}')
+
+    if(results):
+      try:
+        self.os.replace(temp_file, target)
+      except Exception as e:
+        results = False
+        self.logger.error(f'27 Could not rename temp file to: {file_name}. ' +
+                          f'Exception {e}')
+      else:
+        try:
+          dir_fd = self.os.open(target.parent, self.os.O_RDONLY)
+          try:
+            self.os.fsync(dir_fd)
+          finally:
+            self.os.close(dir_fd)
+        except Exception:
+          pass                #directories cant be opened on win32 (dev)
+    if(not results):
+      try:
+        temp_file.unlink()
+      except Exception:
+        pass
     return(results)
 
 
@@ -283,6 +519,15 @@ class dura_file():
       self.logger.error(f'13 The file: {file_name} does not exist.')
     elif(the_file == None):
       json_object = False 
+    elif(self._is_binary(file_name)):
+      valid, data, digest = self._read_binary(file_name)
+      if(data != None):
+        json_object = {'hash_info' : {'algorithm'  : 'blake2b',
+                                      'format'     : 'keyed',
+                                      'hash_value' : digest},
+                       'data'      : data}
+      else:
+        json_object = False
     else:
       try:
         with open(file_name) as data_file:
@@ -307,9 +552,15 @@ class dura_file():
     checked against a hash value generated by this function in order
     to detect a match or mismatch.
 
+    Binary container files (see module doc string), passed as a file
+    name or as bytes, are checked against their keyed digest.  Files
+    or strings laid out the way write_data() lays them out are checked
+    without decoding JSON (see _stored_bytes_valid()).
+
     Args:
-      json_object (str/dict)   str or dict representing JSON object
-      file_name (str)          Name of file containing JSON object
+      json_object (str/dict/bytes)  str or dict representing JSON object
+                                      or bytes read from a file
+      file_name (str)               Name of file containing JSON object
       
     Returns:
       None    issue before hash comparision could be made
@@ -320,10 +571,28 @@ class dura_file():
 
     result = None
     if(((type(json_object) != str) and (type(json_object) != dict) and
-        (type(file_name) != str)) or
+        (type(json_object) != bytes) and (type(file_name) != str)) or
        ((not json_object) and (not file_name))):
       self.logger.error('16 Invalid parameter type or value')
+    elif((file_name) and (type(file_name) == str) and 
+         self._is_binary(file_name)):
+      result = self._read_binary(file_name, decode=False)[0]
+    elif((not file_name) and (type(json_object) == bytes) and
+         json_object.startswith(self.BINARY_MAGIC)):
+      result = self._check_binary(json_object, decode=False)[0]
+    elif((file_name) and (type(file_name) == str) and 
+         self._stored_bytes_valid(self._read_bytes(file_name))):
+      result = True
+    elif((not file_name) and (type(json_object) in (str, bytes)) and
+         self._stored_bytes_valid(json_object)):
+      result = True
     else:
+      if((not file_name) and (type(json_object) == bytes)):
+        try:
+          json_object = json_object.decode()
+        except Exception as e:
+          self.logger.error(f'28 Undecodable bytes parameter. Exception: {e}')
+          json_object = False
       if((file_name) and (type(file_name) == str)):
         json_object = self._extract_file_contents(file_name)   
       elif((json_object) and (type(json_object) == str)):
@@ -356,6 +625,185 @@ class dura_file():
     return(result)
 
 
+  def _read_bytes(self, file_name):
+    """
+    Returns:
+      None       file could not be read
+      bytes      the file's contents
+    """
+    self.logger.info('entering: _read_bytes()')
+
+    contents = None
+    try:
+      with open(file_name, 'rb') as data_file:
+        contents = data_file.read()
+    except Exception as e:
+      self.logger.error(f'33 Could not read file: {file_name}. Exception: {e}')
+    return(contents)
+
+
+  def _stored_bytes_valid(self, contents):
+    """
+    Decode free check of a JSON text dura_file.  write_data() writes a
+    fixed header, holding the hash at a fixed offset, followed by the
+    exact bytes that were hashed and a closing brace.  For such contents
+    the stored bytes of the "data" section are hashed directly.
+
+    Contents with any other layout (e.g., written by another platform's
+    JSON library), or whose hash does not match, return False; callers
+    then fall back to decoding so a file is never wrongly rejected.
+
+    Args:
+      contents(str/bytes)   complete file contents
+
+    Returns:
+      True       layout recognized and hash matches
+      False      not recognized or no match; decode to be certain
+    """
+    self.logger.info('entering: _stored_bytes_valid()')
+
+    result = False
+    try:
+      if(type(contents) == str):
+        contents = contents.encode()
+      if((type(contents) == bytes) and
+         contents.startswith(self.head_start) and
+         (contents[self.data_start - len(self.head_end):self.data_start] ==
+          self.head_end) and
+         contents.endswith(b'}')):
+        supplied_hash = contents[len(self.head_start):
+                                 len(self.head_start) + 64].decode()
+        with memoryview(contents)[self.data_start:-1] as data:
+          result = (self.hashlib.sha256(data).hexdigest() == supplied_hash)
+    except Exception:
+      result = False
+    return(result)
+
+
+  def _is_binary(self, file_name):
+    """
+    Returns:
+      True     file starts with the binary container's magic bytes
+      False    it doesnt (or cant be read); treat as JSON text
+    """
+    self.logger.info('entering: _is_binary()')
+
+    result = False
+    try:
+      with open(file_name, 'rb') as data_file:
+        result = (data_file.read(len(self.BINARY_MAGIC)) == self.BINARY_MAGIC)
+    except Exception:
+      pass
+    return(result)
+
+
+  def _digest(self, payload):
+    """
+    Args:
+      payload(bytes/memoryview)   stored payload bytes
+
+    Returns:
+      bytes      keyed BLAKE2b digest of the payload
+    """
+    return(self.hashlib.blake2b(payload, key=self.BINARY_KEY,
+                                digest_size=self.BINARY_DIGEST_SIZE).digest())
+
+
+  def _encode_binary(self, data):
+    """
+    Args:
+      data({})   the data to the right of the "data" key
+
+    Returns:
+      None       data could not be encoded
+      bytes      complete binary container file contents
+    """
+    self.logger.info('entering: _encode_binary()')
+
+    contents = None
+    try:
+      payload  = self.json.dumps(data, separators=(',', ':')).encode()
+      contents = (self.struct.pack(self.BINARY_HEADER, self.BINARY_MAGIC,
+                                   1, 1, 1, self.BINARY_DIGEST_SIZE,
+                                   len(payload)) +
+                  self._digest(payload) + payload)
+    except Exception as e:
+      self.logger.error(f'29 Could not encode binary container. Exception: {e}')
+    return(contents)
+
+
+  def _check_binary(self, contents, decode=True):
+    """
+    Verify binary container contents, held in memory or memory-mapped,
+    against the stored digest.  The payload is only decoded if 'decode'
+    is True and the digest matches.
+
+    Args:
+      contents(bytes/mmap)   complete binary container file contents
+      decode(bool)           return the decoded payload
+
+    Returns:
+      (valid, data, digest)  valid: True / False
+                             data: the data to the right of the "data"
+                               key, or None if not decoded / not valid
+                             digest: hex string of the stored digest
+    """
+    self.logger.info('entering: _check_binary()')
+
+    valid  = False
+    data   = None
+    digest = ''
+    try:
+      (magic, version, payload_type, algorithm, digest_size, payload_size) = (
+        self.struct.unpack_from(self.BINARY_HEADER, contents, 0))
+      start = self.binary_header_size + digest_size
+      if((magic == self.BINARY_MAGIC) and (version == 1) and
+         (payload_type == 1) and (algorithm == 1) and
+         (digest_size == self.BINARY_DIGEST_SIZE) and
+         (len(contents) == start + payload_size)):
+        view = memoryview(contents)
+        try:
+          stored = bytes(view[self.binary_header_size:start])
+          digest = stored.hex()
+          with view[start:] as payload:
+            valid = (self._digest(payload) == stored)
+            if(valid and decode):
+              payload = bytes(payload)
+        finally:
+          view.release()
+        if(valid and decode):
+          data = self.json.loads(payload)
+      else:
+        self.logger.error('30 Unsupported or truncated binary container')
+    except Exception as e:
+      valid = False
+      data  = None
+      self.logger.error(f'31 Invalid binary container. Exception: {e}')
+    return((valid, data, digest))
+
+
+  def _read_binary(self, file_name, decode=True):
+    """
+    Memory-map a binary container file and verify it; see 
+    _check_binary()
+
+    Returns:
+      (valid, data, digest)
+    """
+    self.logger.info('entering: _read_binary()')
+
+    result = (False, None, '')
+    try:
+      with open(file_name, 'rb') as data_file:
+        with self.mmap.mmap(data_file.fileno(), 0,
+                            access=self.mmap.ACCESS_READ) as contents:
+          result = self._check_binary(contents, decode=decode)
+    except Exception as e:
+      self.logger.error(f'32 Could not read binary container: {file_name}. ' +
+                        f'Exception: {e}')
+    return(result)
+
+
   def hash_string(self, string):
     """
     Hash an arbitrary string using sha256 and return the hexdigest
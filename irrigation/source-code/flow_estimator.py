@@ -0,0 +1,216 @@
+"""
+Jaye Hicks 2021
+
+Obligatory legal disclaimer:
+  You are free to use this source code (this file and all other files
+  referenced in this file) "AS IS" WITHOUT WARRANTY OF ANY KIND, EITHER
+  EXPRESSED OR IMPLIED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+  THE ENTIRE RISK AS TO THE QUALITY AND PERFORMANCE OF THIS SOURCE CODE
+  IS WITH YOU.  SHOULD THE SOURCE CODE PROVE DEFECTIVE, YOU ASSUME THE
+  COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU
+  GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
+
+Objects of type flow_estimator() maintain a running estimate of the
+water flow rate (gallons per minute) observed by the flow sensor
+during an irrigation event.  Pulses are counted into per-minute
+buckets held in a small ring (i.e., one bucket per minute for the
+length of the window).  Each time a minute closes out its pulse count
+is folded into an exponentially weighted moving average.
+
+Two rates are available at any moment:
+- windowed rate: pulses counted across the last 'window_mins' complete
+  minutes divided by the number of those minutes.  This is the rate
+  used to detect under flow and over flow conditions.
+- weighted rate: the exponentially weighted moving average of the
+  per-minute pulse counts.  Reacts faster than the windowed rate.
+
+Adding a pulse is O(1).  Minutes that pass without any pulses (e.g., a
+stuck valve) are closed out, as zero flow minutes, the next time a
+pulse arrives or a rate is requested.  Minutes are counted from the
+call to start() made when the valve opens, so a valve that never
+delivers any water still shows zero flow.  The GPIO callback thread adds
+pulses while the main thread requests rates, so a lock guards the
+buckets.
+
+Usage:
+  >>> import flow_estimator
+  >>> fe = flow_estimator.flow_estimator(window_mins=5)
+  >>> for sec in range(0, 600, 4):
+  >>>   fe.add(1635696000 + sec)
+  >>> fe.windowed_rate(1635696600)
+  15.0
+"""
+class flow_estimator():
+  import logging
+  import threading
+  from   array import array
+
+
+  def __init__(self, window_mins=5, alpha=0.3, gals_per_pulse=1):
+    """
+    Args:
+      window_mins(int)      number of complete minutes in the window
+      alpha(float)          weight (0 - 1) given to the newest minute
+                              in the weighted moving average
+      gals_per_pulse(int)   gallons of water represented by one pulse
+    """
+    self.logger = self.logging.getLogger(__name__)
+    self.logger.info('entering: __init__()')
+
+    self.window_mins    = max(int(window_mins), 1)
+    self.alpha          = alpha
+    self.gals_per_pulse = gals_per_pulse
+    self.lock           = self.threading.Lock()
+    self.reset()
+
+
+  def reset(self):
+    """
+    Discard all pulses counted so far.
+    """
+    self.logger.info('entering: reset()')
+
+    self.ring_minutes = self.array('q', [-1] * self.window_mins)
+    self.ring_counts  = self.array('q', [0] * self.window_mins)
+    self.first_minute = None    # minute of start() or the first pulse
+    self.cur_minute   = None    # minute of the open (incomplete) bucket
+    self.cur_count    = 0       # pulses in the open bucket
+    self.ewma         = None    # pulses per minute
+
+
+  def _close_through(self, minute):
+    """
+    Close out every bucket older than 'minute'.  Runs while holding
+    the lock.  The number of iterations is capped at the window size
+    so a long gap between pulses costs no more than one full window.
+
+    Args:
+      minute(int)    epoch minute (epoch secs // 60) that is now open
+    """
+    if((self.cur_minute == None) or (minute <= self.cur_minute)):
+      return
+
+    gap = minute - self.cur_minute
+    if(gap > self.window_mins):
+      # fold in the open bucket, then skip ahead over empty minutes
+      self._fold(self.cur_minute, self.cur_count)
+      skipped = gap - 1
+      if(self.ewma != None):
+        self.ewma *= (1 - self.alpha) ** skipped
+      for index in range(self.window_mins):
+        self.ring_minutes[index] = -1
+        self.ring_counts[index]  = 0
+    else:
+      self._fold(self.cur_minute, self.cur_count)
+      for empty_minute in range(self.cur_minute + 1, minute):
+        self._fold(empty_minute, 0)
+    self.cur_minute = minute
+    self.cur_count  = 0
+
+
+  def _fold(self, minute, count):
+    """
+    Store a completed minute in the ring and the weighted average.
+    """
+    index = minute % self.window_mins
+    self.ring_minutes[index] = minute
+    self.ring_counts[index]  = count
+    if(self.ewma == None):
+      self.ewma = float(count)
+    else:
+      self.ewma += self.alpha * (count - self.ewma)
+
+
+  def start(self, time_stamp):
+    """
+    The valve has opened; minutes are counted from now, pulses or not.
+    Does nothing once minutes are already being counted.
+
+    Args:
+      time_stamp(int)     epoch time stamp the valve opened
+    """
+    self.logger.info('entering: start()')
+
+    minute = time_stamp // 60
+    with self.lock:
+      if(self.cur_minute == None):
+        self.first_minute = minute
+        self.cur_minute   = minute
+
+
+  def add(self, time_stamp, pulses=1):
+    """
+    Count pulse(s) received from the water flow sensor.
+
+    Args:
+      time_stamp(int)     epoch time stamp of the pulse
+      pulses(int)         number of pulses received
+    """
+    minute = time_stamp // 60
+    with self.lock:
+      if(self.cur_minute == None):
+        self.first_minute = minute
+        self.cur_minute   = minute
+      elif(minute != self.cur_minute):
+        self._close_through(minute)
+      self.cur_count += pulses
+
+
+  def complete_minutes(self, time_stamp):
+    """
+    Args:
+      time_stamp(int)     epoch time stamp for 'now'
+
+    Returns:
+      int                 number of complete minutes observed since
+                            start() or the first pulse, capped at the
+                            window size
+    """
+    with self.lock:
+      if(self.first_minute == None):
+        return(0)
+      return(min(max((time_stamp // 60) - self.first_minute, 0),
+                 self.window_mins))
+
+
+  def windowed_rate(self, time_stamp):
+    """
+    Args:
+      time_stamp(int)     epoch time stamp for 'now'
+
+    Returns:
+      None                no complete minute has been observed yet
+      float               gallons per minute across the window
+    """
+    rate   = None
+    minute = time_stamp // 60
+    with self.lock:
+      self._close_through(minute)
+      if(self.first_minute != None):
+        num_mins = min(minute - self.first_minute, self.window_mins)
+        if(num_mins > 0):
+          oldest = minute - num_mins
+          pulses = 0
+          for index in range(self.window_mins):
+            if(oldest <= self.ring_minutes[index] < minute):
+              pulses += self.ring_counts[index]
+          rate = pulses * self.gals_per_pulse / num_mins
+    return(rate)
+
+
+  def weighted_rate(self, time_stamp):
+    """
+    Args:
+      time_stamp(int)     epoch time stamp for 'now'
+
+    Returns:
+      None                no complete minute has been observed yet
+      float               exponentially weighted gallons per minute
+    """
+    rate = None
+    with self.lock:
+      self._close_through(time_stamp // 60)
+      if(self.ewma != None):
+        rate = self.ewma * self.gals_per_pulse
+    return(rate)
@@ -75,25 +75,86 @@ before moving on with processing.
 It is possible that this module will exit before accept / reject 
 results come back, from AWS IoT Core, for each individual shadow 
 document update made by this module.  An argument can be passed to 
-this module to instruct it to either wait (i.e., a fixed amount of 
-time) or not wait for the results of all of the IoT shadow document 
+this module to instruct it to either wait (i.e., up to a fixed amount
+of time) or not wait for the results of all of the IoT shadow document 
 updates that it placed on the queue.  If this module exits before 
 learning the result for an individual IoT shadow document update(s), 
 the IoT shadow document update(s) will be transmitted again (i.e., the
 gals disp message will be sent again) the next time this module is
 executed.  This does not pose an issue as the processing of gals_disp
  messages on the AWS backend is idempotent.
+
+Gallons dispensed messages may also be waiting in the gals_disp
+comms_mailbox() (see comms_mailbox.py) rather than in individual files.
+Mailbox messages are named as the files would be and are sent right
+after the files.  Instead of deleting / moving a message, its state in
+the mailbox is updated: 'sent' once on the queue, 'acknowledged' on
+success feedback, 'failed' otherwise.  Sent messages lacking feedback
+are sent again next time.  Compacting the mailbox (see irr_cntrl.py)
+writes failed messages to the bad comms folder.
+
+The shadow documents of all blocks are updated over a single MQTT
+connection to IoT Core (one TLS handshake), made on first use and kept
+for the life of the OS process; in supervisor mode (see irr_cntrl.py)
+that is across cycles.  The connection authenticates with the
+certificate of the block named by 'cert_block'; that certificate's IoT
+policy must allow updates to the shadow documents of every block.  A
+failed connection attempt is not repeated for 'retry_secs'.
+
+Messages (files and mailbox messages) waiting for the same block are
+merged, up to 'coalesce_max' at a time, into one shadow document
+update; after an outage that is one MQTT round trip for a block's
+backlog rather than one per message.  A single message is sent in the
+flat format the AWS backend has always read, plus "records": null.
+Merged messages are sent as:
+
+  {"state":{"reported":{"block": "block_x",
+                        "records": [<gals_disp message>, ...],
+                        "sched_id": null, "date": null,
+                        "sequence": null, "gallons": null}}}
+
+IoT Core merges an update into the reported state rather than
+replacing it.  Setting the other format's fields to null removes
+them, so neither format's fields linger after an update in the other.
+
+IoT Core's accept / reject of the update applies to every message it
+carries, and so to each of their files / mailbox messages.
 """
 class gals_disp():
   import logging
   import json
+  import os
+  import threading
   import time
-  from   AWSIoTPythonSDK.MQTTLib  import AWSIoTMQTTShadowClient
+  import concurrent.futures
   from   pathlib                  import Path
   from   datetime                 import datetime, timedelta
 
   import dura_file
   import lv_paths
+  import comms_mailbox
+
+  import lazy_import    #heavy SDKs are imported on first use
+  AWSIoTMQTTShadowClient = lazy_import.lazy_import('AWSIoTPythonSDK.MQTTLib',
+                                                   'AWSIoTMQTTShadowClient')
+
+  #MQTT connection; shared by all gals_disp objects in an OS process
+  mqtt      = {'pid'       : None,
+               'client'    : None,    #connected AWSIoTMQTTShadowClient
+               'shadows'   : {},      #block -> shadow handler
+               'failed_at' : None}    #monotonic secs of failed connect
+  mqtt_lock = threading.Lock()
+  #the child of a fork gets a new lock; see _after_fork()
+  if(hasattr(os, 'register_at_fork')):
+    os.register_at_fork(after_in_child=lambda: gals_disp._after_fork())
+
+
+  @classmethod
+  def _after_fork(cls):
+    """
+    Runs in a child OS process created by fork (see os.register_at_fork)
+    """
+    cls.mqtt_lock = cls.threading.Lock()
 
 
   def __init__(self):
@@ -105,13 +166,20 @@ class gals_disp():
     self.env            = 'debug' # set to 'debug' or 'prod'
     self.df             = self.dura_file.dura_file()
     self.paths          = self.lv_paths.lv_paths()
-    self.device_shadows = {}
+    self.mailbox        = self.comms_mailbox.comms_mailbox('gals_disp',
+                                                      paths=self.paths)
+    self.budget         = None    #shared time budget; see send()
+    self.ack_lock       = self.threading.Lock()  #status vs MQTT callback
+    self.q_messages     = {}
+    self.old_tokens     = set()   #tokens of earlier send()s
 
     if(self.env   == 'debug'):
       self.config = {
         'max_age_days' : 2,  # upload files aged past threshold to S3
-        'wait_retries' : 4,
-        'wait_secs'    : 10,
+        'wait_secs'    : 40,  # most time to wait for shadow update acks
+        'retry_secs'   : 60,  # between failed MQTT connection attempts
+        'coalesce_max' : 32,  # messages merged into one shadow update
+        'old_tokens'   : 1024,  # most earlier tokens kept for late acks
         'region'       : 'us-east-1',
         'blocks'       : ['block_a','block_b','block_c','block_d','block_e',
                           'block_f','block_g','block_x'],
@@ -125,9 +193,11 @@ class gals_disp():
           'block_g' : '7777777777777777777777777777777777777777777777777777777777777777',
           'block_x' : '8888888888888888888888888888888888888888888888888888888888888888'}, #for debug
         'mqtt_values': {
-          'host_name' : 
+          'host_name'  : 
             'abcdefghijklmon-ats.iot.us-east-1.amazonaws.com',
-          'mqtt_port' : 8883},
+          'mqtt_port'  : 8883,
+          'client_id'  : 'lv_irr_gals_disp',  #OS process id is appended
+          'cert_block' : 'block_a'},          #certificate for connection
 
         # AWSIoTPythonSDK.MQTTLib throws this exception for network issues:
         #    '[Errno 11001] getaddrinfo failed'
@@ -135,8 +205,10 @@ class gals_disp():
     else: 
       self.config = {
         'max_age_days' : 2,  # upload files aged past threshold to S3
-        'wait_retries' : 4,
-        'wait_secs'    : 10,
+        'wait_secs'    : 40,  # most time to wait for shadow update acks
+        'retry_secs'   : 60,  # between failed MQTT connection attempts
+        'coalesce_max' : 32,  # messages merged into one shadow update
+        'old_tokens'   : 1024,  # most earlier tokens kept for late acks
         'region'       : 'us-east-1',
         'blocks'       : ['block_a','block_b','block_c','block_d','block_e',
                           'block_f','block_g'],
@@ -149,9 +221,11 @@ class gals_disp():
           'block_f' : '6666666666666666666666666666666666666666666666666666666666666666',
           'block_g' : '7777777777777777777777777777777777777777777777777777777777777777'},
         'mqtt_values': {
-          'host_name' : 
+          'host_name'  : 
             'abcdefghijklmon-ats.iot.us-east-1.amazonaws.com',
-          'mqtt_port' : 8883},
+          'mqtt_port'  : 8883,
+          'client_id'  : 'lv_irr_gals_disp',  #OS process id is appended
+          'cert_block' : 'block_a'},          #certificate for connection
           
         # AWSIoTPythonSDK.MQTTLib throws this exception for network issues:
         #    '[Errno 11001] getaddrinfo failed'
@@ -160,6 +234,23 @@ class gals_disp():
     self._reset_status()
 
 
+  def _proceed(self):
+    """
+    Returns:
+      True      go ahead with the next transmission
+      False     the shared time budget is spent (see send_budget.py)
+    """
+    return((self.budget == None) or self.budget.proceed('gals_disp'))
+
+
+  def _note(self, secs, num_bytes):
+    """
+    Account for a transmission against the shared time budget
+    """
+    if(self.budget):
+      self.budget.note('gals_disp', secs, num_bytes)
+
+
   def _gals_disp_file_aged_past_limit(self, file_name):
     """
     Example gals dispensed flat file:
@@ -205,7 +296,14 @@ class gals_disp():
 
     self.comms_ok   = None
     self.wait       = False
-    self.q_messages = {}   # all messages placed on queue for all shadows
+    with self.ack_lock:
+      self.old_tokens.update(self.q_messages)
+      if(len(self.old_tokens) > self.config['old_tokens']):
+        self.old_tokens = set(self.q_messages)
+      self.q_messages = {}   # all messages placed on queue for all shadows
+      self.acks       = {}   # token -> Future; done when IoT Core responds
+      self.early_acks = {}   # token -> (payload, status); beat q_messages
+      self.taking_acks = True  # False once clean up has started
     self.trans_good = []   # all files successfully placed on queue
     self.trans_bad  = []   # all files that couldnt be placed on queue
     self.rec_good   = []   # all files resulting in shadow update success
@@ -214,6 +312,8 @@ class gals_disp():
     self.clean_bad  = []   # all files that couldnt be deleted
     self.move_good  = []   # all suspect files successfully moved
     self.move_bad   = []   # all suspect files that couldnt be moved
+    self.mb_messages = {}  # mailbox message name -> [mailbox message ids]
+    self.batches    = {}   # block -> [(name, data, path, msg_id)] to send
 
  
   def good_comms(self):
@@ -261,12 +361,65 @@ class gals_disp():
     return(len(self.move_bad))
 
 
+  def _get_mqtt_client(self):
+    """
+    The one MQTT connection over which the shadow documents of all
+    blocks are updated (see module doc string).  An OS process created
+    by fork makes its own; the parent's connection isnt usable in it.
+    Call holding mqtt_lock.
+
+    Returns:
+      None             not connected
+      client           connected AWSIoTMQTTShadowClient
+    """
+    self.logger.info('entering: _get_mqtt_client()')
+
+    state = self.mqtt
+    if(state['pid'] != self.os.getpid()):
+      state.update({'pid' : self.os.getpid(), 'client' : None,
+                    'shadows' : {}, 'failed_at' : None})
+
+    if((state['client'] == None) and
+       ((state['failed_at'] == None) or
+        (self.time.monotonic() - state['failed_at'] >
+         self.config['retry_secs']))):
+      values    = self.config['mqtt_values']
+      client_id = values['client_id'] + '_' + str(self.os.getpid())
+      try:
+        a_client = self.AWSIoTMQTTShadowClient(client_id)
+        a_client.configureEndpoint(values['host_name'], values['mqtt_port'])
+
+        dir_prefix   = (self.paths.get_path('shadow_sec') +
+                        self.paths.divider)
+        block_prefix = (dir_prefix +
+                        self.config['shadow_sec'][values['cert_block']])
+        a_client.configureCredentials(dir_prefix + 'Amazon_root_CA_1.pem',
+                                      block_prefix +'-private.pem.key',
+                                      block_prefix + '-certificate.pem.crt')
+
+        a_client.configureConnectDisconnectTimeout(10)
+        a_client.configureMQTTOperationTimeout(5)
+
+        if(a_client.connect()):
+          state['client']    = a_client
+          state['failed_at'] = None
+        else:
+          state['failed_at'] = self.time.monotonic()
+          self.logger.error('2 Couldnt connect to IoT Core for shadow ' +
+                            'documents')
+      except Exception:
+        state['failed_at'] = self.time.monotonic()
+        raise          #callers look for comms_down_msg in the exception
+    return(state['client'])
+
+
   def _get_device_shadow_client(self, block):
     """
     This function will either return a preexisting shadow document
-    client for the specified block or create one for it.  Reuse of
-    shadow document clients is enabled due to the 'True' flag in the 
-    createShadowHandlerWithName() call.
+    client for the specified block or create one for it.  All shadow
+    document clients share the one MQTT connection (see
+    _get_mqtt_client()).  Reuse of shadow document clients is enabled
+    due to the 'True' flag in the createShadowHandlerWithName() call.
 
     Args:
       block(str)       the block which received the irrigation
@@ -282,36 +435,21 @@ class gals_disp():
     if(block and (type(block) == str)):
       block = (block.strip()).lower()
       if(block in self.config['blocks']):
-        if(block in self.device_shadows):
-          a_device_shadow = self.device_shadows[block]
-        else:
-          a_client = self.AWSIoTMQTTShadowClient(block)
-          a_client.configureEndpoint(self.config['mqtt_values']['host_name'],
-                                     self.config['mqtt_values']['mqtt_port'])
-      
-          dir_prefix   = (self.paths.get_path('shadow_sec') +
-                          self.paths.divider)
-          block_prefix = dir_prefix + self.config['shadow_sec'][block]
-          a_client.configureCredentials(dir_prefix + 'Amazon_root_CA_1.pem',
-                                        block_prefix +'-private.pem.key',
-                                        block_prefix + '-certificate.pem.crt')
-
-          a_client.configureConnectDisconnectTimeout(10)
-          a_client.configureMQTTOperationTimeout(5)
-          
-          if(not a_client.connect()):
-            self.logger.error(f'2 Couldnt connect to block: {block} ' + 
-                               'shadow document')
-          else:
-            a_device_shadow = a_client.createShadowHandlerWithName(block, True)
-            self.device_shadows[block] = a_device_shadow
+        with self.mqtt_lock:
+          a_client = self._get_mqtt_client()
+          if(a_client):
+            shadows = self.mqtt['shadows']
+            if(not block in shadows):
+              shadows[block] = a_client.createShadowHandlerWithName(block,
+                                                                    True)
+            a_device_shadow = shadows[block]
       else:
         self.logger.error(f'3 Block specification: {block} is invalid.')
 
     return(a_device_shadow)
   
   
-  def _update_shadow_document(self, block, update, filename):
+  def _update_shadow_document(self, block, update, names):
     """
     This function updates the IoT Core shadow document for a given 
     vineyard block.  This happens using two distinct processes.  
@@ -336,6 +474,7 @@ class gals_disp():
     Args:
       block(str)               the block that received the irrigaiton
       update(Python dict)      the irrigation data
+      names([])                files / mailbox messages the data is from
 
     Returns
       None    issue before call to shadowUpdate()
@@ -360,9 +499,17 @@ class gals_disp():
             # and '_my_shadow_update_callback()' as specified below
             # will be called by IoT Core, with success / failure of
             # the shadow update, whenever IoT Core decides to do so.
+            started = self.time.monotonic()
             token = a_device_shadow.shadowUpdate(update_string, 
                                         self._my_shadow_update_callback, 5)
-            self.q_messages[str(token)] = filename
+            self._note(self.time.monotonic() - started,
+                       len(update_string.encode()))
+            token = str(token).strip()
+            with self.ack_lock:
+              self.q_messages[token] = names
+              self.acks[token]       = self.concurrent.futures.Future()
+              if(token in self.early_acks):
+                self._record_ack(token, *self.early_acks.pop(token))
             result = True
           except Exception as e:
             result = False
@@ -393,6 +540,12 @@ class gals_disp():
     will be due to an error condition (e.g., comms link to AWS backend
     is down).
 
+    Runs on the SDK's thread.  A response can arrive before
+    shadowUpdate() has returned the token to _update_shadow_document();
+    it is held in 'early_acks' until the token is recorded.  Responses
+    arriving once local files are being cleaned up, or for a token of
+    an earlier send(), are dropped; the data is sent again next time.
+
     Args:
       payload(str)           data sent in for update plus extra stuff 
       response_status(str)   can be 'accepted' or 'rejected'
@@ -401,31 +554,44 @@ class gals_disp():
     self.logger.info('entering: _my_shadow_update_callback()')
 
     token = str(token).strip()
-    if(token in self.q_messages):
-      if(payload):
-        try:
-          data = (self.json.loads(payload))['state']['reported']
-          block = data['block']
-        except Exception as e:
-          self.logger.error('8 recieved invalid payload from IoT Core. ' +
-                            f'Exception: {e}')
-        if(response_status == 'accepted'): 
-          self.rec_good.append(self.q_messages[token])
-        else:
-          self.rec_bad.append(self.q_messages[token])
-          self.logger.error('9 Failure updating shadow document for block:' +
-                            f' {block}')
+    with self.ack_lock:
+      if((not self.taking_acks) or (token in self.old_tokens)):
+        self.logger.info(f'Late shadow update response; token: {token}')
+      elif(token in self.q_messages):
+        self._record_ack(token, payload, response_status)
       else:
-        self.logger.error('10 Empty payload received from IoT Core service.')
-        if(response_status == 'accepted'): 
-          self.rec_good.append(self.q_messages[token])
-        else:
-          self.rec_bad.append(self.q_messages[token])
-          self.logger.error('40 Failure updating shadow document for file: ' +
-                           f'{self.q_messages[token]}')
+        self.early_acks[token] = (payload, response_status)
+
+
+  def _record_ack(self, token, payload, response_status):
+    """
+    Record IoT Core's response to a shadow document update and complete
+    the token's Future.  Call holding ack_lock.
+    """
+    block = None
+    if(payload):
+      try:
+        data = (self.json.loads(payload))['state']['reported']
+        block = data['block']
+      except Exception as e:
+        self.logger.error('8 recieved invalid payload from IoT Core. ' +
+                          f'Exception: {e}')
+      if(response_status == 'accepted'): 
+        self.rec_good.extend(self.q_messages[token])
+      else:
+        self.rec_bad.extend(self.q_messages[token])
+        self.logger.error('9 Failure updating shadow document for block:' +
+                          f' {block}')
     else:
-      self.logger.error('11 No record of sending this gals_disp message. Cant' +
-                        'find and automatically delete local gals_disp file.')
+      self.logger.error('10 Empty payload received from IoT Core service.')
+      if(response_status == 'accepted'): 
+        self.rec_good.extend(self.q_messages[token])
+      else:
+        self.rec_bad.extend(self.q_messages[token])
+        self.logger.error('40 Failure updating shadow document for files: ' +
+                         f'{self.q_messages[token]}')
+    if(not self.acks[token].done()):
+      self.acks[token].set_result(response_status)
 
 
   def _data_valid(self, path):
@@ -447,27 +613,17 @@ class gals_disp():
       file = self.Path(path)
       if(file.exists() and file.is_file()):
         try:
-          with path.open('r') as fd:
-            contents = fd.read()
-            try:
-              data = (self.json.loads(contents))['data']
-              if(((type(data['date']) == str) and (len(data['date']) == 10)) and
-                 (data['sched_id'] >= 0) and
-                 (data['sequence'] > 0) and 
-                 (data['block'] in self.config['blocks']) and
-                 (data['gallons'] > 0) and
-                 (data['flow'] > 0)):
-                result = True
-              else:
-                result = False
-                self.logger.error('12 Malformed / missing data in:' +
-                                  f' {file.name}')
-            except Exception as e:
-              result = False
-              self.logger.error(f'13 Invalide JSON in: {file.name}. ' +
-                                f'Exception: {e}')
+          data = self.df.read_valid(str(path))     #cached; read only
+          if(self._message_valid(data)):
+            result = True
+          else:
+            result = False
+            self.logger.error('12 Malformed / missing data in:' +
+                              f' {file.name}')
         except Exception as e:
-          self.logger.error(f'14 Could not open file. Exception: {e}')
+          result = False
+          self.logger.error(f'13 Invalide JSON in: {file.name}. ' +
+                            f'Exception: {e}')
       else:
         self.logger.error(f'15 Item: {path} does not exist or is not a file.')
     else:
@@ -475,6 +631,23 @@ class gals_disp():
     return(result)
 
 
+  def _message_valid(self, data):
+    """
+    Args:
+      data(dict)    a gallons dispensed message
+
+    Returns:
+      True          required fields present and sensible
+      False         they are not (a missing field raises an exception)
+    """
+    return(((type(data['date']) == str) and (len(data['date']) == 10)) and
+           (data['sched_id'] >= 0) and
+           (data['sequence'] > 0) and 
+           (data['block'] in self.config['blocks']) and
+           (data['gallons'] > 0) and
+           (data['flow'] > 0))
+
+
   def _file_valid(self, path):
     """
     Uses dura_file() class functionality to determine validity
@@ -494,12 +667,10 @@ class gals_disp():
       file = self.Path(path)
       if(file.exists() and file.is_file()):
         try:
-          with path.open('r') as fd:
-            contents = fd.read()
-            if(self.df.check_object(json_object=contents)):
-              result = True
-            else:
-              result = False
+          if(self.df.read_valid(str(path))):      #cached for later reads
+            result = True
+          else:
+            result = False
         except Exception as e:
           self.logger.error(f'17 Could not open file. Exception: {e}')
       else:
@@ -567,91 +738,144 @@ class gals_disp():
  
   def _wait_for_response(self):
     """
-    Delay for a set amount of time waiting for IoT Core to provide the
-    status for all of the IoT Core shadow document updates that were
-    made by this module.
+    Wait for IoT Core to provide the status for all of the IoT Core
+    shadow document updates that were made by this module.  Returns as
+    soon as the last response arrives, after 'wait_secs', or when the
+    shared time budget is spent; whichever is first.
     """
     self.logger.info('entering: _wait_for_response()')
 
-    retries = self.config['wait_retries']
-    
-    while(retries > 0):
-      if(len(self.trans_good) <= (len(self.rec_good) + len(self.rec_bad))):
-        retries = 0
-      else:
-        retries -= 1
-        self.time.sleep(self.config['wait_secs'])
+    timeout = self.config['wait_secs']
+    if(self.budget):
+      timeout = min(timeout, self.budget.remaining())
+    with self.ack_lock:
+      pending = [ack for ack in self.acks.values() if(not ack.done())]
+    if(pending):
+      self.concurrent.futures.wait(pending, timeout=timeout)
 
 
   def _send_gals_disp(self, path):
     """
     Assumption that the argument has been validated (i.e., dura_file
     check for completness / corruption) and custom check on the gals 
-    disp data prior to calling this function.
+    disp data prior to calling this function.  The data is queued, with
+    the block's other messages, for _send_batches().
 
     Args:
       path (pathlib)      represent a single gals_disp file
-
-    Returns:
-      None                issue before updating shadow
-      True                successfuly called shadowUpdate
-      False               issue calling shadowUpdate
     """
     self.logger.info('entering: _send_gals_disp()')
 
-    result = None
     if(path):
       try:
         name = path.name
         if(name):
-          try:
-            with path.open('r') as fd:
-              try:
-                update = (self.json.loads(fd.read()))['data']
-                return_code = self._update_shadow_document(update['block'], 
-                                                           update, name)
-                if(return_code):
-                  self.trans_good.append(name)
-                elif(return_code == None):
-                  if(self._gals_disp_file_aged_past_limit(name)):
-                    if(self._move_file(path,'bad_comms')):
-                      self.move_good.append(name)
-                    else:
-                      self.move_bad.append(name)
-                      self.logger.error('24 Could not move expired gals_disp' +
-                                        f' file: {name}.')
-                  #else (leave file, subsequent call to this mod will retry)
-                else:
-                  self.trans_bad.append(name)
-
-              except Exception as e:
-                exception_text = str(e)
-                if(self.config['comms_down_msg'] in exception_text):
-                  if(self._gals_disp_file_aged_past_limit(name)):
-                    if(self._move_file(path,'bad_comms')):
-                      self.move_good.append(name)
-                    else:
-                      self.move_bad.append(name)
-                      self.logger.error('27 Could not move expired gals_disp' +
-                                        f' file: {name}.')
-                  #else (leave file, subsequent call to this mod will retry)
-                else:
-                  self.logger.error(f'28 Exception: {e}')
-                  self.trans_bad.append(name)
-          except Exception as e:
-            self.logger.error(f'29 Couldnt open gals_disp file. Exception: {e}')
-            self.trans_bad.append(name)
+          update = self.df.read_valid(str(path))   #cached; read only
+          self.batches.setdefault(update['block'], []).append(
+            (name, update, path, None))
         else:
           self.logger.error('30 Could not extract name of file from pathlib' +
                             ' object.')
           self.trans_bad.append('bad_name')
       except Exception as e:
         self.logger.error(f'31 Exception: {e}')
+        self.trans_bad.append(path.name)
     else:
       self.logger.error('32 Null argument passed to _send_gals_disp')
-    return(result)
+
+
+  def _send_batches(self):
+    """
+    Send the queued messages, a block at a time, merging up to
+    'coalesce_max' of them into each shadow document update (see module
+    doc string.)  The result of placing an update on the queue applies
+    to every message in it.
+    """
+    self.logger.info('entering: _send_batches()')
+
+    sent    = []           # mailbox message ids
+    expired = []           # mailbox message ids
+    size    = self.config['coalesce_max']
+    for block, records in self.batches.items():
+      for index in range(0, len(records), size):
+        if(not self._proceed()):
+          break
+        batch  = records[index:index + size]
+        if(len(batch) == 1):
+          update = dict(batch[0][1], records=None)
+        else:
+          update = {key : None for record in batch for key in record[1]}
+          update.update({'block'   : block,
+                         'records' : [record[1] for record in batch]})
+        try:
+          return_code = self._update_shadow_document(
+                          block, update, [record[0] for record in batch])
+        except Exception as e:
+          if(self.config['comms_down_msg'] in str(e)):
+            return_code = None
+          else:
+            self.logger.error(f'28 Exception: {e}')
+            return_code = False
+
+        for name, data, path, msg_id in batch:
+          if(return_code):
+            self.trans_good.append(name)
+            if(msg_id != None):
+              sent.append(msg_id)
+          elif(return_code == None):
+            if(self._gals_disp_file_aged_past_limit(name)):
+              if(msg_id != None):
+                expired.append(msg_id)
+                self.move_good.append(name)
+              elif(self._move_file(path,'bad_comms')):
+                self.move_good.append(name)
+              else:
+                self.move_bad.append(name)
+                self.logger.error('24 Could not move expired gals_disp' +
+                                  f' file: {name}.')
+            #else (leave file / message, subsequent call will retry)
+          else:
+            self.trans_bad.append(name)
+
+    for ids, state in ((sent, 'sent'), (expired, 'failed')):
+      if(self.mailbox.mark(ids, state) != True):
+        self.logger.error(f'27 Could not mark mailbox messages: {state}')
 
   
+  def _send_mailbox_messages(self):
+    """
+    Queue every pending (or sent but unacknowledged) message in the
+    gals_disp mailbox for _send_batches().  Mirrors _send_gals_disp()
+    for files; the message name takes the place of the file name in the
+    status lists.
+    """
+    self.logger.info('entering: _send_mailbox_messages()')
+
+    messages = self.mailbox.pending()
+    if(messages == None):
+      self.logger.error('41 Could not read the gals_disp mailbox')
+      return
+
+    corrupt = []
+    for msg_id, name, data, record in messages:
+      try:
+        valid = self._message_valid(data)
+      except Exception:
+        valid = False
+      if(not valid):
+        self.logger.error(f'42 Malformed / missing data in message: {name}')
+        corrupt.append(msg_id)
+        self.move_good.append(name)
+        continue
+
+      self.mb_messages.setdefault(name, []).append(msg_id)
+      self.batches.setdefault(data['block'], []).append(
+        (name, data, None, msg_id))
+
+    if(self.mailbox.mark(corrupt, 'corrupt') != True):
+      self.logger.error('44 Could not mark mailbox messages: corrupt')
+
+
   def _clean_up_local_files(self):
     """
     Delete gals_disp message files that were successfully placed on the
@@ -664,9 +888,28 @@ class gals_disp():
     """
     self.logger.info('entering: _clean_up_local_files()')
 
+    # mailbox messages; update their state rather than files
+    failed = []
+    for file_name in self.trans_bad + self.rec_bad:
+      if(file_name in self.mb_messages):
+        failed += self.mb_messages[file_name]
+        self.move_good.append(file_name)
+    acknowledged = []
+    for file_name in self.rec_good:
+      if(file_name in self.mb_messages):
+        acknowledged += self.mb_messages[file_name]
+        self.clean_good.append(file_name)
+    for ids, state, status in ((failed, 'failed', self.move_bad),
+                               (acknowledged, 'acknowledged', self.clean_bad)):
+      if(self.mailbox.mark(ids, state) != True):
+        status.append(state)
+        self.logger.error(f'45 Could not mark mailbox messages: {state}')
+
     # attempt to place gals_disp data on q failed
     for index in range(len(self.trans_bad)):
       file_name = self.trans_bad[index]
+      if(file_name in self.mb_messages):
+        continue
       file_path = (self.paths.get_path('gals_disp') + 
                    self.paths.divider + file_name)
       try:
@@ -682,6 +925,8 @@ class gals_disp():
     # IoT responsed with success shadow document update
     for index in range(len(self.rec_good)):
       file_name = self.rec_good[index]
+      if(file_name in self.mb_messages):
+        continue
       file_path = (self.paths.get_path('gals_disp') + 
                     self.paths.divider + file_name)
       try:
@@ -695,6 +940,8 @@ class gals_disp():
     # IoT responded with failed shadow document update
     for index in range(len(self.rec_bad)):
       file_name = self.rec_bad[index]
+      if(file_name in self.mb_messages):
+        continue
       file_path = (self.paths.get_path('gals_disp') + 
                     self.paths.divider + file_name)
       try:
@@ -717,7 +964,7 @@ class gals_disp():
     """
 
 
-  def send(self, wait='False'):
+  def send(self, wait='False', budget=None):
     """
     It is possible for this module to exit without receiving feedback
     on all of the IoT Core shadow document updates.  In such a case
@@ -731,6 +978,9 @@ class gals_disp():
     Args:
       wait(str)    wait for IoT Core service to report status on the
                      IoT Core shadow document update
+      budget(send_budget)  time budget shared with other senders; data
+                             not sent before it is spent is left for
+                             the next call
     Returns:
       None        issue occured before communication attempt or no
                     gals_disp files existed to be sent
@@ -741,13 +991,15 @@ class gals_disp():
 
     self._reset_status()
     self._set_wait_mode(wait)
+    self.budget = budget
     
     path = self.paths.get_path('gals_disp')
     if(path):
       try:
         directory = self.Path(path)
         if(directory.exists() and directory.is_dir()):
-          for item in directory.iterdir():
+          for name in self.paths.files(path):
+            item = self.Path(path, name)
             if((self._file_valid(item)) and 
                (self._data_valid(item))):
               self._send_gals_disp(item)
@@ -758,10 +1010,16 @@ class gals_disp():
                 self.move_good.append(item.name)
               else:
                 self.move_bad.append(item.name)
+          self._send_mailbox_messages()
+          self._send_batches()
           
-          if(len(self.trans_good) > (len(self.rec_good) + len(self.rec_bad))):
-            if(self.wait):
-              self._wait_for_response()
+          if(self.wait):
+            self._wait_for_response()
+          with self.ack_lock:
+            self.taking_acks = False    #status is final for clean up
+            for token in self.early_acks:
+              self.logger.error('11 No record of sending this gals_disp ' +
+                                f'message. Token: {token}')
           
           self._clean_up_local_files()
         else:
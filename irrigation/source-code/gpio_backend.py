@@ -0,0 +1,77 @@
+"""
+Jaye Hicks 2021
+
+Obligatory legal disclaimer:
+  You are free to use this source code (this file and all other files
+  referenced in this file) "AS IS" WITHOUT WARRANTY OF ANY KIND, EITHER
+  EXPRESSED OR IMPLIED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+  THE ENTIRE RISK AS TO THE QUALITY AND PERFORMANCE OF THIS SOURCE CODE
+  IS WITH YOU.  SHOULD THE SOURCE CODE PROVE DEFECTIVE, YOU ASSUME THE
+  COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU
+  GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
+
+Objects of type gpio_backend() select the implementation of the GPIO
+interface used by irr_event.  On the PI 4 this is the RPi.GPIO module.
+For development and benchmarking a gpio_sim() object, which offers the
+same interface, can be asked for.
+
+The backend is chosen by the environment variable LV_GPIO_BACKEND:
+
+  rpi       RPi.GPIO (default)
+  sim       gpio_sim(); development only
+  auto      RPi.GPIO if it can be imported, else gpio_sim(); development
+              only
+
+There is no silent fall back to gpio_sim() in production; a valve that
+isnt driven would still have gallons dispensed reported for it.  If the
+requested backend cant be loaded, load() returns None and irr_event /
+irr_group do not start the irrigation event.
+
+Usage:
+  >>> import gpio_backend
+  >>> GPIO = gpio_backend.gpio_backend().load()
+"""
+class gpio_backend():
+  import logging
+  import os
+
+
+  def __init__(self):
+    """
+    """
+    self.logger = self.logging.getLogger(__name__)
+    self.logger.info('entering: __init__()')
+
+    self.name = self.os.environ.get('LV_GPIO_BACKEND', 'rpi').strip().lower()
+
+
+  def load(self, name=None):
+    """
+    Args:
+      name(str)        'rpi', 'sim', or 'auto'; overrides LV_GPIO_BACKEND
+
+    Returns:
+      None             requested backend could not be loaded
+      module/object    offering the RPi.GPIO interface
+    """
+    self.logger.info('entering: load()')
+
+    backend = None
+    name    = (name or self.name).strip().lower()
+    if(name in ('rpi', 'auto')):
+      try:
+        import RPi.GPIO as GPIO
+        backend = GPIO
+      except Exception as e:
+        if(name == 'rpi'):
+          self.logger.error(f'1 Could not import RPi.GPIO. Exception: {e}. ' +
+                            'Set LV_GPIO_BACKEND=sim to simulate GPIO')
+    if((name == 'sim') or ((name == 'auto') and (backend == None))):
+      import gpio_sim
+      backend = gpio_sim.gpio_sim()
+      if(name == 'auto'):
+        self.logger.error('2 RPi.GPIO unavailable; using simulated GPIO')
+    if((backend == None) and (not name in ('rpi', 'sim', 'auto'))):
+      self.logger.error(f'3 Unknown GPIO backend: {name}')
+    return(backend)
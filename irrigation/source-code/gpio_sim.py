@@ -0,0 +1,208 @@
+"""
+Jaye Hicks 2021
+
+Obligatory legal disclaimer:
+  You are free to use this source code (this file and all other files
+  referenced in this file) "AS IS" WITHOUT WARRANTY OF ANY KIND, EITHER
+  EXPRESSED OR IMPLIED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+  THE ENTIRE RISK AS TO THE QUALITY AND PERFORMANCE OF THIS SOURCE CODE
+  IS WITH YOU.  SHOULD THE SOURCE CODE PROVE DEFECTIVE, YOU ASSUME THE
+  COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU
+  GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
+
+Objects of type gpio_sim() stand in for the RPi.GPIO module when
+irr_event code runs off of the PI 4 (e.g., development, benchmarking).
+They offer the subset of the RPi.GPIO interface used by irr_event:
+setmode(), setwarnings(), setup(), output(), input(),
+add_event_detect(), remove_event_detect(), cleanup() and the
+associated constants.
+
+Valve (i.e., output pin) changes are recorded, with the simulated time
+of the change, in valve_log so that valve open / close behavior can be
+checked.
+
+Flow sensor pulses are injected by run().  The simulator keeps its own
+clock so a multi-hour irrigation event can be simulated in seconds;
+code under simulation reads time through clock() instead of
+time.time().  Supported flow patterns:
+
+  steady     constant flow of 'gpm'
+  ramp       flow rises linearly from 10% of 'gpm' to 'gpm'
+  bursty     alternating 'burst_secs' at twice 'gpm' and 'burst_secs'
+               of no flow (i.e., average of 'gpm')
+  dropout    flow of 'gpm' except for 'dropout_secs' of no flow at the
+               end of every 'dropout_every' seconds
+
+Usage:
+  >>> import gpio_sim
+  >>> sim = gpio_sim.gpio_sim(start=1635696000)
+  >>> sim.setmode(sim.BCM)
+  >>> sim.setup(17, sim.IN, pull_up_down=sim.PUD_UP)
+  >>> sim.add_event_detect(17, sim.FALLING, callback=print)
+  >>> sim.run(pattern='steady', gpm=10, secs=60)
+  10
+"""
+class gpio_sim():
+  import logging
+  import time
+
+  BCM     = 11
+  BOARD   = 10
+  IN      = 1
+  OUT     = 0
+  HIGH    = 1
+  LOW     = 0
+  PUD_UP  = 22
+  PUD_DOWN = 21
+  PUD_OFF = 20
+  RISING  = 31
+  FALLING = 32
+  BOTH    = 33
+
+
+  def __init__(self, start=None):
+    """
+    Args:
+      start(float)     epoch time the simulated clock starts at; default
+                         is the current time
+    """
+    self.logger = self.logging.getLogger(__name__)
+    self.logger.info('entering: __init__()')
+
+    self.now       = float(start) if(start != None) else self.time.time()
+    self.mode      = None
+    self.pins      = {}       # pin -> IN or OUT
+    self.levels    = {}       # pin -> HIGH or LOW
+    self.callbacks = {}       # pin -> callback
+    self.valve_log = []       # (<simulated epoch time>, pin, level)
+
+
+  def clock(self):
+    """
+    Returns:
+      float       simulated epoch time; replaces time.time()
+    """
+    return(self.now)
+
+
+  def setmode(self, mode):
+    self.mode = mode
+
+
+  def setwarnings(self, flag):
+    pass
+
+
+  def setup(self, pin, direction, pull_up_down=None, initial=None):
+    self.pins[pin] = direction
+    if(direction == self.IN):
+      self.levels[pin] = self.HIGH if(pull_up_down == self.PUD_UP) else self.LOW
+    else:
+      self.levels[pin] = initial if(initial != None) else self.LOW
+
+
+  def output(self, pin, level):
+    if(self.pins.get(pin) != self.OUT):
+      raise RuntimeError(f'pin {pin} not set up as an output')
+    self.levels[pin] = level
+    self.valve_log.append((self.now, pin, level))
+
+
+  def input(self, pin):
+    return(self.levels.get(pin, self.LOW))
+
+
+  def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+    if(self.pins.get(pin) != self.IN):
+      raise RuntimeError(f'pin {pin} not set up as an input')
+    self.callbacks[pin] = callback
+
+
+  def remove_event_detect(self, pin):
+    self.callbacks.pop(pin, None)
+
+
+  def cleanup(self):
+    self.pins      = {}
+    self.levels    = {}
+    self.callbacks = {}
+
+
+  def open_pins(self):
+    """
+    Returns:
+      []          output pins currently set HIGH (i.e., open valves)
+    """
+    return(sorted(pin for pin, direction in self.pins.items()
+                  if((direction == self.OUT) and
+                     (self.levels[pin] == self.HIGH))))
+
+
+  def flow_at(self, pattern, gpm, elapsed, secs, burst_secs=30,
+              dropout_every=600, dropout_secs=60):
+    """
+    Returns:
+      float       simulated flow rate, in gallons per minute, 'elapsed'
+                    seconds into a run lasting 'secs' seconds
+    """
+    if(pattern == 'steady'):
+      rate = gpm
+    elif(pattern == 'ramp'):
+      rate = gpm * (0.1 + 0.9 * min(elapsed / max(secs, 1), 1))
+    elif(pattern == 'bursty'):
+      rate = 2 * gpm if((int(elapsed) // burst_secs) % 2 == 0) else 0
+    elif(pattern == 'dropout'):
+      in_dropout = (elapsed % dropout_every) >= (dropout_every - dropout_secs)
+      rate = 0 if(in_dropout) else gpm
+    else:
+      raise ValueError(f'unknown flow pattern: {pattern}')
+    return(rate)
+
+
+  def run(self, pattern='steady', gpm=10, secs=60, gals_per_pulse=1,
+          pin=17, on_tick=None, tick_secs=300, **pattern_args):
+    """
+    Inject flow sensor pulses, advancing the simulated clock, and
+    invoke the callback registered for 'pin' once per pulse.
+
+    Args:
+      pattern(str)         flow pattern (see module doc string)
+      gpm(float)           nominal gallons per minute
+      secs(int)            simulated seconds to run for
+      gals_per_pulse(int)  gallons represented by one pulse
+      pin(int)             GPIO pin of the flow sensor
+      on_tick(func)        called with the simulated time every
+                             'tick_secs' simulated seconds
+      tick_secs(int)       see on_tick
+      pattern_args         burst_secs, dropout_every, dropout_secs
+
+    Returns:
+      int                  number of pulses injected
+    """
+    self.logger.info('entering: run()')
+
+    callback  = self.callbacks.get(pin)
+    start     = self.now
+    end       = start + secs
+    next_tick = start + tick_secs
+    pulses    = 0
+    gallons   = 0.0
+    step      = 1.0                 #secs; resolution of the flow pattern
+
+    while(self.now < end):
+      rate = self.flow_at(pattern, gpm, self.now - start, secs,
+                          **pattern_args)
+      gallons += rate * step / 60
+      while(gallons >= gals_per_pulse):
+        gallons -= gals_per_pulse
+        pulses  += 1
+        self.levels[pin] = self.LOW
+        if(callback):
+          callback(pin)
+        self.levels[pin] = self.HIGH
+      self.now += step
+      if(on_tick and (self.now >= next_tick)):
+        on_tick(self.now)
+        next_tick += tick_secs
+    return(pulses)
@@ -0,0 +1,305 @@
+"""
+Jaye Hicks 2021
+
+Obligatory legal disclaimer:
+  You are free to use this source code (this file and all other files
+  referenced in this file) "AS IS" WITHOUT WARRANTY OF ANY KIND, EITHER
+  EXPRESSED OR IMPLIED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+  THE ENTIRE RISK AS TO THE QUALITY AND PERFORMANCE OF THIS SOURCE CODE
+  IS WITH YOU.  SHOULD THE SOURCE CODE PROVE DEFECTIVE, YOU ASSUME THE
+  COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU
+  GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
+
+Objects of type integrity_sweep() check every dura_file in the
+directories managed on the PI 4 (i.e., control, irr_event, comms) in a
+single pass; for use after a reboot or when the SD card is suspect.
+Without a sweep a corrupt file is only found when the module owning
+its directory next walks it.
+
+Files are split into batches that are checked by a pool of worker OS
+processes, one per PI 4 core, so the hashing of different batches runs
+on different cores.  Small sweeps are checked in this OS process; the
+cost of starting a pool is only paid when there is a backlog.
+
+  - dura_files (JSON text or binary container) are checked with
+    dura_file.file_valid()
+  - pulse count journals (*.jrnl) are checked a record (i.e., a line)
+    at a time.  A journal whose header is intact is only reported as
+    damaged; replay salvages the records ahead of the first bad one
+  - comms_mailbox() segments are checked by reading every message in
+    the mailbox; corrupt messages are marked and, when the mailbox is
+    compacted, written to the corrupt_files directory
+  - temporary files (.<name>.tmp), lock files, sockets, etc. are skipped
+
+Corrupt files are moved to the corrupt_files directory, from which
+upload_files() sends them to S3 for forensic analysis.  A report is
+written, as a dura_file, to the sys_logs directory:
+
+  integrity_sweep_<yyyy_mm_dd_hh_mm>.json
+
+  {'whatami'     : 'integrity-sweep',
+   'started'     : '<yyyy-mm-dd hh:mm:ss>',
+   'secs'        : <float>,
+   'workers'     : <int>,
+   'files'       : <int>,
+   'bytes'       : <int>,
+   'valid'       : <int>,
+   'corrupt'     : ['<path>', ...],
+   'damaged'     : ['<path>', ...],        #journals; left in place
+   'quarantined' : ['<path>', ...],
+   'mailboxes'   : {'<name>' : <int - corrupt messages>},
+   'errors'      : ['<path>', ...]}        #couldnt be checked / moved
+
+Usage:
+  python integrity_sweep.py
+  python integrity_sweep.py --no-quarantine --workers 2
+
+  >>> import integrity_sweep
+  >>> report = integrity_sweep.integrity_sweep().sweep()
+"""
+import                 argparse
+import                 json
+import                 logging
+import                 os
+
+import dura_file
+
+
+def check_files(file_paths):
+  """
+  Worker function; runs in a pool OS process.  Must live at module
+  level so that it can be handed to the pool.
+
+  Args:
+    file_paths([])    fully qualified paths of the files to check
+
+  Returns:
+    [()]              (path, status, bytes) per file; status is one of
+                        'valid', 'corrupt', 'damaged', 'error'
+  """
+  df      = dura_file.dura_file()
+  results = []
+  for file_path in file_paths:
+    status = 'error'
+    size   = 0
+    try:
+      size = os.path.getsize(file_path)
+      if(file_path.endswith('.jrnl')):
+        status = 'valid'
+        with open(file_path, 'rb') as fd:
+          for line_num, line in enumerate(fd):
+            if(not df.check_object(json_object=line.rstrip(b'\n'))):
+              status = 'corrupt' if(line_num == 0) else 'damaged'
+              break
+      else:
+        valid = df.file_valid(file_path)
+        if(valid):
+          status = 'valid'
+        elif(valid == False):
+          status = 'corrupt'
+    except Exception:
+      status = 'error'
+    results.append((file_path, status, size))
+  return(results)
+
+
+class integrity_sweep():
+  import logging
+  import time
+  from   concurrent.futures import ProcessPoolExecutor
+  from   datetime           import datetime
+
+  import dura_file
+  import lv_paths
+  import comms_mailbox
+
+
+  def __init__(self, max_workers=None):
+    """
+    Args:
+      max_workers(int)     size of the worker pool; default is the
+                             number of CPU cores
+    """
+    self.logger = self.logging.getLogger(__name__)
+    self.logger.info('entering: __init__()')
+
+    self.max_workers = max_workers or os.cpu_count() or 1
+    self.paths       = self.lv_paths.lv_paths()
+
+    self.config = {}
+    self.config['dirs']        = ['cur_irr_sched', 'new_irr_sched',
+                                  'process_reg', 'time_synch', 'irr_event',
+                                  'irr_ev_in_progress', 'alarms', 'gals_disp',
+                                  'orphans', 'bad_comms']
+    self.config['mailboxes']   = ['gals_disp', 'alarms']
+    self.config['batch_files'] = 64      #files handed to a worker at a time
+    self.config['pool_files']  = 256     #fewer files are checked in process
+
+
+  def _collect(self):
+    """
+    Returns:
+      ([], [])     paths of the files to check, and of the directories
+                     that couldnt be listed
+    """
+    self.logger.info('entering: _collect()')
+
+    file_paths = []
+    errors     = []
+    for dir_name in self.config['dirs']:
+      path = self.paths.get_path(dir_name)
+      if(not path):
+        continue
+      names = self.paths.files(path)
+      if(names != None):
+        file_paths.extend(path + self.paths.divider + name for name in names)
+      elif(os.path.exists(path)):
+        errors.append(path)
+        self.logger.error(f'1 Could not list directory: {path}')
+    return(file_paths, errors)
+
+
+  def _check(self, file_paths):
+    """
+    Check the files, in batches, on the worker pool.
+
+    Returns:
+      ([()], int)   (path, status, bytes) per file and the number of
+                      worker OS processes used
+    """
+    self.logger.info('entering: _check()')
+
+    size    = self.config['batch_files']
+    batches = [file_paths[index:index + size]
+               for index in range(0, len(file_paths), size)]
+    workers = min(self.max_workers, len(batches))
+    results = None
+    if((workers > 1) and (len(file_paths) >= self.config['pool_files'])):
+      try:
+        with self.ProcessPoolExecutor(max_workers=workers) as pool:
+          results = [result for batch in pool.map(check_files, batches)
+                            for result in batch]
+      except Exception as e:
+        self.logger.error('2 Worker pool failed; checking files in process.' +
+                          f' Exception: {e}')
+        results = None
+    if(results == None):
+      workers = 1
+      results = check_files(file_paths)
+    return(results, workers)
+
+
+  def _quarantine(self, file_path):
+    """
+    Move a corrupt file to the corrupt_files directory.
+
+    Returns:
+      None       the file is gone (e.g., its owner deleted it)
+      True       file moved
+      False      file could not be moved
+    """
+    result = False
+    try:
+      target = (self.paths.get_path('corrupt_files') + self.paths.divider +
+                os.path.basename(file_path))
+      if(os.path.exists(target)):
+        target += '.' + str(os.getpid())
+      os.replace(file_path, target)
+      result = True
+    except FileNotFoundError:
+      result = None
+    except Exception as e:
+      self.logger.error(f'3 Could not quarantine: {file_path}. Exception: {e}')
+    return(result)
+
+
+  def sweep(self, quarantine=True, report=True):
+    """
+    Check every managed file, quarantine the corrupt ones, and write the
+    report (see module doc string).
+
+    Args:
+      quarantine(bool)    move corrupt files to corrupt_files
+      report(bool)        write the report to sys_logs
+
+    Returns:
+      dict                the report
+    """
+    self.logger.info('entering: sweep()')
+
+    start   = self.time.perf_counter()
+    started = self.datetime.today()
+    file_paths, errors = self._collect()
+    results, workers   = self._check(file_paths)
+
+    sweep_report = {'whatami'     : 'integrity-sweep',
+                    'started'     : started.strftime('%Y-%m-%d %H:%M:%S'),
+                    'secs'        : 0,
+                    'workers'     : workers,
+                    'files'       : len(results),
+                    'bytes'       : sum(result[2] for result in results),
+                    'valid'       : 0,
+                    'corrupt'     : [],
+                    'damaged'     : [],
+                    'quarantined' : [],
+                    'mailboxes'   : {},
+                    'errors'      : errors}
+    for file_path, status, size in results:
+      if(status == 'valid'):
+        sweep_report['valid'] += 1
+      elif(status == 'error'):
+        sweep_report['errors'].append(file_path)
+      else:
+        sweep_report[status].append(file_path)
+        self.logger.error(f'4 File is {status}: {file_path}')
+
+    if(quarantine):
+      for file_path in sweep_report['corrupt']:
+        moved = self._quarantine(file_path)
+        if(moved):
+          sweep_report['quarantined'].append(file_path)
+        elif(moved == False):
+          sweep_report['errors'].append(file_path)
+
+    for name in self.config['mailboxes']:
+      a_mailbox = self.comms_mailbox.comms_mailbox(name, paths=self.paths)
+      before    = a_mailbox.counts()           #None if it couldnt be locked
+      if((before == None) or
+         (a_mailbox.pending(states=a_mailbox.STATES) == None)):
+        sweep_report['errors'].append('mailbox: ' + name)
+        continue
+      after = a_mailbox.counts()
+      if(after == None):
+        sweep_report['errors'].append('mailbox: ' + name)
+      else:
+        sweep_report['mailboxes'][name] = (after.get('corrupt', 0) -
+                                           before.get('corrupt', 0))
+    sweep_report['secs'] = round(self.time.perf_counter() - start, 3)
+
+    if(report):
+      path = self.paths.get_path('sys_logs')
+      file_name = ('integrity_sweep_' + started.strftime('%Y_%m_%d_%H_%M') +
+                   '.json')
+      if((not path) or
+         (not self.dura_file.dura_file().write_data(
+                path + self.paths.divider + file_name, sweep_report))):
+        self.logger.error(f'5 Could not write sweep report: {file_name}')
+    return(sweep_report)
+
+
+def main():
+  parser = argparse.ArgumentParser(description='dura_file integrity sweep')
+  parser.add_argument('--workers', type=int, default=None)
+  parser.add_argument('--no-quarantine', action='store_true',
+                      help='report corrupt files but leave them in place')
+  args = parser.parse_args()
+
+  logging.basicConfig(level=logging.ERROR)
+  sweep_report = integrity_sweep(max_workers=args.workers).sweep(
+                   quarantine=not args.no_quarantine)
+  print(json.dumps(sweep_report, indent=2))
+
+
+if __name__ == '__main__':
+  main()
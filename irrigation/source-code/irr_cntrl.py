@@ -60,10 +60,39 @@ Pulse Count Files
   (e.g., 4 hours).  In such a case, a single irrigaiton event will
   have multiple pulse count files associated with it.
 
+Supervisor Mode
+  Launched as 'python irr_cntrl.py --supervise' (e.g., by a systemd
+  service in place of the cron job) this script stays resident and
+  runs the same steps on an internal schedule: every 'cycle_secs'
+  (default 300, the cron period) the newest irrigation schedule is
+  requested, the schedule is executed, outbound data is sent and the
+  last date / time synch is checked; every hour the date / time sanity
+  check is started (on its own thread; nothing waits on it) and once a
+  day a new system log file is started.
+
+  The objects that talk to AWS (irr_sched, gals_disp, alarms,
+  upload_files, comms_check) are created once and reused so that their
+  boto3 sessions, API Gwy signers, HTTP connections and MQTT shadow
+  clients stay warm between cycles.  Nothing else is carried between
+  cycles; schedules, the process register, pulse counts and outbound
+  data stay in their files.  So a supervisor that crashes, or is
+  replaced by the cron job, is recovered from exactly as a cron
+  launched run is.
+
+  An irrigation event (or group) is managed by a child OS process
+  forked from the supervisor, just as it would be managed by a cron
+  launched OS process that became long running, so that the supervisor
+  keeps cycling.  It is stopped by _stop_current_irr_ev() as before.
+
 """
+import                 argparse
 import                 logging
+import                 os
+import                 sched
+import                 signal
 import                 time
 import                 sys
+import                 threading
 from   datetime import datetime, timedelta
 from   pathlib  import Path
 
@@ -76,7 +105,12 @@ import gals_disp
 import upload_files
 import irr_sched
 import irr_event
+import irr_group
 import lv_paths
+import async_log
+import stop_channel
+import comms_mailbox
+import send_budget
 
 
 def gen_log_file_name():
@@ -89,7 +123,9 @@ def gen_log_file_name():
 
   NOTE: hard-coded directory paths exist as the system log file has to
         be named before a call can be made to the class that avoids
-        hard-coded directory paths.  Kind of a 'chicken before the egg'
+        hard-coded directory paths.  Kind of a 'chicken before the egg'.
+        The LV_PATHS_PREFIX environment variable is honored, as it is
+        by lv_paths()
   
   Example system logging file:
   2021_08_21_23_05_irr_cntrl.log
@@ -98,6 +134,10 @@ def gen_log_file_name():
     prefix =  'C:\\Development\\LonesomeVine\\Irrigation\\lonesome\\sys_logs\\'
   else:                          # production
     prefix = '/home/pi/lonesome/sys_logs/'
+  if(os.environ.get('LV_PATHS_PREFIX')):     # relocated directory tree
+    divider = prefix[-1]
+    prefix  = (os.environ['LV_PATHS_PREFIX'] + divider + 'sys_logs' +
+               divider)
 
   module_name = 'irr_cntrl'
   try:
@@ -114,12 +154,137 @@ def gen_log_file_name():
   return(the_log_file_name)
 
 
+def _start_logging(after_fork=False):
+  """
+  Start writing system logging records to a new system log file.  An
+  async_log() handler already in use is stopped once the new one has
+  taken its place (i.e., its queued records are written and its file
+  closed.)  A child OS process just drops the handler it inherited; the
+  records and file buffer it holds belong to the parent.
+
+  Args:
+    after_fork(bool)   called in a child OS process created by fork
+
+  Returns:
+    async_log          the handler now in use
+    None               fell back to logging.basicConfig()
+  """
+  old_handlers = [handler for handler in logging.getLogger().handlers
+                  if(isinstance(handler, async_log.async_log))]
+  a_log = async_log.async_log()
+  if(a_log.start(gen_log_file_name())):
+    if(not after_fork):
+      for handler in old_handlers:
+        handler.stop()
+  else:
+    a_log = None
+    logging.basicConfig(level=logging.INFO, 
+                        filename=gen_log_file_name(), 
+                        format='%(asctime)s %(name)s %(levelname)s:%(message)s')
+  return(a_log)
+
+
+"""
+Set up system logging.  Records are written to the system log file by a
+background thread; recent DEBUG records are kept in memory and only 
+written when an error is logged (see async_log.py)
+"""
+_start_logging()
+
+
+"""
+Objects reused across cycles in supervisor mode (see supervise())
+"""
+supervising  = False
+warm_objects = {}       #module name -> object of the class of that name
+
+
 """
-Set up system logging
+Senders of outbound data, highest priority first, and the time budget
+they share each cycle (see _send_outbound_data())
 """
-logging.basicConfig(level=logging.INFO, 
-                    filename=gen_log_file_name(), 
-                    format='%(asctime)s %(name)s %(levelname)s:%(message)s')
+outbound_senders     = [(gals_disp,    {'wait' : 'True'}),
+                        (alarms,       {}),
+                        (upload_files, {})]
+outbound_budget_secs = 150      #cron period is 300
+outbound_grace_secs  = 30       #for a transmission under way at the end
+outbound_threads     = {}       #sender name -> thread; may outlive a cycle
+
+
+def _get_object(a_module):
+  """
+  Return an object of the class named after 'a_module' (e.g.,
+  gals_disp.gals_disp()).  When supervising the object is created once
+  and then reused, keeping its AWS connections warm; otherwise a new
+  object is returned, as it always has been.
+
+  Args:
+    a_module(module)   one of irr_sched, gals_disp, alarms, upload_files,
+                         comms_check
+  """
+  logging.info('entering: _get_object()')
+
+  name = a_module.__name__
+  if(not supervising):
+    return(getattr(a_module, name)())
+  if(not name in warm_objects):
+    warm_objects[name] = getattr(a_module, name)()
+  return(warm_objects[name])
+
+
+def _run_long_running(task, *args):
+  """
+  Run a task that turns the OS process into a long running one (i.e.,
+  an irrigation event or group).  Launched by cron the task is simply
+  called.  A supervisor forks a child OS process to run it and carries
+  on; the child keeps all state in files, as a cron launched OS process
+  would, and exits when the task returns.
+
+  Args:
+    task(function)     _start_irr_ev() or _start_irr_group()
+    args               passed to task
+  """
+  logging.info('entering: _run_long_running()')
+
+  if(not (supervising and hasattr(os, 'fork'))):
+    task(*args)
+  else:
+    pid = os.fork()
+    if(pid == 0):
+      status = 0
+      a_log  = None
+      try:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        warm_objects.clear()          #connections belong to the supervisor
+        a_log = _start_logging(after_fork=True)
+        task(*args)
+      except BaseException as e:
+        status = 1
+        logging.error(f'43 Long running task failed. Exception: {e}')
+      finally:
+        if(a_log):
+          a_log.stop()
+        os._exit(status)
+    elif(pid > 0):
+      logging.info(f'Started long running task in OS process: {pid}')
+
+
+def _reap_children():
+  """
+  Collect the exit status of finished child OS processes so they dont
+  linger as zombies (a zombie still appears to be running to psutil)
+  """
+  if(hasattr(os, 'WNOHANG')):
+    try:
+      while(True):
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if(pid == 0):
+          break
+        logging.info(f'Long running OS process: {pid} ended, status: ' +
+                     f'{status}')
+    except ChildProcessError:
+      pass
 
 
 def _curr_date_as_string():
@@ -156,7 +321,8 @@ def _number_files_in_dir(path):
   """
   Return the number of files contained in the specified directory.  
   Counts only files, not direoctories, symbolic links, etc.  See
-  Caution in function _describe_sched() 
+  Caution in function _describe_sched().  Answered from the lv_paths()
+  directory index; the directory is only read if it has changed.
 
   Args:
     path(str)  fully qualified path to directory
@@ -170,16 +336,10 @@ def _number_files_in_dir(path):
   file_count = None
 
   if(path):
-    try:
-      directory  = Path(path)
-      dir_name   = directory.name
-      file_count = 0
-      for item in directory.iterdir():
-        if(item.is_file()):
-          file_count += 1
-    except Exception as e:
+    file_count = lv_paths.lv_paths().count_files(path)
+    if(file_count == None):
       file_count = False
-      logging.error(f'1 Issue accessing dir: {dir_name} Exception: {e}')
+      logging.error(f'1 Issue accessing dir: {Path(path).name}')
   else:
     logging.error('2 Bad argument passed to _number_files_in_dir')
   return(file_count)
@@ -208,9 +368,8 @@ def _clear_directory(path):
       dir_name = directory.name
       if(directory.is_dir()):
         result = True
-        for item in directory.iterdir():
-          if(item.is_file()):
-            item.unlink()
+        for name in lv_paths.lv_paths().files(path):
+          Path(path, name).unlink()
     except Exception as e:
       result = False
       logging.error(f'3 Could not clear a directory: {dir_name}.' + 
@@ -228,8 +387,9 @@ def _write_semaphore(semaphore_file_name):
   file.  If a long running process detects the semaphore file it should  
   exit as quickly as possible.
 
-  Note the dura_file.write_data() function contains a
-  sys.stdout.flush() call after the file write command
+  Note the dura_file.write_data() function writes a temporary file,
+  fsyncs it, and renames it into place so the semaphore file appears
+  whole or not at all
   """
   logging.info('entering: _write_semaphore()')
 
@@ -325,9 +485,11 @@ def _stop_process_using_kill():
 def _stop_current_irr_ev():
   """
   Stop an OS process that is currently running and managing an
-  irrigation event.  First attempt to signal the OS process and
-  ask it to shut itself down in an orderly fashion.  If that fails
-  then take it down hard with an OS level 'kill' command
+  irrigation event.  First ask it, over its stop channel, to shut 
+  itself down in an orderly fashion; it acknowledges once its valves
+  are closed and once it has finished.  If the stop channel cannot be
+  reached fall back to the semaphore file.  If that fails then take 
+  it down hard with an OS level 'kill' command
 
   Returns:
     None          issue arose before attempt to stop OS process
@@ -339,8 +501,12 @@ def _stop_current_irr_ev():
   wait_time_secs      = 5
   semaphore_file_name = 'stop_irr.json'
 
-  if(not _stop_process_using_semaphore(semaphore_file_name,
-                                       num_wait_cycles, wait_time_secs)):
+  stopped = stop_channel.stop_channel().request_stop(
+              timeout_secs=num_wait_cycles * wait_time_secs)
+  if(stopped):
+    result = True
+  elif(not _stop_process_using_semaphore(semaphore_file_name,
+                                         num_wait_cycles, wait_time_secs)):
     if(not _stop_process_using_kill()):
       result = False
       logging.error('11 Couldnt stop current irr ev OS process')
@@ -373,7 +539,26 @@ def _get_new_irr_sched():
   tolerance.
   """
   logging.info('entering: _get_new_irr_sched()')
-  irr_sched.irr_sched().get_schedule()
+  _get_object(irr_sched).get_schedule()
+
+
+def _start_irr_ev(irr_ev_detail):
+  """
+  Open the valve and manage the irrigation event; the OS process running
+  this becomes long running (see _run_long_running())
+  """
+  logging.info('entering: _start_irr_ev()')
+  irr_event.irr_event().start_irr_ev(irr_ev_detail)
+
+
+def _start_irr_group(irr_ev_details, pump_gpm_max):
+  """
+  Concurrent mode counterpart of _start_irr_ev()
+  """
+  logging.info('entering: _start_irr_group()')
+  a_group = irr_group.irr_group()
+  a_group.config['pump_gpm_max'] = pump_gpm_max
+  a_group.start(irr_ev_details)
 
 
 def _execute_schedule():
@@ -393,13 +578,14 @@ def _execute_schedule():
   individual irrigation event.
   """
   logging.info('entering: _execute_schedule()')
-  a_sched_obj   = irr_sched.irr_sched()
-  an_irr_ev_obj = irr_event.irr_event()
+  a_sched_obj   = _get_object(irr_sched)
 
   _delete_semaphore()   # clear out any prior shutdown signal
 
   curr_sched_usable = a_sched_obj.curr_sched_usable()
-  if(curr_sched_usable):
+  if(curr_sched_usable and a_sched_obj.config['concurrent_irr_evs']):
+    _execute_concurrent_schedule(a_sched_obj)
+  elif(curr_sched_usable):
     curr_irr_ev = a_sched_obj.irr_ev_underway()
     scheduled_irr_ev = a_sched_obj.irr_ev_should_be_underway()
 
@@ -419,13 +605,13 @@ def _execute_schedule():
           else:
             irr_ev_detail = a_sched_obj.get_irr_ev_details(scheduled_irr_ev)
             if(irr_ev_detail):
-              an_irr_ev_obj.start_irr_ev(irr_ev_detail) #becomes long running 
+              _run_long_running(_start_irr_ev, irr_ev_detail)
             else:
               logging.error('14 Could retrieve irrigation event details')
         elif(curr_irr_ev == False):
           irr_ev_detail = a_sched_obj.get_irr_ev_details(scheduled_irr_ev)
           if(irr_ev_detail):
-            an_irr_ev_obj.start_irr_ev(irr_ev_detail) #becomes long running
+            _run_long_running(_start_irr_ev, irr_ev_detail)
           else:
             logging.error('15 Could not retrieve irrigation event details')
         else:
@@ -439,21 +625,138 @@ def _execute_schedule():
     a_sched_obj.software_reset()
 
 
+def _execute_concurrent_schedule(a_sched_obj):
+  """
+  Concurrent mode counterpart of _execute_schedule().  The irr evs
+  whose time windows overlap, and whose summed expected flow stays
+  within the pump's rating, are managed together by an irr_group()
+  object; the PI 4 OS process running this function morphs into the
+  long running process that opens their valves and apportions the flow
+  sensor's pulses among them.  If the group that should be underway
+  differs from the one that is underway, the running group is stopped
+  and the new group is started.
+
+  Args:
+    a_sched_obj(irr_sched)  object holding the schedule currently in force
+  """
+  logging.info('entering: _execute_concurrent_schedule()')
+
+  curr_irr_ev       = a_sched_obj.irr_ev_underway()
+  scheduled_irr_evs = a_sched_obj.irr_evs_should_be_underway()
+  curr_irr_evs      = None
+  if(curr_irr_ev):
+    curr_irr_evs = curr_irr_ev.get('irr_evs', [curr_irr_ev])
+
+  if(scheduled_irr_evs == False):
+    if(curr_irr_ev):
+      if(not _stop_current_irr_ev()):
+        logging.error('38 Could not stop current irrigation event(s): ' +
+                      f'{curr_irr_evs}')
+  elif(scheduled_irr_evs):
+    if(curr_irr_evs == scheduled_irr_evs):
+      pass
+    elif(curr_irr_ev == None):
+      logging.error('39 Couldnt determine irrigation event(s) currently in' +
+                    ' process')
+    elif(curr_irr_ev and (not _stop_current_irr_ev())):
+      logging.error('40 Could not stop current irrigation event(s): ' +
+                    f'{curr_irr_evs}')
+    else:
+      irr_ev_details = a_sched_obj.get_irr_evs_details(scheduled_irr_evs)
+      if(irr_ev_details):
+        _run_long_running(_start_irr_group, irr_ev_details,
+                          a_sched_obj.config['pump_gpm_max'])
+      else:
+        logging.error('41 Could not retrieve irrigation event details')
+
+
+def _compact_mailboxes():
+  """
+  Drop the mailbox segments whose messages have all been resolved by
+  the senders (see comms_mailbox.py)
+  """
+  logging.info('entering: _compact_mailboxes()')
+
+  for name in ['gals_disp', 'alarms']:
+    if(comms_mailbox.comms_mailbox(name).compact() == False):
+      logging.error(f'42 Could not compact the {name} mailbox')
+
+
+def _send_one(a_budget, a_module, kwargs):
+  """
+  Runs on its own thread.  Run one sender of outbound data.
+
+  Args:
+    a_budget(send_budget)   time budget shared by the senders
+    a_module(module)        gals_disp, alarms or upload_files
+    kwargs({})              arguments for the sender's send()
+  """
+  logging.info('entering: _send_one()')
+
+  name   = a_module.__name__
+  result = None
+  a_budget.start(name)
+  try:
+    result = _get_object(a_module).send(budget=a_budget, **kwargs)
+  except Exception as e:
+    logging.error(f'46 Sender: {name} failed. Exception: {e}')
+  finally:
+    a_budget.finish(name, result)
+
+
 def _send_outbound_data():
   """
   Send gallons dispsensed data, alarm conditions detected, and upload
-  suspect files that require forensic analysis.
+  suspect files that require forensic analysis.  The three senders run
+  at the same time and share a time budget; gallons dispensed data has
+  priority over alarms, and alarms over uploads, when the link is slow
+  (see send_budget.py).  Data not sent within the budget is sent next
+  cycle.  Mailboxes are compacted once gals_disp and alarms are done,
+  while files are uploaded.
+
+  Returns:
+    {}      sender name -> result, secs, transmissions, bytes sent, ...
   """
   logging.info('entering: _send_outbound_data()')
 
-  if(gals_disp.gals_disp().send(wait=True) == False):
+  a_budget = send_budget.send_budget(outbound_budget_secs,
+                                     [a_module.__name__ for a_module, kwargs
+                                                        in outbound_senders])
+  threads  = {}
+  for a_module, kwargs in outbound_senders:
+    name = a_module.__name__
+    if((name in outbound_threads) and outbound_threads[name].is_alive()):
+      logging.error(f'47 Sender: {name} still running from last cycle')
+      continue
+    threads[name] = threading.Thread(target=_send_one, name='send_' + name,
+                                     args=(a_budget, a_module, kwargs))
+    outbound_threads[name] = threads[name]
+    threads[name].start()
+
+  for name in ['gals_disp', 'alarms']:
+    if(name in threads):
+      threads[name].join(a_budget.remaining() + outbound_grace_secs)
+  compaction = threading.Thread(target=_compact_mailboxes,
+                                name='compact_mailboxes')
+  compaction.start()
+  if('upload_files' in threads):
+    threads['upload_files'].join(a_budget.remaining() + outbound_grace_secs)
+  compaction.join()
+
+  for name, a_thread in threads.items():
+    if(a_thread.is_alive()):
+      logging.error(f'48 Sender: {name} still running past its time budget')
+
+  report = a_budget.report()
+  for name, details in report.items():
+    logging.info(f'Outbound data sender: {name} {details}')
+  if(report['gals_disp']['result'] == False):
     logging.error('19 Failed attempt sending gals disp data to AWS')
-
-  if(alarms.alarms().send == False):
+  if(report['alarms']['result'] == False):
     logging.error('20 Failed attempt sending alarms data to AWS')
-
-  if(upload_files.upload_files().send == False):
+  if(report['upload_files']['result'] == False):
     logging.error('21 Failed attempt uploading files to AWS')
+  return(report)
 
 
 def _date_time_check_current():
@@ -475,44 +778,41 @@ def _date_time_check_current():
     num_files = _number_files_in_dir(path)
 
     if(num_files == 1):
-      directory  = Path(path)
-      for item in directory.iterdir():
-        if(item.is_file()):
-          file_name = item.name
-          lc_year  = int(file_name.split('_')[3])
-          lc_month = int(file_name.split('_')[4])
-          lc_day   = int(file_name.split('_')[5])
-          lc_hour  = int(file_name.split('_')[6])
-          lc_min   = int(file_name.split('_')[7].split('.')[0]) 
-        
-          now        = datetime.today()
-          last_check = datetime(year=lc_year, month=lc_month, day=lc_day,
-                                hour=lc_hour, minute=lc_min)
-
-          if(not (last_check + timedelta(days=days_threshold)) > now):
-
-            #construct file name
-            date_string = _curr_date_as_string()
-            file_name   = 'alarm_pi4_datetimecurr_' + date_string + '.json'
-
-            #construct file contents
-            message = {'whatami'  : 'pi4-datetime-alarm-not-current',
-                        'date'     : date_string}
-            
-            #write file to special purpose comms dir
-            path = an_lv_paths_obj.get_path('alarms')
-            if(path):
-              try:
-                path_and_file_name = path + an_lv_paths_obj.divider + file_name
-                if(not Path(path_and_file_name).is_file()):
-                  dura_file.dura_file().write_data(path_and_file_name, message)
-              except Exception as e:
-                logging.error(f'22 Exception: {e}')
-            else:
-              logging.error('23 Couldnt get directory path for alarms ' +
-                            'directory')
+      for file_name in an_lv_paths_obj.files(path):
+        lc_year  = int(file_name.split('_')[3])
+        lc_month = int(file_name.split('_')[4])
+        lc_day   = int(file_name.split('_')[5])
+        lc_hour  = int(file_name.split('_')[6])
+        lc_min   = int(file_name.split('_')[7].split('.')[0]) 
+      
+        now        = datetime.today()
+        last_check = datetime(year=lc_year, month=lc_month, day=lc_day,
+                              hour=lc_hour, minute=lc_min)
+
+        if(not (last_check + timedelta(days=days_threshold)) > now):
+
+          #construct file name
+          date_string = _curr_date_as_string()
+          file_name   = 'alarm_pi4_datetimecurr_' + date_string + '.json'
+
+          #construct file contents
+          message = {'whatami'  : 'pi4-datetime-alarm-not-current',
+                      'date'     : date_string}
+          
+          #write file to special purpose comms dir
+          path = an_lv_paths_obj.get_path('alarms')
+          if(path):
+            try:
+              path_and_file_name = path + an_lv_paths_obj.divider + file_name
+              if(not Path(path_and_file_name).is_file()):
+                dura_file.dura_file().write_data(path_and_file_name, message)
+            except Exception as e:
+              logging.error(f'22 Exception: {e}')
+          else:
+            logging.error('23 Couldnt get directory path for alarms ' +
+                          'directory')
 
-          break # should only be 1 file in dir; so why not break?
+        break # should only be 1 file in dir; so why not break?
     elif(num_files == 0):
       #send warn/error message to system log but not to AWS backend
       logging.error('24 Error: no control file present in date time synch ' +
@@ -529,6 +829,52 @@ def _date_time_check_current():
     logging.error('27 could not access the date time synch directory')
 
 
+def _secs_since_boot():
+  """
+  Returns:
+    float          seconds since the PI 4 booted; None if unknown
+  """
+  secs = None
+  try:
+    secs = time.clock_gettime(time.CLOCK_BOOTTIME)
+  except Exception as e:
+    logging.info(f'Couldnt read time since boot. Exception: {e}')
+  return(secs)
+
+
+def _record_time_synch(source):
+  """
+  Place a file in the time synch directory to document the last
+  successful date / time synch; _date_time_check_current() reads the
+  date and time from the file's name.
+
+  Args:
+    source(str)     'kernel' (clock reported synchronized) or 'endpoint'
+                      (corroborated by a public Internet endpoint)
+  """
+  logging.info('entering: _record_time_synch()')
+
+  an_lv_paths_obj  = lv_paths.lv_paths()
+  file_name_prefix = 'date_time_synch_'
+  try:
+    directory = an_lv_paths_obj.get_path('time_synch')
+    if(directory):
+       #clear out directory
+      _clear_directory(directory)   
+
+      #construct the file name
+      now_date_time_str  = _curr_date_time_as_string()
+      file_name     = file_name_prefix + now_date_time_str + '.json'
+      file_contents = {'action' : 'successful-date-time-synch',
+                       'source' : source}
+      file_name     = (directory + an_lv_paths_obj.divider + file_name)
+      dura_file.dura_file().write_data(file_name, file_contents)
+    else:
+      logging.error('32 Could not access date time synch directory.')
+  except Exception as e:
+    logging.error(f'33 Exception: {e}')  
+
+
 def _date_time_sanity_check():
   """
   Using a publicly accessable Internet endpoint, obtain the current
@@ -536,86 +882,180 @@ def _date_time_sanity_check():
   the acceptable threshold, raise an alarm.
 
   The PI 4's default behaviour is to use a public Internet endpoint
-  to set its local version of date and time.  It does this every 5
-  mins.  So, in the event that this script is being run directly 
-  following ann unexpected reboot, a delay > 5 mins is executed
-  before the check in order to give the PI 4 a chance to set its
-  local date and time from a public Internet endpoint.
+  to set its local version of date and time.  When the kernel reports
+  the clock as synchronized that has worked; the synch is recorded and
+  no endpoint is contacted.  Otherwise, in the event that this script
+  is being run directly following an unexpected reboot, the PI 4 is
+  given > 5 mins from boot to set its local date and time before the
+  check is made; until then the check is deferred to a later run.  Run
+  it using _start_date_time_sanity_check() so nothing waits on it.
   """
   logging.info('entering: _date_time_sanity_check()')
 
   an_lv_paths_obj = lv_paths.lv_paths()
   secs_delay_before_check = 420      #'2' is a good debug setting 
-  file_name_prefix        = 'date_time_synch_'
-
-  time.sleep(secs_delay_before_check)
-  result = check_date_time.check_date_time().check()
-  if(result == False):
-    logging.error('28 PI 4 date / time value out of acceptable variance')
-
-    #construct file name
-    date_string = _curr_date_as_string()
-    file_name   = 'alarm_pi4_datetimesynch_' + date_string + '.json'
-
-    #construct file contents
-    message = {'whatami'  : 'pi4-datetime-alarm-not-synched',
-                'date'     : date_string}
-    
-    #write file to special purpose comms dir
-    path = an_lv_paths_obj.get_path('alarms')
-    if(path):
-      try:
-        path_and_file_name = path + an_lv_paths_obj.divider + file_name
-        if(not Path(path_and_file_name).is_file()):
-          dura_file.dura_file().write_data(path_and_file_name, message)
-      except Exception as e:
-        logging.error(f'29 Exception: {e}')
-    else:
-      logging.error('30 Couldnt get directory path for alarms directory')
+  a_cdt_obj = check_date_time.check_date_time(check=False)
+  since_boot = _secs_since_boot()
+
+  if(a_cdt_obj.kernel_synched()):
+    logging.info('Kernel reports clock synchronized; check not needed')
+    _record_time_synch('kernel')
 
-  elif(result == None):
-    logging.error('31 Some issue prevented execution of date / time check')
+  elif((since_boot != None) and (since_boot < secs_delay_before_check)):
+    logging.info('Date / time check deferred; too soon after boot')
 
-  #place file in directory to document last successful date/time
-  #synch with an external source.  File name contains date and time  
   else:
-    try:
-      directory = an_lv_paths_obj.get_path('time_synch')
-      if(directory):
-         #clear out directory
-        _clear_directory(directory)   
-
-        #construct the file name
-        now_date_time_str  = _curr_date_time_as_string()
-        file_name     = file_name_prefix + now_date_time_str + '.json'
-        file_contents = {'action' : 'successful-date-time-synch'}
-        file_name     = (directory + an_lv_paths_obj.divider + file_name)
-        dura_file.dura_file().write_data(file_name, file_contents)
+    result = a_cdt_obj.check()
+    if(result == False):
+      logging.error('28 PI 4 date / time value out of acceptable variance')
+
+      #construct file name
+      date_string = _curr_date_as_string()
+      file_name   = 'alarm_pi4_datetimesynch_' + date_string + '.json'
+
+      #construct file contents
+      message = {'whatami'  : 'pi4-datetime-alarm-not-synched',
+                  'date'     : date_string}
+      
+      #write file to special purpose comms dir
+      path = an_lv_paths_obj.get_path('alarms')
+      if(path):
+        try:
+          path_and_file_name = path + an_lv_paths_obj.divider + file_name
+          if(not Path(path_and_file_name).is_file()):
+            dura_file.dura_file().write_data(path_and_file_name, message)
+        except Exception as e:
+          logging.error(f'29 Exception: {e}')
       else:
-        logging.error('32 Could not access date time synch directory.')
-    except Exception as e:
-      logging.error(f'33 Exception: {e}')  
+        logging.error('30 Couldnt get directory path for alarms directory')
+
+    elif(result == None):
+      logging.error('31 Some issue prevented execution of date / time check')
+
+    #document last successful date/time synch with an external source
+    else:
+      _record_time_synch('endpoint')
+
+
+def _start_date_time_sanity_check():
+  """
+  Run _date_time_sanity_check() on its own thread so that nothing, in
+  particular schedule execution, waits on it.  At most one check runs
+  at a time.  Launched by cron the OS process waits for the check (at
+  most a few timeouts) before it exits; a supervisor doesnt.
+
+  Returns:
+    Thread         the thread running the check
+  """
+  logging.info('entering: _start_date_time_sanity_check()')
+
+  for a_thread in threading.enumerate():
+    if(a_thread.name == 'date_time_check'):
+      return(a_thread)
+  a_thread = threading.Thread(target=_date_time_sanity_check,
+                              name='date_time_check', daemon=supervising)
+  a_thread.start()
+  return(a_thread)
 
 
 def task_list():
   """
   These are the major tasks which must be performed regularly (e.g., 
   every 5 mins) on an ongoing basis in order to automatically manage
-  vineyard irrigation
+  vineyard irrigation.  Objects are created by the steps that use them
+  (e.g., an irr_event() only when an irrigation event starts.)
   """
   logging.info('entering: task_list()')
 
-  an_lv_object = lv_paths.lv_paths()
-  an_alarm = alarms.alarms()
-  cd = check_date_time.check_date_time()
-  cc = comms_check.comms_check()
-  df = dura_file.dura_file()
-  gd = gals_disp.gals_disp()
-  ie = irr_event.irr_event()
-  irs = irr_sched.irr_sched()
-  pc = process_cntrl.process_cntrl()
-  uf = upload_files.upload_files()
+  _start_date_time_sanity_check()
+  _cycle()
+
+
+def _cycle():
+  """
+  The steps a cron launched run of this script performs, in supervisor
+  mode; run every 'cycle_secs'
+  """
+  logging.info('entering: _cycle()')
+
+  for step in [_get_new_irr_sched, _execute_schedule, _send_outbound_data,
+               _date_time_check_current]:
+    try:
+      step()
+    except Exception as e:
+      logging.error(f'45 Step: {step.__name__} failed. Exception: {e}')
+
+
+def _daily():
+  """
+  Start a new system log file
+  """
+  logging.info('entering: _daily()')
+
+  _start_logging()
+
+
+def _supervised_task(scheduler, stopping, period_secs, task):
+  """
+  Run a task then schedule its next run 'period_secs' after this one
+  started (at once if the task overran its period).  A failing task is
+  logged and tried again next period; it doesnt stop the supervisor.
+  """
+  if(not stopping.is_set()):
+    start = time.monotonic()
+    try:
+      task()
+    except Exception as e:
+      logging.error(f'44 Supervised task: {task.__name__} failed. ' +
+                    f'Exception: {e}')
+    _reap_children()
+    scheduler.enterabs(start + period_secs, 1, _supervised_task,
+                       (scheduler, stopping, period_secs, task))
+
+
+def supervise(cycle_secs=300, check_secs=3600, daily_secs=86400):
+  """
+  Stay resident and run the cron job's steps on an internal schedule
+  (see Supervisor Mode in the module doc string) until SIGTERM / SIGINT.
+
+  Args:
+    cycle_secs(int)    period of _cycle()
+    check_secs(int)    period of _start_date_time_sanity_check()
+    daily_secs(int)    period of _daily()
+  """
+  global supervising
+  logging.info('entering: supervise()')
+
+  supervising = True
+  stopping    = threading.Event()
+  for signal_num in [signal.SIGTERM, signal.SIGINT]:
+    signal.signal(signal_num, lambda signal_num, frame: stopping.set())
+
+  def delay(secs):             #a stop request cuts any wait short
+    if(stopping.wait(secs)):
+      for event in scheduler.queue:
+        scheduler.cancel(event)
+
+  scheduler = sched.scheduler(time.monotonic, delay)
+  scheduler.enter(0, 1, _supervised_task,
+                  (scheduler, stopping, cycle_secs, _cycle))
+  scheduler.enter(0, 2, _supervised_task,
+                  (scheduler, stopping, check_secs,
+                   _start_date_time_sanity_check))
+  scheduler.enter(daily_secs, 3, _supervised_task,
+                  (scheduler, stopping, daily_secs, _daily))
+  scheduler.run()
+  logging.info('Supervisor stopped')
 
 
 if(__name__ == '__main__'):
-  task_list()
\ No newline at end of file
+  parser = argparse.ArgumentParser(description='irrigation control')
+  parser.add_argument('--supervise', action='store_true',
+                      help='stay resident instead of running once (cron)')
+  parser.add_argument('--cycle-secs', type=int, default=300)
+  args = parser.parse_args()
+
+  if(args.supervise):
+    supervise(cycle_secs=args.cycle_secs)
+  else:
+    task_list()
\ No newline at end of file
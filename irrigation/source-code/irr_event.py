@@ -24,6 +24,11 @@ Relavant Real World Detail:
   seconds.
 - An irrigation event involves dispensing water to a single vineyard
   block for a elapsed period of time (e.g., 2 hours)
+- Several irrigation events may run at the same time provided their
+  summed expected flow stays within the pump's rating (see 
+  irr_group.py).  Each is managed by an irr_event() object that is a
+  member of the group; the group owns the GPIO callback and the stop
+  channel
 - As irrigaiton events are long running, a small chance exists that
   they may be interrupted by an unexpected reboot of teh PI 4 
 - Tracking the amount of water dispensed to a vineyard block is the
@@ -32,6 +37,13 @@ Relavant Real World Detail:
       files, augmented by dura_file functionality
     - Updating an existing file involves renaming the existng file to
       a backup (i.e., <filename>.old) and the creation of a new file
+    - Alternatively (i.e., config['pulse_journal'] == True) pulse data
+      is check pointed to an append-only journal; each checkpoint only
+      appends the pulses received since the last one (see
+      pulse_journal.py)
+    - Gallons dispensed messages and flow alarms are posted to a
+      comms_mailbox() (i.e., config['comms_mailbox'] == True) rather
+      than written as individual flat files (see comms_mailbox.py)
 
 GPIO Mapping
   17  input, water flow sensor
@@ -40,17 +52,26 @@ GPIO Mapping
 
 The class irr_event() uses a data structure to keep track of the
 number of pulses that have been received from a water flow sensor 
-during a single irrigation event.  This is an array of individual 
-elements in which each element contains a key value pair.  The key is 
-the epoch time stamp for the datapoint and the value is the cumulative 
-number of water sensor pulses received since the irrigation event 
-started or since the last unexpected reboot of the PI 4 platform.  If 
-an exepcted reboot of the PI 4 occurs during an irrigation event then
-multiple OS pids (i.e., one for each OS process that was involved in
-managing the irrigation event) will exist in the pulse count data 
-structure.  The data across all OS pids in the data structure will
-be combined to determine the total gallons dispensed and the average 
-flow rate for the entire irrigation event.
+during a single irrigation event.  This is an array of per-minute 
+buckets.  Each bucket is a two element array holding the epoch time 
+stamp for the start of the minute and the number of water sensor 
+pulses received during that minute.  Minutes without any pulses have
+no bucket.  If an exepcted reboot of the PI 4 occurs during an
+irrigation event then multiple OS pids (i.e., one for each OS process
+that was involved in managing the irrigation event) will exist in the
+pulse count data structure.  The data across all OS pids in the data
+structure will be combined to determine the total gallons dispensed
+and the average flow rate for the entire irrigation event.
+
+At run time the pulses are held in a pulse_ledger() object (typed 
+arrays per OS pid) so that the GPIO callback only has to store a time
+stamp and a count.  Flow rate checks and shutdown request checks are
+made by the main thread in _manage_irr_event(), never by the GPIO 
+callback.  Requests to shut down arrive on a stop_channel() (a Unix
+domain socket) and wake the main thread immediately; the stop_irr.json
+semaphore file is still honored as a fallback.  The ledger is
+converted to the data structure below when the pulse count data is
+checkpointed to a flat file.
 
 The pulse count data structure is illustrated below.  Note, in this 
 example illustration, a single unexpected reboot occuring during the 
@@ -58,6 +79,7 @@ irrigation event which led to two elements in the top level array to
 the right of the key named 'pulses.'
 
 {'whatami'  : 'pulse_count',
+  'format'   : 'buckets',
   'sched_id' : <int>,
   'date'     : '<yyyy-mm-dd>',   #or 'any'
   'day'      : '<str>',          #allowed values include 'day1',
@@ -65,12 +87,21 @@ the right of the key named 'pulses.'
                                  #'tue', 'wed', 'thu', 'fri', 'sat'
   'sequence' : <int>,
   'block'    : '<letter>',
+  'pulses'   : [{'<int - OS pid>' : [[<int - epoch ts of minute>,
+                                      <int - pulses in minute>],
+                                     [<int>, <int>]]},
+                {'<int - OS pid>' : [[<int - epoch ts of minute>,
+                                      <int - pulses in minute>],
+                                     [<int>, <int>]]} ]}
+
+Pulse count files written before per-minute buckets were introduced 
+have no 'format' key and hold one cumulative data point per pulse:
+
   'pulses'   : [{'<int - OS pid>' : [{'<int - epoch ts>' : 
                                        <int - pulse data>},
-                                     {'<int>' : <int>}]},
-                {'<int - OS pid>' : [{'<int - epoch ts>' : 
-                                      <int - pulse data>},
-                                     {'<int>' : <int>}]} ]}
+                                     {'<int>' : <int>}]}]
+
+These are still read; they are converted to buckets when loaded.
 """
 class irr_event():
   import logging
@@ -79,14 +110,19 @@ class irr_event():
   from   pathlib   import Path
   from   datetime  import datetime, timedelta
 
-  #import RPi.GPIO as GPIO   (gonna go with this one????)
-
+  import gpio_backend
   import process_cntrl
   import dura_file
   import lv_paths
+  import pulse_ledger
+  import pulse_journal
+  import flow_estimator
+  import stop_channel
+  import orphan_salvage
+  import comms_mailbox
 
 
-  def __init__(self):
+  def __init__(self, gpio=None):
     """
     Preliminary initialization.  Final initialization, using input
     parameters, occurs in irr_event.start_irr_ev()
@@ -97,19 +133,34 @@ class irr_event():
     Second, they are created as utility objects and a portion of their
     features and functions are used to tactically salvage/process 
     orphaned pulse count files to hopefully prevent loss of data.
+
+    Args:
+      gpio          object offering the RPi.GPIO interface (e.g., a
+                      gpio_sim() object); default is chosen by 
+                      gpio_backend()
     """
     self.logger = self.logging.getLogger(__name__)
     self.logger.info('entering: __init__()')
 
+    if(gpio):
+      self.GPIO = gpio
+    else:
+      self.GPIO = self.gpio_backend.gpio_backend().load()
+    self.clock   = self.time.time  #gpio_sim() supplies a simulated clock
     self.df      = self.dura_file.dura_file()
     self.paths   = self.lv_paths.lv_paths()
     self.process = self.process_cntrl.process_cntrl()
 
     #initializations not requiring input parameterss 
-    self.pulse_count              = 0
     self.all_pulse_data           = []
+    self.salvage_report           = {}
+    self.shared_files             = ()  #pulse files of fellow group members
     self.config                   = {}
-    self.config['num_sleep_secs'] = 300
+    self.config['num_sleep_secs'] = 300   #between pulse count checkpoints
+    self.config['num_check_secs'] = 10    #between flow / shutdown checks
+    self.config['pulse_journal']  = True  #append-only pulse checkpoints
+    self.config['journal_compact_every'] = 48  #appended records/compaction
+    self.config['comms_mailbox']  = True  #post outbound msgs to a mailbox
     self.config['blocks']         = ['a','b','c','d','e','f','g']
     self.config['flow_sensor']    = 17
 
@@ -119,7 +170,7 @@ class irr_event():
                                      'c' : 12,
                                      'd' : 16,
                                      'e' : 18,
-                                     'f' : 12,
+                                     'f' : 23,
                                      'g' : 24}
 
     self.config['fixed_days']     = ['mon','tue','wed','thu','fri','sat','sun']
@@ -129,6 +180,11 @@ class irr_event():
     #flow rate for Hunter Industries HC100FLOW Hydrawise 1" HC Flow Meter
     self.config['gals_per_pulse'] = 1
 
+    #flow rate estimation used for under / over flow detection
+    self.config['flow_window_mins'] = 5     #minutes in rolling window
+    self.config['flow_min_mins']    = 2     #complete mins before alarming
+    self.config['flow_ewma_alpha']  = 0.3
+
     #obtain the linux PID of the OS process executing this script
     process_info = self.process.get_process_info()
     if(process_info):
@@ -136,16 +192,40 @@ class irr_event():
     else:
       self.config['pid'] = ''
       self.logger.error('1 Couldnt obtain pid of OS process running this code')
+
+    #run time pulse data; written to by the GPIO callback thread
+    self.ledger  = self.pulse_ledger.pulse_ledger(self.config['pid'])
+    self.journal = None     #created in start_irr_ev()
+    self.channel = self.stop_channel.stop_channel()
+    self.flow   = self.flow_estimator.flow_estimator(
+                    window_mins=self.config['flow_window_mins'],
+                    alpha=self.config['flow_ewma_alpha'],
+                    gals_per_pulse=self.config['gals_per_pulse'])
  
-  def _set_up_GPIO(self):
+  def _set_up_GPIO(self, callback=None):
     """
     Set up the Raspberry PI 4's GPIO pins to accept input from water
     flow sensor and to control the valve actuator.  Currently using
     the Hunter HC100 Flow Hydrawise 1" and the Elegco 8 Channel Relay
     Module
+
+    The flow sensor closes a switch once per paddle rotation, pulling
+    the (pulled high) input low, so only the falling edge is counted.
+
+    Args:
+      callback(func)   called once per flow sensor pulse; default is
+                         _sensor_pulse_callback()
+
+    Returns:
+      True       GPIO pins set up
+      False      no GPIO backend available or error setting up pins
     """
     self.logger.info('entering: _set_up_GPIO()')
 
+    if(self.GPIO == None):
+      self.logger.error('87 No GPIO backend available')
+      return(False)
+
     self.GPIO.setmode(self.GPIO.BCM)
     self.GPIO.setwarnings(False)
 
@@ -153,9 +233,10 @@ class irr_event():
     self.GPIO.setup(self.config['flow_sensor'], 
                     self.GPIO.IN, 
                     pull_up_down=self.GPIO.PUD_UP)
-    self.GPIO.add_event_detect(17, 
-                               self.GPIO.BOTH, 
-                               callback=self._sensor_pulse_callback, 
+    self.GPIO.add_event_detect(self.config['flow_sensor'], 
+                               self.GPIO.FALLING, 
+                               callback=(callback or
+                                         self._sensor_pulse_callback), 
                                bouncetime=200)
 
     #Set 7 GPIO as outputs to control low voltage to hi voltage relay
@@ -166,6 +247,7 @@ class irr_event():
     self.GPIO.setup(self.config['valves']['e'], self.GPIO.OUT)  #block E
     self.GPIO.setup(self.config['valves']['f'], self.GPIO.OUT)  #block F
     self.GPIO.setup(self.config['valves']['g'], self.GPIO.OUT)  #block G
+    return(True)
 
 
   def _curr_date_as_string(self):
@@ -244,9 +326,8 @@ class irr_event():
         dir_name = directory.name
         if(directory.is_dir()):
           result = True
-          for item in directory.iterdir():
-            if(item.is_file()):
-              item.unlink()
+          for name in self.paths.files(path):
+            self.Path(path, name).unlink()
       except Exception as e:
         result = False
         self.logger.error(f'5 Could not clear a directory: {dir_name}.' +
@@ -270,7 +351,10 @@ class irr_event():
     result = True
     curr_pulse_file    = self.config['pulse_file']
     old_pulse_file     = curr_pulse_file + '.old'
-    acceptable_files   = (curr_pulse_file, old_pulse_file)
+    journal_file       = self.config['journal_file']
+    acceptable_files   = (curr_pulse_file, old_pulse_file,
+                          journal_file, journal_file + '.tmp') + (
+                          self.shared_files)
     unacceptable_files = []
     path               = self.paths.get_path('irr_ev_in_progress')
     if(path):
@@ -279,9 +363,9 @@ class irr_event():
         if(directory.exists() and directory.is_dir()):
 
           #scan directory special purpose directory that holds files
-          for item in directory.iterdir():
-            if(not item.name in acceptable_files):
-              unacceptable_files.append(item)
+          for name in self.paths.files(path, hidden=True):
+            if(not name in acceptable_files):
+              unacceptable_files.append(self.Path(path, name))
 
           #move extraneous files out of special directory
           for file in unacceptable_files:
@@ -322,11 +406,11 @@ class irr_event():
           #scan special purpose directory that holds the files
           current = None
           old     = None
-          for item in directory.iterdir():
-            if(item.name == curr_pulse_file):
-              current = item
-            if(item.name == old_pulse_file):
-              old = item
+          for name in self.paths.files(path):
+            if(name == curr_pulse_file):
+              current = self.Path(path, name)
+            if(name == old_pulse_file):
+              old = self.Path(path, name)
           if (old):
             old.unlink()
           if(current):
@@ -382,27 +466,55 @@ class irr_event():
       self.logger.error(f'73 Cant open block: {block}. It doesnt exist.')
 
 
+  def _open_block(self, block):
+    """
+    Open the valve of a single block, leaving the valves of all other
+    blocks as they are.  Used when several irrigation events run at the
+    same time (see irr_group.py).
+
+    Returns:
+      True       valve opened
+      False      block doesnt exist
+    """
+    self.logger.info('entering: _open_block()')
+
+    result = False
+    block  = block.strip().lower()
+    if(block in self.config['valves']):
+      self.GPIO.output(self.config['valves'][block], self.GPIO.HIGH)
+      result = True
+    else:
+      self.logger.error(f'89 Cant open block: {block}. It doesnt exist.')
+    return(result)
+
+
+  def _close_block(self, block):
+    """
+    Close the valve of a single block, leaving the valves of all other
+    blocks as they are.
+    """
+    self.logger.info('entering: _close_block()')
+
+    block = block.strip().lower()
+    if(block in self.config['valves']):
+      self.GPIO.output(self.config['valves'][block], self.GPIO.LOW)
+    else:
+      self.logger.error(f'90 Cant close block: {block}. It doesnt exist.')
+
+
   def _calculate_average_flow_rate(self):
     """
     Post irrigation event.  Access all pulse count data for the
     irrigation event.  In this sample a single unexpected reboot
-    of PI 4 platform.
-
-    Illustrative pulse count data structure:
-      {'whatami'  : 'pulse_count',
-        'sched_id' : <int>,
-        'date'     : '<yyyy-mm-dd>',  #or 'any'
-        'day'      : '<str>',         #allowed values include 'day1',
-                                      #'day2', 'day3', 'sun', 'mon',
-                                      #'tue', 'wed', 'thu', 'fri','sat'
-        'sequence' : <int>,
-        'block'    : '<letter>',
-        'pulses'   : [{'<int - OS pid>' : [{'<int - epoch ts>' : 
-                                            <int - pulse data>},
-                                          {'<int>' : <int>}]},
-                      {'<int - OS pid>' : [{'<int - epoch ts>' : 
-                                            <int - pulse data>},
-                                          {'<int>' : <int>}]} ]}
+    of PI 4 platform.  The flow rate for each OS pid is the number of
+    pulses received divided by the number of minutes spanned by its
+    buckets.  Cost is proportional to the number of buckets.
+
+    Illustrative 'pulses' section of pulse count data structure:
+      [{'<int - OS pid>' : [[<int - epoch ts of minute>,
+                             <int - pulses in minute>], ...]},
+       {'<int - OS pid>' : [[<int - epoch ts of minute>,
+                             <int - pulses in minute>], ...]}]
     Returns:
       None             calculation was not attempted
       <int>            average flow rate in gallons per minute
@@ -412,28 +524,15 @@ class irr_event():
     average_flow = None
     factor       = self.config['gals_per_pulse']
     if(self.all_pulse_data):
-      all_rates_for_all_pids = []
-      for cnt1, all_pid_data in enumerate(self.all_pulse_data):
-        for single_pid_data in all_pid_data:
-          for cnt2, single_pid_rec in enumerate(self.all_pulse_data[cnt1][single_pid_data]):
-            if(cnt2 != 0): #flow calculation requires a previous data point
-              for ts in single_pid_rec: #not a loop; used to set variable 'ts'
-                current_ts        = int(ts)
-                current_pulse_cnt = single_pid_rec[ts]
-              elapsed_mins  = int((current_ts - previous_ts) / 60)
-              pulse_count   = current_pulse_cnt - previous_pulse_cnt
-              gallons_flow  = pulse_count * factor
-              if(elapsed_mins > 0):
-                flow_rate = int(gallons_flow / elapsed_mins)
-                all_rates_for_all_pids.append(flow_rate)
-              else:
-                all_rates_for_all_pids.append(0)
-            
-            for ts in single_pid_rec: #not a loop; used to set variable 'ts'
-              previous_ts        = int(ts)
-              previous_pulse_cnt = single_pid_rec[ts]
-      if(len(all_rates_for_all_pids)):
-        average_flow = int(sum(all_rates_for_all_pids) / len(all_rates_for_all_pids))
+      total_pulses = 0
+      total_mins   = 0
+      for pid_data in self.all_pulse_data:
+        for buckets in pid_data.values():
+          if(buckets):
+            total_pulses += sum(pulses for minute, pulses in buckets)
+            total_mins   += int((buckets[-1][0] - buckets[0][0]) / 60) + 1
+      if(total_mins):
+        average_flow = int(total_pulses * factor / total_mins)
       else:
         average_flow = 0
     else:
@@ -447,7 +546,7 @@ class irr_event():
     Calculate total gallons dispensed during single irrigation event.
     If unexpected PI 4 reboot occuring during event, data from multiple
     OS processes (i.e., that managed a portion of event) has to be
-    combined.
+    combined.  Cost is proportional to the number of buckets.
     
     Returns:
       None             calculation was not attempted
@@ -460,16 +559,9 @@ class irr_event():
 
     if(self.all_pulse_data):
       total_pulses_for_all_pids = 0
-      for cnt1, all_pid_data in enumerate(self.all_pulse_data):
-        for single_pid in all_pid_data:
-          max_count_for_pid = 0
-          for single_pid_rec in self.all_pulse_data[cnt1][single_pid]:
-            for ts in single_pid_rec: #nt a loop; used to set variable 'key'
-              key = ts
-            value = single_pid_rec[key]
-            if(value > max_count_for_pid):
-              max_count_for_pid = value
-          total_pulses_for_all_pids += max_count_for_pid
+      for pid_data in self.all_pulse_data:
+        for buckets in pid_data.values():
+          total_pulses_for_all_pids += sum(pulses for minute, pulses in buckets)
       total_gals_disp = total_pulses_for_all_pids * factor
     else:
       self.logger.error('15 No pulse records. couldnt calculate total' +
@@ -515,19 +607,30 @@ class irr_event():
          (not pulse_data['block'] in self.config['blocks'])):
         self.logger.error('21 Invalid value for "block"')
         result = False    
+      bucket_format = (pulse_data.get('format') == 'buckets')
       for pid_data in pulse_data['pulses']:
         for pid_entry in pid_data:
           if((type(pid_entry) != str) or (int(pid_entry) <= 0)):
             result = False
             self.logger.error('22 Invalid value for a pulse pid')
-          for single_pulse in pid_data[pid_entry]:
-            for ts in single_pulse:
-              if((type(ts) != str) or (int(ts) <= 0)):
+          if(bucket_format):
+            for bucket in pid_data[pid_entry]:
+              if((len(bucket) != 2) or (type(bucket[0]) != int) or
+                 (bucket[0] <= 0) or (bucket[0] % 60)):
                 result = False
-                self.logger.error('23 Invalid time stamp for single pulse')
-              if((type(single_pulse[ts]) != int) or (single_pulse[ts] <= 0)):
+                self.logger.error('82 Invalid time stamp for bucket')
+              elif((type(bucket[1]) != int) or (bucket[1] <= 0)):
                 result = False
-                self.logger.error('24 Invalid pulse count for single pulse')
+                self.logger.error('83 Invalid pulse count for bucket')
+          else:
+            for single_pulse in pid_data[pid_entry]:
+              for ts in single_pulse:
+                if((type(ts) != str) or (int(ts) <= 0)):
+                  result = False
+                  self.logger.error('23 Invalid time stamp for single pulse')
+                if((type(single_pulse[ts]) != int) or (single_pulse[ts] <= 0)):
+                  result = False
+                  self.logger.error('24 Invalid pulse count for single pulse')
     except Exception as e:
       result = False
       self.logger.error(f'25 Exception: {e}')
@@ -545,6 +648,11 @@ class irr_event():
     are named using a naming convention: 
   
     pulse_count_<yyyy_mm_dd>_<sched_id>_<sequence>.json  
+
+    In journal mode only the pulses received since the last checkpoint
+    are appended to the journal:
+
+    pulse_count_<yyyy_mm_dd>_<sched_id>_<sequence>.jrnl
   
     Returns:
       True             pulse count file successfully written
@@ -553,9 +661,31 @@ class irr_event():
     self.logger.info('entering: _write_pulse_count_file()')
 
     result = False
+    if(self.config['pulse_journal']):
+      if(self._clear_extraneous_files()):
+        header = {'sched_id' : self.config['sched_id'],
+                  'date'     : self.config['date'],
+                  'day'      : self.config['day'],
+                  'sequence' : self.config['sequence'],
+                  'block'    : self.config['block']}
+        result = self.journal.checkpoint(self.ledger, header)
+        if(result):
+          #pulse data loaded from a full pulse count file now in journal
+          for file_path in (self.config['pulse_file_path'],
+                            self.config['old_pulse_file_path']):
+            if(self.Path(file_path).is_file()):
+              self.Path(file_path).unlink()
+        else:
+          self.logger.error('74 could not append to pulse count journal')
+      else:
+        self.logger.error('75 Couldnt clear extraneous pulse count files')
+      return(result)
+
+    self.all_pulse_data = self.ledger.to_pulse_data()
     if(self._clear_extraneous_files()):
       if(self._create_backup_file()):
         pulse_data = { 'whatami'  : 'pulse_count',
+                       'format'   : 'buckets',
                        'sched_id' : self.config['sched_id'],
                        'date'     : self.config['date'], 
                        'day'      : self.config['day'],
@@ -575,8 +705,8 @@ class irr_event():
     """
     If a pulse count flat file exists for an irrigation event, load
     the data in that flat file into the irr_event() object's runtime
-    data structure.  Look for both a pulse count file and a backup
-    file with preference for the non backup if both exist.
+    data structure.  Look for a journal, a pulse count file, and a
+    backup file with preference, in that order, if more than one exists.
     
     Args:
       file(str)  this parameter will be supplied a value only when
@@ -595,11 +725,15 @@ class irr_event():
       if(file_path):
         pulse_file = self.Path(file_path)
       else:
-        pulse_file = self.Path(self.config['pulse_file_path'])
+        pulse_file = self.Path(self.config['journal_file_path'])
+        if(not pulse_file.is_file()):
+          pulse_file = self.Path(self.config['pulse_file_path'])
         if(not pulse_file.is_file()):
           pulse_file = self.Path(self.config['old_pulse_file_path'])
 
-      if(pulse_file.is_file()):
+      if(pulse_file.is_file() and pulse_file.suffix == '.jrnl'):
+        result = self._read_pulse_journal(pulse_file)
+      elif(pulse_file.is_file()):
         try:
           with pulse_file.open('r') as fd:
             contents = fd.read()
@@ -607,11 +741,8 @@ class irr_event():
               contents_as_a_dict = self.json.loads(contents)
               data_section = contents_as_a_dict['data']
               if(self._pulse_data_valid(data_section)):
-                pulses = data_section['pulses']
-                self.all_pulse_data = []
-                for pid_data in pulses:
-                  self.all_pulse_data.append(pid_data)
-                result = True
+                result = self.ledger.load_pulse_data(data_section['pulses'])
+                self.all_pulse_data = self.ledger.to_pulse_data()
               else:
                 self.logger.error('29 Pulse data flat file contains data' +
                                   ' errors')
@@ -637,32 +768,61 @@ class irr_event():
     return(result)
 
 
+  def _read_pulse_journal(self, pulse_file):
+    """
+    Replay a pulse count journal into the irr_event() object's runtime
+    data structure.  Any records following a corrupt record (e.g., one
+    partially written during a power loss) are ignored.
+
+    Args:
+      pulse_file(Path)   journal to replay
+
+    Returns:
+      True      successfully replayed the journal
+      False     issue / error during journal replay
+    """
+    self.logger.info('entering: _read_pulse_journal()')
+
+    result = False
+    if(self.journal and (str(pulse_file) == self.journal.file_path)):
+      journal = self.journal  #pick up where the journal left off
+    else:
+      journal = self.pulse_journal.pulse_journal(str(pulse_file))
+    pulse_data = journal.replay()
+    if(pulse_data and self._pulse_data_valid(pulse_data)):
+      result = self.ledger.load_pulse_data(pulse_data['pulses'])
+      self.all_pulse_data = self.ledger.to_pulse_data()
+    else:
+      self.logger.error('76 Pulse count journal is corrupt or contains ' +
+                        'data errors')
+      if(not self._move_file(pulse_file, 'corrupt_files')):
+        self.logger.error('77 cant move corrupt file: ' +
+                          f'{pulse_file.name} to corrupt files directory')
+    return(result)
+
+
   def _check_for_shutdown_request(self):
     """
     Other OS processes (i.e., executing irr_cntrl.py) may send the OS
     processing executing this script a request to shutdown.  Detect
-    and prescence of such reqeust.
+    and prescence of such reqeust.  Shutdown requests normally arrive
+    on the stop channel; this semaphore file check is the fallback.
 
     Returns:
       True       another OS process requests a shutdown
       False      no OS process is requesting a shutdown
       None       an issue occured before check could be made
     """
-    self.logger.info('entering: _check_for_shutdown_request()')
+    self.logger.debug('entering: _check_for_shutdown_request()')
 
     result = None
     semaphore_file_name = 'stop_irr.json'
     path                = self.paths.get_path('irr_event')
     if(path):
       try:
-        directory = self.Path(path)
-        if(directory.exists() and directory.is_dir()):
-          for item in directory.iterdir():
-            if((item.is_file()) and (item.name == semaphore_file_name)):
-              result = True
-              break
-          if(result == None):
-            result = False
+        names = self.paths.files(path, prefix=semaphore_file_name)
+        if(names != None):   #from the directory index; no directory read
+          result = (semaphore_file_name in names)
         else:
           self.logger.error('36 Could not access directory irr ev')
       except Exception as e:
@@ -721,9 +881,18 @@ class irr_event():
         else:
           file_name += 'b.json'
 
-        #write the file
+        #post the message or write the file
         path = self.paths.get_path('gals_disp')
-        if(path):
+        if(self.config['comms_mailbox']):
+          a_mailbox = self.comms_mailbox.comms_mailbox('gals_disp',
+                                                       paths=self.paths)
+          if(a_mailbox.post(file_name, message)):
+            result = True
+          else:
+            result = False
+            self.logger.error('92 could not post the gals disp message ' +
+                              f'for: {file_name}')
+        elif(path):
           path_and_file_name = path + self.paths.divider + file_name
           if(self.df.write_data(path_and_file_name, message)):
             result = True
@@ -745,7 +914,7 @@ class irr_event():
     return(result)
 
 
-  def _send_flow_alarm(self, alarm_type, percent):
+  def _send_flow_alarm(self, alarm_type, percent, blocks=None):
     """
     Create a flat file containing the alarm condition information. A
     separate module will pick up this file and transmit it to the
@@ -758,10 +927,13 @@ class irr_event():
     'sequence' : int
     'block'    : <'a'-'g'>
     'percent'  : int
+    'blocks'   : [<'a'-'g'>, ...]   #group alarm only; see irr_group.py
 
     Args:
       str       the type of flow alarm.  currently can be 'under' or 'over'
       int       the percent (0 - 100) the flow rate is under the limit
+      blocks([]) every block of an irrigation group sharing the flow
+                   sensor; the alarm is for all of them together
     """
     self.logger.info('entering: _send_flow_alarm()')
 
@@ -783,10 +955,17 @@ class irr_event():
                    'sequence' : self.config['sequence'],
                    'block'    : self.config['block'],
                    'percent'  : percent}
+        if(blocks):
+          message['blocks'] = blocks
         
-        #write file to special purpose comms dir
+        #post the message or write file to special purpose comms dir
         path = self.paths.get_path('alarms')
-        if(path):
+        if(self.config['comms_mailbox']):
+          a_mailbox = self.comms_mailbox.comms_mailbox('alarms',
+                                                       paths=self.paths)
+          if(not a_mailbox.post(file_name, message, unique=True)):
+            self.logger.error(f'93 Couldnt post alarm message: {file_name}')
+        elif(path):
           path_and_file_name = path + self.paths.divider + file_name
           if(not self.Path(path_and_file_name).is_file()):
             self.df.write_data(path_and_file_name, message)
@@ -800,67 +979,49 @@ class irr_event():
 
   def _check_flow_rate(self):
     """
-    Determine the flow rate, based on the last two data points.  Check
-    for both under flow and over flow.  If either condition is detected
-    place an alarm file in special directory; a separate module will 
-    transmit the alarm data to the AWS backend.
+    Determine the flow rate across the flow estimator's rolling window
+    (i.e., the last few complete minutes).  Check for both under flow 
+    and over flow.  If either condition is detected place an alarm file
+    in special directory; a separate module will transmit the alarm 
+    data to the AWS backend.  No check is made until the window holds
+    'flow_min_mins' complete minutes so that valve opening does not 
+    raise an under flow alarm.
+
+    Called from the main thread in _manage_irr_event(); never from the
+    GPIO callback.
+
+    Returns:
+      None             check not made (not enough data or bad config)
+      float            windowed flow rate (gallons per minute) checked
     """
-    self.logger.info('entering: _check_flow_rate()')
+    self.logger.debug('entering: _check_flow_rate()')
 
-    the_pid       = self.config['pid']
-    factor        = self.config['gals_per_pulse']
+    flow_rate     = None
+    now_ts        = int(self.clock())
     expected_flow = self.config['exp_flow'] 
     upper_tol     = self.config['over_flow_tol']
     lower_tol     = self.config['under_flow_tol']
 
-    the_pids_data     = []
-    pen_ts            = ''
-    pen_pulse_count   = 0
-    last_ts           = ''
-    last_pulse_count  = 0 
-    if(the_pid):
-      #access all pulse count data points for the pid
-      for single_pid in self.all_pulse_data:
-        for pid in single_pid:  #not loop; setting 'pid'
-          if(pid == the_pid):
-            the_pids_data = single_pid[the_pid]
-      if(len(the_pids_data) >= 2):
-        penultimate_data_point = the_pids_data[len(the_pids_data) - 2]
-        last_data_point        = the_pids_data[len(the_pids_data) - 1]
-
-        #dig out last two data points for the pid
-        for key in penultimate_data_point:  #not loop; setting 'key'
-          pen_ts          = key
-          pen_pulse_count = penultimate_data_point[key]
-        for key in last_data_point: #not loop; setting 'key'
-          last_ts          = key
-          last_pulse_count = last_data_point[key]
-
-        #determine the flow rate for last two data points for pid
-        if(pen_ts and pen_pulse_count and last_ts and last_pulse_count):
-          elapsed_mins  = int((last_ts - pen_ts) / 60)
-          pulse_count   = last_pulse_count - pen_pulse_count
-          gallons_flow  = pulse_count * factor
-          if(elapsed_mins > 0):
-            flow_rate = int(gallons_flow / elapsed_mins)
-          else:
-            flow_rate = 0
-
-          #send alarm if flow rate exceeds over / under flow tolerance
-          if((expected_flow > 0) and (upper_tol > 0) and (lower_tol > 0)):
-            upper_limit = expected_flow + int(expected_flow * (upper_tol * .01))
-            lower_limit = expected_flow - int(expected_flow * (lower_tol * .01))
-
-            if(flow_rate > upper_limit):
-              percent_over = int((flow_rate - expected_flow) / expected_flow * 100)
-              self._send_over_alarm(self.config['flow_alarms'][1], percent_over)
-            elif(flow_rate < lower_limit):
-              percent_under = int((expected_flow - flow_rate) / expected_flow * 100)
-              self._send_under_alarm(self.config['flow_alarms'][0], percent_under)
+    if(self.flow.complete_minutes(now_ts) >= self.config['flow_min_mins']):
+      flow_rate = self.flow.windowed_rate(now_ts)
+      if(flow_rate != None):
+        self.logger.debug(f'flow rate: {flow_rate:.1f} gpm windowed, ' +
+                         f'{self.flow.weighted_rate(now_ts):.1f} gpm weighted')
+
+        #send alarm if flow rate exceeds over / under flow tolerance
+        if((expected_flow > 0) and (upper_tol > 0) and (lower_tol > 0)):
+          upper_limit = expected_flow + (expected_flow * (upper_tol * .01))
+          lower_limit = expected_flow - (expected_flow * (lower_tol * .01))
+
+          if(flow_rate > upper_limit):
+            percent_over = int((flow_rate - expected_flow) / expected_flow * 100)
+            self._send_flow_alarm(self.config['flow_alarms'][1], percent_over)
+          elif(flow_rate < lower_limit):
+            percent_under = int((expected_flow - flow_rate) / expected_flow * 100)
+            self._send_flow_alarm(self.config['flow_alarms'][0], percent_under)
         else:
-          self.logger.error('46 Invalid time stamp  and / or pulse count data')
-    else:
-      self.logger.error('47 pid of OS proc executing this script not recorded')
+          self.logger.error('46 Invalid expected flow and / or tolerances')
+    return(flow_rate)
 
 
   def _irr_ev_should_continue(self):
@@ -872,12 +1033,12 @@ class irr_event():
       True      time has not expired on irrigation event
       False     time has expired on irrigation event
     """
-    self.logger.info('entering: _irr_ev_should_continue()')
+    self.logger.debug('entering: _irr_ev_should_continue()')
 
     result = None
     try:
       now_date_time = self.datetime.today()
-      date_string   = self.config['date']
+      date_string   = self.config['date'].replace('_','-')
       time_string   = self.config['start']
       dur_string    = self.config['duration']
       irr_ev_start  = (self.datetime(year=int(date_string.split('-')[0]),
@@ -903,27 +1064,15 @@ class irr_event():
     PI 4 GPIO pin connected to the water flow sensor.  The function is
     called whether the OS process managing the irrigation event is 
     actively running or in a sleep state.  This function adds a new   
-    datapoint to the pulse count data structure.
+    datapoint to the pulse ledger and the flow estimator and nothing 
+    more; flow rate checks and shutdown request checks are made in 
+    _manage_irr_event().
     """
-    self.logger.info('entering: _sensor_pulse_callback()')
-
-    time_stamp            = str(int(self.time.time()))
-    self.pulse_count      += 1
-    the_pid               = self.config['pid']
-    pid_in_all_pulse_data = False
-
-    for pid_data in self.all_pulse_data:
-      if(the_pid in pid_data):
-        pid_in_all_pulse_data = True
-        pid_data[the_pid].append({time_stamp : self.pulse_count})
-        self._check_flow_rate()
-    
-    if(not pid_in_all_pulse_data):
-      self.all_pulse_data.append({the_pid : [{time_stamp : self.pulse_count}]})
-      #since its first data point, dont call _check_flow_rate()
-      
-    if(self._check_for_shutdown_request()):
-      self._stop_irr_event()
+    self.logger.debug('entering: _sensor_pulse_callback()')
+
+    time_stamp = int(self.clock())
+    self.ledger.record(time_stamp)
+    self.flow.add(time_stamp)
 
 
   def _manage_irr_event(self):
@@ -937,168 +1086,88 @@ class irr_event():
     This function will run tasks, sleep, run tasks, sleep, etc. 
     until time runs out for the duration of the irrigation event
     which can be cut short by a shutdown request from another OS 
-    process.
+    process.  Flow rate and shutdown request checks are made every
+    'num_check_secs'; the pulse count data structure is checkpointed
+    every 'num_sleep_secs'.  A shutdown request arriving on the stop
+    channel ends the wait between checks immediately.
     """
     self.logger.info('entering: _manage_irr_event()')
 
     should_be_irrigating = True
+    secs_since_save      = 0
 
     while(should_be_irrigating):
-      self.time.sleep(self.config['num_sleep_secs'])
+      if(self.channel.wait(self.config['num_check_secs'])):
+        self._stop_irr_event()
+        break
+      secs_since_save += self.config['num_check_secs']
+
+      self._check_flow_rate()
 
       #save the pulse count data structure
-      if(not self._write_pulse_count_file()):
-        self.logger.error('49 could not checkpoint pulse count data structure')
+      if(secs_since_save >= self.config['num_sleep_secs']):
+        secs_since_save = 0
+        if(not self._write_pulse_count_file()):
+          self.logger.error('49 could not checkpoint pulse count data structure')
 
       #check for semaphore signal
       if(self._check_for_shutdown_request()):
         should_be_irrigating = False
 
       #check to see if time expired for irr even
-      if(self._irr_ev_should_continue()):
+      if(self._irr_ev_should_continue() == False):
         should_be_irrigating = False
 
       if(not should_be_irrigating):
         self._stop_irr_event()
 
 
-  def _set_config_data(self, file_path):
+  def _salvage_group(self, salvaged):
     """
     A helper function that is only invoked by an irr_event() utility
-    object.  These utility objects are created to process orphaned 
-    pulse count files.  The input parameter is used to set  the 
-    <utility object>.config[] structure inside the irr_event() 
-    utility object.  Refer to send_orphaned_data() for more 
-    information.
-     
-    Args:
-      file_path(str)     fully qualified direcotry path to orphan file 
-
-    Returns:
-      True               successfully loaded self.cofig[] data
-      False              failed to load one or more self.config[] data items
-    """
-    self.logger.info('entering: _set_config_data()')
-
-    result = False
-    if(file_path):
-      try:
-        the_file = self.Path(file_path)
-        if(the_file.is_file()):
-            with the_file.open('r') as fd:
-              contents = fd.read()
-              if(self.df.check_object(json_object=contents)):
-                contents_as_a_dict = self.json.loads(contents)
-                data_section = contents_as_a_dict['data']
-                self.config['date']     = data_section['date']
-                self.config['sched_id'] = data_section['sched_id']
-                self.config['sequence'] = data_section['sequence']
-                self.config['block']    = data_section['block']
-                result = True
-        else:
-          self.logger.error('50 could not open orphan pulse count file:' +
-                            f' {file_path}')
-      except Exception as e:
-        self.logger.error(f'51 Exception: {e}')
-    else:
-      self.logger.error('52 bad argument passed to _set_config_data()')
-    return(result)
-
-
-  def _process_orphan_file(self, path, main_file, backup_file):
-    """
-    A helper function that is only invoked by an irr_event() utility
-    object.  These utility objects are created to process orphaned 
-    pulse count files.  The input parameters hold the orphaned pulse 
-    count file name as well as the backup file name, if one exists.
-    The runtime pulse count data structure, within the utility object,
-    is cleared and then loaded with data from one of the flat files 
-    specified by the input parameters.  Refer to send_orphaned_data() 
-    for more information.
+    object.  Validate the pulse data read from a group of orphaned 
+    pulse count files (see orphan_salvage.py), calculate the average
+    flow rate and total gallons dispensed, and write a gals_disp file.
 
     Args:
-      path(str)           fully qualified path of directory containing
-                            pulse count files (and orphaned ones too)
-      main_file(str)      file name of a pulse count file
-      backuip_file(str)   fiel name for the backup to arg main_file
+      salvaged(dict)     result of reading one group of orphan files
 
     Returns:
-      False        could not process the orphaned pulse count file
-      True         successfully processed the orphaned pulse count file
+      False        could not salvage the group
+      True         successfully sent gals_disp for the group
     """
-    self.logger.info('entering: _process_orphan_file()')
+    self.logger.info('entering: _salvage_group()')
 
-    result = False
+    result     = False
+    pulse_data = salvaged['pulse_data']
     try:
-      self.all_pulse_data = []     #clear the data structure
-
-      # process the pulse count file
-      if(main_file):
-        the_file_path = path + self.paths.divider + main_file
-        
-        if(self._read_pulse_count_file(file_path=the_file_path)):
-          if(self._set_config_data(the_file_path)): 
-            flow_rate = self._calculate_average_flow_rate()
-            gals_disp = self._calculate_total_gals_disp()
-            if(flow_rate and gals_disp):
-              if(self._send_gals_disp(av_flow_rate=flow_rate, 
-                                      total_gals_disp=gals_disp,
-                                      date_str=self.config['date'].replace('-','_'))):
-                result = True
-                self.Path(the_file_path).unlink()
-                if(backup_file):
-                  the_file_path = path + self.paths.divider + backup_file
-                  self.Path(the_file_path).unlink()
-              else:
-                self.logger.error('53 could not send gals_disp file for ' +
-                                  f' orphan pulse file: {main_file}')
-            else:
-              self.logger.error('54 Could not calculate flow rate and/' +
-                                'or total gallons dispensed for orphan' +
-                                f' pulse file: {main_file}')
-          else:
-            self.logger.error('55 couldnt set irr_event.config[] ' +
-                              'values needed to process orphan ' +
-                              f'pulse file: {main_file}')
-        else:
-          self.logger.error('56 couldnt read orphaned pulse file ' +
-                            'data into the irr_event().all_pulse_data[] ' +
-                            'data structure for orphaned pulse count ' +
-                            f'file: {main_file}')
-
-      # handle case where processing pulse count file failed but a backup file
-      # exists.  also case where no pulse count file exists but backup does
-      if(not result and backup_file):
-        the_file_path = path + self.paths.divider + backup_file
-        if(self._read_pulse_count_file(file_path=the_file_path)):
-          if(self._set_config_data(the_file_path)): 
-            flow_rate = self._calculate_average_flow_rate()
-            gals_disp = self._calculate_total_gals_disp()
-            if(flow_rate and gals_disp):
-              if(self._send_gals_disp(av_flow_rate=flow_rate, 
-                                      total_gals_disp=gals_disp,
-                                      date_str = self.config['date'].replace('-','_'))):
-                result = True
-                self.Path(the_file_path).unlink()
-                if(main_file):
-                  the_file_path = path + self.paths.divider + main_file
-                  self.Path(the_file_path).unlink()
-              else:
-                self.logger.error('57 could not send gals_disp file for' +
-                                  f' orphan pulse file: {backup_file}')
-            else:
-              self.logger.error('58 coult not calculate flow rate and /' +
-                                ' or total gallons dispensed for orphan ' +
-                                f'pulse file: {backup_file}')
+      if(pulse_data and self._pulse_data_valid(pulse_data)):
+        self.config['date']     = pulse_data['date']
+        self.config['sched_id'] = pulse_data['sched_id']
+        self.config['sequence'] = pulse_data['sequence']
+        self.config['block']    = pulse_data['block']
+        self.all_pulse_data     = pulse_data['pulses']
+        flow_rate = self._calculate_average_flow_rate()
+        gals_disp = self._calculate_total_gals_disp()
+        if((flow_rate != None) and gals_disp):
+          if(self._send_gals_disp(av_flow_rate=flow_rate,
+                                  total_gals_disp=gals_disp,
+                                  date_str=self.config['date'].replace('-','_'))):
+            result = True
           else:
-            self.logger.error('59 couldnt set irr_event.config[] values ' +
-                              'needed to process orphan pulse file:' +
-                              f' {backup_file}')
+            self.logger.error('53 could not send gals_disp file for ' +
+                              f'orphan pulse file: {salvaged["used"]}')
         else:
-          self.logger.error('60 couldnt read orphaned pulse file data' +
-                            f' into the irr_event().all_pulse_data[] data' +
-                            ' structure for orphaned pulse count file: ' +
-                            f'{backup_file}')
+          self.logger.error('54 Could not calculate flow rate and/' +
+                            'or total gallons dispensed for orphan' +
+                            f' pulse file: {salvaged["used"]}')
+      elif(pulse_data):
+        salvaged['corrupt'].append(salvaged['used'])
+        self.logger.error('55 orphan pulse file contains data errors: ' +
+                          f'{salvaged["used"]}')
+      else:
+        self.logger.error('56 no readable orphan pulse file for: ' +
+                          f'{salvaged["root"]}')
     except Exception as e:
       self.logger.error(f'61 Exception: {e}')
     return(result)
@@ -1113,7 +1182,17 @@ class irr_event():
     destined for transmission to the AWS backend.  An attempt is made
     to process all orphaned pulse count files.  If an orphan cannot be
     processed it will be uploaed to an S3 bucket for future forensic 
-    analysis.
+    analysis.  Files that fail integrity or data checks are moved to
+    the corrupt_files directory.
+
+    The files of each irrigation event are grouped and all groups are
+    read in a single batch by a pool of worker OS processes (see
+    orphan_salvage.py).  gals_disp files are then written in one pass.
+    A report is logged and kept in self.salvage_report:
+
+      {'groups': <int>, 'salvaged': <int>, 'orphaned': <int>,
+       'corrupt': <int>, 'files': <int>, 'bytes': <int>,
+       'secs': <float>, 'files_per_sec': <float>}
 
     This function, as well as irr_event() processing in general, relies
     on strict naming standards for pulse count file (and all other 
@@ -1121,11 +1200,15 @@ class irr_event():
 
     pulse_count_<yyyy_mm_dd>_<sched_id>_<sequence>.json  
     pulse_count_<yyyy_mm_dd>_<sched_id>_<sequence>.json.old
+    pulse_count_<yyyy_mm_dd>_<sched_id>_<sequence>.jrnl
+    pulse_count_<yyyy_mm_dd>_<sched_id>_<sequence>.jrnl.tmp
+    .pulse_count_<yyyy_mm_dd>_<sched_id>_<sequence>.json.tmp
 
     Returns:
       None           Issue before beginning
-      True           Successfully processed and/or uploaded all orphans
-      False          Failed to process / upload one or more orphans
+      True           Successfully processed all orphans
+      False          Failed to process one or more orphans; they were
+                       moved to orphans or corrupt_files
     """
     self.logger.info('entering: send_orphaned_data()')
 
@@ -1133,72 +1216,118 @@ class irr_event():
     # build dict inventory of all orphaned pulse files and backup files
     path = self.paths.get_path('irr_ev_in_progress')
     if(path):
-      directory  = self.Path(path)
+      start_time  = self.time.monotonic()
+      directory   = self.Path(path)
       pulse_files = {}
-      for item in directory.iterdir():
-        if(item.is_file()):
-          file_name_root = item.name.split('.')[0]
-          if(not file_name_root in pulse_files):
-            pulse_files[file_name_root] = {'file': None, 'backup':None}
-          if(len(item.name.split('.')) > 2):
-            pulse_files[file_name_root]['backup'] = item.name
+      for name in self.paths.files(path, hidden=True):
+        item = self.Path(path, name)
+        file_name_root = item.name.split('.')[0]
+        if(item.name.endswith('.tmp')):
+          item.unlink()       #interrupted compaction or dura_file write;
+          continue            #  the file it was replacing is intact
+        if(not file_name_root in pulse_files):
+          pulse_files[file_name_root] = {'root': file_name_root, 
+                                         'file': None, 'backup':None,
+                                         'journal': None}
+        if(item.name.endswith('.jrnl')):
+          pulse_files[file_name_root]['journal'] = item.name
+        elif(len(item.name.split('.')) > 2):
+          pulse_files[file_name_root]['backup'] = item.name
+        else:
+          pulse_files[file_name_root]['file'] = item.name
+
+      # read all groups in a worker pool then emit gals_disp files
+      report = {'groups': len(pulse_files), 'salvaged': 0, 'orphaned': 0,
+                'corrupt': 0, 'files': 0, 'bytes': 0}
+      result = True
+      if(pulse_files):
+        salvage = self.orphan_salvage.orphan_salvage()
+        groups  = salvage.read_groups(path, self.paths.divider,
+                                      list(pulse_files.values()))
+        for salvaged in groups:
+          report['files'] += len(salvaged['files'])
+          report['bytes'] += salvaged['bytes']
+          if(self._salvage_group(salvaged)):
+            report['salvaged'] += 1
+            destination = None      #successfully processed; delete
           else:
-            pulse_files[file_name_root]['file'] = item.name
-
-      # process all orphans. successfully processed files are deleted.  
-      # error(s) during processing results in upload to S3
-      for file_name_root in pulse_files:
-        main_file   = pulse_files[file_name_root]['file']
-        backup_file = pulse_files[file_name_root]['backup']
-        process_success = self._process_orphan_file(path, main_file, backup_file)
-        
-        # processing failed; clean up pulse files if they are stil present
-        if(not process_success):
-          if(main_file):
-            the_file_path = path + self.paths.divider + main_file
-            file = self.Path(the_file_path)
-            if(file.is_file()):
-              self._move_file(file, 'orphans')
-              if(backup_file):
-                the_file_path = path + self.paths.divider + backup_file
-                file = self.Path(the_file_path)
-                if(file.is_file()):
-                  file.unlink()
-          elif(backup_file):
-            the_file_path = path + self.paths.divider + backup_file
-            file = self.Path(the_file_path)
-            if(file.is_file()):
-              self._move_file(file, 'orphans')
+            result = False
+            destination = 'orphans'
+
+          # delete or move every file of the group still present
+          for file_name in salvaged['files']:
+            file = self.Path(path + self.paths.divider + file_name)
+            try:
+              if(not file.is_file()):
+                continue
+              if(file_name in salvaged['corrupt']):
+                report['corrupt'] += 1
+                if(not self._move_file(file, 'corrupt_files')):
+                  self.logger.error('86 could not move corrupt orphan ' +
+                                    f'pulse file: {file_name}')
+              elif(destination):
+                report['orphaned'] += 1
+                if(not self._move_file(file, destination)):
+                  self.logger.error('84 could not move orphan pulse file: ' +
+                                    f'{file_name}')
+              else:
+                file.unlink()
+            except Exception as e:
+              self.logger.error(f'85 Exception: {e}')
+
+      report['secs'] = round(self.time.monotonic() - start_time, 3)
+      if(report['secs'] > 0):
+        report['files_per_sec'] = round(report['files'] / report['secs'], 1)
+      else:
+        report['files_per_sec'] = 0.0
+      self.salvage_report = report
+      if(report['groups']):
+        self.logger.info(f'orphan salvage: {report}')
     else:
       self.logger.error('62 Couldnt get directory for irrigation event' +
                         ' in progress')
     return(result)
 
 
-  def _stop_irr_event(self):
+  def _stop_irr_event(self, group_member=False):
     """
     Perform orderly shut down of the management of an irrigation event.
     This involves closing the valve, calculating the total gallons 
     dispensed during the irrigation event, calculating the average flow
     rate for the irrigation event and sending this data to the AWS
     backend.
+
+    Args:
+      group_member(bool)   True if the irr ev is a member of an 
+                             irr_group(); only its own valve is closed
+                             and the group is left to acknowledge the
+                             stop channel and clean up directories
     """
     self.logger.info('entering: _stop_irr_event()')
 
     # set two variables used in multiple places below
-    main_file = self.config.get('pulse_file_path', None)
-    backup_file = self.config.get('old_pulse_file_path', None)
+    if(self.config['pulse_journal']):
+      main_file = self.config.get('journal_file_path', None)
+      backup_file = None
+    else:
+      main_file = self.config.get('pulse_file_path', None)
+      backup_file = self.config.get('old_pulse_file_path', None)
     if(main_file):
       main_file = self.Path(main_file)
     if(backup_file):
       backup_file = self.Path(backup_file)
 
-    self._close_all_valves()
+    if(group_member):
+      self._close_block(self.config['block'])
+    else:
+      self._close_all_valves()
+      self.channel.valves_closed()
 
     # flush data struct of any newly arrive data since last save to file
     if(not self._write_pulse_count_file()):
       self.logger.error('63 could not checkpoint the pulse count data' +
                         ' structure')
+    self.all_pulse_data = self.ledger.to_pulse_data()
     
     # process pulse count data structure, creating a gals_disp file
     flow_rate = self._calculate_average_flow_rate()
@@ -1249,9 +1378,12 @@ class irr_event():
           backup_file.unlink()
     
     # clean up irrigation event directories
+    if(group_member):
+      return
     self.send_orphaned_data()
     self._clear_directory(self.paths.get_path('irr_event'))
     self._clear_directory(self.paths.get_path('irr_ev_in_progress'))
+    self.channel.close()
 
 
   def start_irr_ev(self, irr_ev_detail):
@@ -1269,7 +1401,47 @@ class irr_event():
     """
     self.logger.info('entering: start_irr_ev()')
 
+    if(not self._set_up_GPIO()):
+      self.logger.error('88 Could not set up GPIO; irr event not started')
+      return
     self._close_all_valves()     #to be bullet proof
+    if(not self._prepare_irr_ev(irr_ev_detail)):
+      return
+    try:
+      if(not self.channel.listen()):
+        self.logger.info('stop channel unavailable; relying on semaphore file')
+
+      self._open_value(self.config['block'])
+      self.flow.start(int(self.clock()))
+
+      if(not self._send_gals_disp(total_gals_disp=1)):
+        self.logger.error('71 could not write 1 gal disp file for block: ' +
+                          f'{self.config["block"]}')
+
+      self._manage_irr_event()  #become a long running OS process
+    except Exception as e:
+      self.logger.error('72 Could not start irrigation event process. ' +
+                        f'Exception: {e}')
+
+
+  def _prepare_irr_ev(self, irr_ev_detail):
+    """
+    Finish off the initialization of the irr_event object: take on the
+    irr ev details, name the pulse count files, and load any prior pulse
+    data that might exist.  Valves and GPIO are left untouched so that
+    an irr_group() can prepare several irr_event objects before opening
+    any valves.
+
+    Args:
+      {}        contains all available details for the irr ev
+
+    Returns:
+      True      ready to start the irr ev
+      False     bad irr ev details
+    """
+    self.logger.info('entering: _prepare_irr_ev()')
+
+    result = False
     try:
       self.config['start']          = irr_ev_detail['start']          #'hh:mm'
       self.config['duration']       = irr_ev_detail['duration']       #'hh:mm'
@@ -1295,15 +1467,17 @@ class irr_event():
       self.config['pulse_file_path'] = pulse_file_path
       self.config['old_pulse_file_path'] = pulse_file_path + '.old'
 
-      self._read_pulse_count_file() #load any prior pulse data that might exist
-
-      self._open_valve(self.config['block'])
-
-      if(not self._send_gals_disp(total_gals_disp=1)):
-        self.logger.error('71 could not write 1 gal disp file for block: ' +
-                          f'{self.config["block"]}')
+      #build name of, and full path to, pulse journal
+      self.config['journal_file'] = pulse_file[:-len('.json')] + '.jrnl'
+      self.config['journal_file_path'] = (pulse_file_path[:-len('.json')] +
+                                          '.jrnl')
+      self.journal = self.pulse_journal.pulse_journal(
+                       self.config['journal_file_path'],
+                       compact_every=self.config['journal_compact_every'])
 
-      self._manage_irr_event()  #become a long running OS process
+      self._read_pulse_count_file() #load any prior pulse data that might exist
+      result = True
     except Exception as e:
-      self.logger.error('72 Could not start irrigation event process. ' +
-                        f'Exception: {e}')
\ No newline at end of file
+      self.logger.error('91 Could not prepare irrigation event. ' +
+                        f'Exception: {e}')
+    return(result)
\ No newline at end of file
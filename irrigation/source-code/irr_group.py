@@ -0,0 +1,333 @@
+"""
+Jaye Hicks 2021
+
+Obligatory legal disclaimer:
+  You are free to use this source code (this file and all other files
+  referenced in this file) "AS IS" WITHOUT WARRANTY OF ANY KIND, EITHER
+  EXPRESSED OR IMPLIED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+  THE ENTIRE RISK AS TO THE QUALITY AND PERFORMANCE OF THIS SOURCE CODE
+  IS WITH YOU.  SHOULD THE SOURCE CODE PROVE DEFECTIVE, YOU ASSUME THE
+  COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU
+  GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
+
+Objects of type irr_group() manage several irrigation events at the
+same time from a single long running OS process.  This is used when
+irr_sched() is in concurrent mode (i.e., config['concurrent_irr_evs']
+== True) and the time windows of irrigation events overlap.  Irrigation
+events are only run together while their summed expected flow stays
+within the pump's rating of 20 gallons per minute.
+
+Each irrigation event is managed by its own irr_event() object (i.e., a
+member of the group) that keeps its own pulse ledger, flow estimator,
+pulse count files, alarms, and gals_disp files.  The group owns what
+the members share: the GPIO backend, the flow sensor callback, and the
+stop channel.
+
+There is a single flow sensor plumbed in-line ahead of the valve
+controller so a pulse cannot be attributed to a particular block.
+Pulses are apportioned among the members in proportion to their
+expected flow using smooth weighted round robin: on each pulse every
+member earns credit equal to its expected flow, the member with the
+most credit receives the pulse and gives back the summed expected
+flow.  Over any stretch of time each member receives its share of the
+pulses, spread evenly (e.g., 12 gpm and 6 gpm members receive pulses
+in a repeating 2:1 pattern.)  When a member's irrigation event ends its
+valve is closed and the remaining members share the pulses.
+
+As each member's share is set by expected flow, not measured, a member's
+own flow rate says nothing about its block.  The flow rate is checked
+once for the group: every pulse against the summed expected flow of the
+active members.  An under / over flow raises one alarm naming all of
+the active blocks (a stuck or leaking valve cant be told apart from the
+others.)  The check starts over whenever the set of active members
+changes.
+
+Usage:
+  >>> import irr_group
+  >>> group = irr_group.irr_group()
+  >>> group.start([<irr ev detail>, <irr ev detail>])  #long running
+"""
+class irr_group():
+  import logging
+  import time
+
+  import gpio_backend
+  import flow_estimator
+  import irr_event
+  import stop_channel
+
+
+  def __init__(self, gpio=None):
+    """
+    Args:
+      gpio          object offering the RPi.GPIO interface (e.g., a
+                      gpio_sim() object); default is chosen by
+                      gpio_backend()
+    """
+    self.logger = self.logging.getLogger(__name__)
+    self.logger.info('entering: __init__()')
+
+    if(gpio):
+      self.GPIO = gpio
+    else:
+      self.GPIO = self.gpio_backend.gpio_backend().load()
+    self.clock   = self.time.time  #gpio_sim() supplies a simulated clock
+    self.channel = self.stop_channel.stop_channel()
+    self.members = []              #every irr_event() object in the group
+    self.active  = []              #members whose irr ev is still running
+
+    #(members, weights, credits, summed weight, group flow estimator);
+    #swapped as a whole so the GPIO callback thread always sees a
+    #consistent set
+    self.share   = ((), (), [], 0, None)
+
+    self.config                   = {}
+    self.config['pump_gpm_max']   = 20    #irrigation pump rating
+    self.config['num_sleep_secs'] = 300   #between pulse count checkpoints
+    self.config['num_check_secs'] = 10    #between flow / shutdown checks
+
+
+  def admit(self, irr_ev_details):
+    """
+    Select the irr evs that can run together: in the order given, an irr
+    ev is admitted if its block isnt already in use and the summed
+    expected flow stays within the pump's rating.
+
+    Args:
+      irr_ev_details([])   list of dicts; see irr_event.start_irr_ev()
+
+    Returns:
+      []                   admitted irr ev details
+    """
+    self.logger.info('entering: admit()')
+
+    admitted    = []
+    blocks      = []
+    summed_flow = 0
+    for detail in irr_ev_details:
+      if((summed_flow + detail['exp_flow'] <= self.config['pump_gpm_max']) and
+         (not detail['block'] in blocks)):
+        admitted.append(detail)
+        blocks.append(detail['block'])
+        summed_flow += detail['exp_flow']
+      else:
+        self.logger.error(f'1 irr ev seq {detail["sequence"]} block ' +
+                          f'{detail["block"]} not admitted to group')
+    return(admitted)
+
+
+  def _set_share(self):
+    """
+    Rebuild the pulse apportioning state from the active members.
+    """
+    self.logger.info('entering: _set_share()')
+
+    members = tuple(self.active)
+    weights = tuple(max(int(member.config['exp_flow']), 1)
+                    for member in members)
+    flow    = None
+    if(members):
+      config = members[0].config
+      flow   = self.flow_estimator.flow_estimator(
+                 window_mins=config['flow_window_mins'],
+                 alpha=config['flow_ewma_alpha'],
+                 gals_per_pulse=config['gals_per_pulse'])
+      flow.start(int(self.clock()))
+    self.share = (members, weights, [0] * len(members), sum(weights), flow)
+
+
+  def _sensor_pulse_callback(self, channel):
+    """
+    This function is called each time a pulse signal is received on the
+    PI 4 GPIO pin connected to the water flow sensor.  The pulse is
+    given to one member (see module doc string) and added to that
+    member's pulse ledger and flow estimator; nothing more.
+    """
+    self.logger.debug('entering: _sensor_pulse_callback()')
+
+    members, weights, credits, total, flow = self.share
+    if(members):
+      best = 0
+      for index in range(len(members)):
+        credits[index] += weights[index]
+        if(credits[index] > credits[best]):
+          best = index
+      credits[best] -= total
+
+      time_stamp = int(self.clock())
+      members[best].ledger.record(time_stamp)
+      members[best].flow.add(time_stamp)
+      flow.add(time_stamp)
+
+
+  def _stop_member(self, member):
+    """
+    End a single member's irr ev; the other members keep irrigating.
+    """
+    self.logger.info('entering: _stop_member()')
+
+    self.active.remove(member)
+    self._set_share()             #following pulses go to remaining members
+    member._stop_irr_event(group_member=True)
+
+
+  def _stop_group(self):
+    """
+    Perform orderly shut down of every irr ev still running then clean
+    up the irrigation event directories.
+    """
+    self.logger.info('entering: _stop_group()')
+
+    if(self.members):
+      self.members[0]._close_all_valves()
+    self.channel.valves_closed()
+
+    while(self.active):
+      self._stop_member(self.active[0])
+
+    if(self.members):
+      utility = self.members[0]
+      utility.send_orphaned_data()
+      utility._clear_directory(utility.paths.get_path('irr_event'))
+      utility._clear_directory(utility.paths.get_path('irr_ev_in_progress'))
+    self.channel.close()
+
+
+  def _check_flow_rate(self):
+    """
+    Check the group's flow rate, across the rolling window, against the
+    summed expected flow of the active members (see module doc string);
+    mirrors irr_event._check_flow_rate().  The members' tolerances and
+    window settings are used; they are the same for every member.
+
+    Returns:
+      None             check not made (not enough data or bad config)
+      float            windowed flow rate (gallons per minute) checked
+    """
+    self.logger.debug('entering: _check_flow_rate()')
+
+    flow_rate = None
+    members, weights, credits, total, flow = self.share
+    if(members):
+      config        = members[0].config
+      now_ts        = int(self.clock())
+      expected_flow = sum(member.config['exp_flow'] for member in members)
+      upper_tol     = config['over_flow_tol']
+      lower_tol     = config['under_flow_tol']
+
+      if(flow.complete_minutes(now_ts) >= config['flow_min_mins']):
+        flow_rate = flow.windowed_rate(now_ts)
+        if(flow_rate != None):
+          self.logger.debug(f'group flow rate: {flow_rate:.1f} gpm windowed')
+          if((expected_flow > 0) and (upper_tol > 0) and (lower_tol > 0)):
+            upper_limit = expected_flow + (expected_flow * (upper_tol * .01))
+            lower_limit = expected_flow - (expected_flow * (lower_tol * .01))
+            blocks      = [member.config['block'] for member in members]
+
+            if(flow_rate > upper_limit):
+              percent = int((flow_rate - expected_flow) / expected_flow * 100)
+              members[0]._send_flow_alarm(config['flow_alarms'][1], percent,
+                                          blocks=blocks)
+            elif(flow_rate < lower_limit):
+              percent = int((expected_flow - flow_rate) / expected_flow * 100)
+              members[0]._send_flow_alarm(config['flow_alarms'][0], percent,
+                                          blocks=blocks)
+          else:
+            self.logger.error('7 Invalid expected flow and / or tolerances')
+    return(flow_rate)
+
+
+  def _manage_group(self):
+    """
+    The business end of the long running OS process.  Mirrors
+    irr_event._manage_irr_event() for the group: a flow rate check
+    every 'num_check_secs', pulse count checkpoints every
+    'num_sleep_secs'.  A member whose time has run out is stopped on
+    its own; a shutdown request stops the whole group.
+    """
+    self.logger.info('entering: _manage_group()')
+
+    secs_since_save = 0
+    while(self.active):
+      if(self.channel.wait(self.config['num_check_secs'])):
+        break
+      secs_since_save += self.config['num_check_secs']
+
+      self._check_flow_rate()
+
+      #save the pulse count data structures
+      if(secs_since_save >= self.config['num_sleep_secs']):
+        secs_since_save = 0
+        for member in self.active:
+          if(not member._write_pulse_count_file()):
+            self.logger.error('2 could not checkpoint pulse count data ' +
+                              f'for block: {member.config["block"]}')
+
+      #check for semaphore signal
+      if(self.active[0]._check_for_shutdown_request()):
+        break
+
+      #stop each member whose time has expired
+      for member in list(self.active):
+        if(member._irr_ev_should_continue() == False):
+          self._stop_member(member)
+    self._stop_group()
+
+
+  def start(self, irr_ev_details):
+    """
+    Become the long running OS process that manages a group of irr evs.
+    Returns once every irr ev has ended or a shutdown was requested.
+
+    Args:
+      irr_ev_details([])   list of dicts; see irr_event.start_irr_ev()
+
+    Returns:
+      None                 no irr ev could be started
+      True                 group ran to completion
+    """
+    self.logger.info('entering: start()')
+
+    result = None
+    for detail in self.admit(irr_ev_details):
+      member = self.irr_event.irr_event(gpio=self.GPIO)
+      member.clock = self.clock
+      if(member._prepare_irr_ev(detail)):
+        self.members.append(member)
+      else:
+        self.logger.error('3 Could not prepare irr ev for block: ' +
+                          f'{detail["block"]}')
+
+    if(self.members and
+       self.members[0]._set_up_GPIO(callback=self._sensor_pulse_callback)):
+      for member in self.members:
+        member.shared_files = tuple(
+          file_name for other in self.members if(other is not member)
+            for file_name in (other.config['pulse_file'],
+                              other.config['pulse_file'] + '.old',
+                              other.config['journal_file'],
+                              other.config['journal_file'] + '.tmp'))
+      self.members[0]._close_all_valves()     #to be bullet proof
+
+      try:
+        if(not self.channel.listen()):
+          self.logger.info('stop channel unavailable; relying on ' +
+                           'semaphore file')
+        for member in self.members:
+          if(member._open_block(member.config['block'])):
+            self.active.append(member)
+            if(not member._send_gals_disp(total_gals_disp=1)):
+              self.logger.error('4 could not write 1 gal disp file for ' +
+                                f'block: {member.config["block"]}')
+        self._set_share()
+        self.logger.info('irrigating blocks: ' +
+                         f'{[m.config["block"] for m in self.active]}')
+        self._manage_group()
+        result = True
+      except Exception as e:
+        self.logger.error(f'5 Could not run irrigation group. Exception: {e}')
+        self._stop_group()
+    elif(self.members):
+      self.logger.error('6 Could not set up GPIO; irr group not started')
+    return(result)
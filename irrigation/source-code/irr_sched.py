@@ -28,8 +28,11 @@ support of irrigation schedules.
   - return irr ev that is curently being executed
   - return irr ev that should be currently executed
   - return all available details for an irr ev
+  - concurrent mode (i.e., config['concurrent_irr_evs'] == True):
+    return the group of overlapping irr evs that should be currently
+    executed; their summed exp_flow stays within pump capacity
 
-NOTE: the identifier 'boto3' is overidden in the class irr_sched()
+NOTE: the boto3 session is created on first use; see irr_sched._session()
 
 irr_sched() requests the most current irrigation schedule by invoking
 an API Gateway API.  In this call the PI 4 supplies the id of the 
@@ -100,20 +103,21 @@ class irr_sched():
   import time
   from   datetime          import datetime, timedelta
   import json
-  import boto3
-  import boto3.session
-  import requests
-  from   requests_aws4auth import AWS4Auth
   from   pathlib           import Path
 
   import dura_file
   import lv_paths
   import process_cntrl
 
+  import lazy_import    #heavy SDKs are imported on first use
+  boto3    = lazy_import.lazy_import('boto3')
+  requests = lazy_import.lazy_import('requests')
+  AWS4Auth = lazy_import.lazy_import('requests_aws4auth', 'AWS4Auth')
+
 
   def __init__(self):
     """
-    NOTE: identifier 'boto3' overidden to refer to a boto3 session
+    NOTE: the boto3 session is created on first use; see _session()
 
     The fixed schedule with id == 0 is reserved as the default
     irrigation schedule.
@@ -121,6 +125,10 @@ class irr_sched():
     self.logger = self.logging.getLogger(__name__)
 
     self.logger.info('entering: __init__()')
+    self.session = None      #boto3 session; see _session()
+    self.auth    = None      #API Gwy signer; see _auth()
+    self.auth_keys = None
+    self.http    = None      #requests session; see _http()
     self.df            = self.dura_file.dura_file()
     self.paths         = self.lv_paths.lv_paths()
     self.proc_cntrl    = self.process_cntrl.process_cntrl()
@@ -143,37 +151,100 @@ class irr_sched():
     self.config['irr_ev_hrs_max'] = 4
     self.config['fixed_days']     = ['mon','tue','wed','thu','fri','sat','sun']
     self.config['intel_days']     = ['day1','day2','day3']
+    self.config['concurrent_irr_evs'] = False  #overlapping irr evs allowed
+    self.config['pump_gpm_max']   = 20    #irrigation pump rating
 
     if(self.config['env'] == 'debug'):
       self.config['get_sched']= (
         'https://abcdefghij.execute-api.us-east-1.amazonaws.com/prod') 
       self.config['region'] = 'us-east-1'
 
-      #overide identifier 'boto3' (session using IAM credentials below)
-      try:
-        self.boto3 = self.boto3.Session(
-          aws_access_key_id     = '12345678901234567890', 
-          aws_secret_access_key = '123456789012345678901234567890123456789012',
-          region_name           = self.config['region'])
-      except Exception as e:
-        self.logger.error(f'1 Could not create boto3 session.  Exception: {e}')
+      #session using IAM credentials below
+      self.session_args = {
+        'aws_access_key_id'     : '12345678901234567890',
+        'aws_secret_access_key' : '123456789012345678901234567890123456789012',
+        'region_name'           : self.config['region']}
     else: 
       self.config['get_sched'] = ( 
         'https://abcdefghij.execute-api.us-east-1.amazonaws.com/prod') 
       self.config['region'] = 'us-east-1'
 
-      #overide identifier 'boto3' (session using AWS CLI default profile)
-      try:
-        self.boto3 = self.boto3.session.Session()
-      except Exception as e:
-        self.logger.error(f'2 Could not create boto3 session. Exception: {e}')
+      #session using AWS CLI default profile
+      self.session_args = {}
+
+
+  def _session(self):
+    """
+    The boto3 session, created on first use.  Creating it imports boto3
+    so it is not done in __init__(); most cron cycles never call AWS.
+
+    Returns:
+      None        boto3 session could not be created
+      session     boto3 session
+    """
+    self.logger.info('entering: _session()')
+
+    if(self.session == None):
+      if(self.session_args):
+        try:
+          self.session = self.boto3.Session(**self.session_args)
+        except Exception as e:
+          self.logger.error(f'1 Could not create boto3 session. ' +
+                            f'Exception: {e}')
+      else:
+        try:
+          self.session = self.boto3.session.Session()
+        except Exception as e:
+          self.logger.error(f'2 Could not create boto3 session. ' +
+                            f'Exception: {e}')
+    return(self.session)
+
+
+  def _auth(self):
+    """
+    The AWS SigV4 signer for API Gwy calls.  Kept between calls and
+    rebuilt only if the session's credentials change (e.g., a refreshed
+    CLI profile.)
+
+    Returns:
+      None        boto3 session or credentials unavailable
+      AWS4Auth    signer
+    """
+    self.logger.info('entering: _auth()')
+
+    session = self._session()
+    if(session):
+      credentials = session.get_credentials()
+      if(credentials):
+        keys = (credentials.access_key, credentials.secret_key)
+        if((self.auth == None) or (self.auth_keys != keys)):
+          self.auth      = self.AWS4Auth(credentials.access_key,
+                                         credentials.secret_key,
+                                         self.config['region'],
+                                         'execute-api')
+          self.auth_keys = keys
+    return(self.auth)
+
+
+  def _http(self):
+    """
+    The requests session used to invoke API Gwy endpoints.  Reused so
+    that a long lived object (see irr_cntrl.supervise()) keeps its
+    connection, and TLS session, to the endpoint open between calls.
+    """
+    self.logger.info('entering: _http()')
+
+    if(self.http == None):
+      self.http = self.requests.Session()
+    return(self.http)
 
 
   def _number_files_in_dir(self, path):
     """
     Return the number of files contained in the specified directory.  
     Counts only files, not direoctories, symbolic links, etc.  See
-    Caution in function _describe_sched() 
+    Caution in function _describe_sched().  Answered from the lv_paths()
+    directory index; the directory is only read if it has changed.
 
     Args:
       path(str)  fully qualified path to directory
@@ -187,16 +258,10 @@ class irr_sched():
 
     file_count = None
     if(path):
-      try:
-        directory  = self.Path(path)
-        dir_name   = directory.name
-        file_count = 0
-        for item in directory.iterdir():
-          if(item.is_file()):
-            file_count += 1
-      except Exception as e:
+      file_count = self.paths.count_files(path)
+      if(file_count == None):
         file_count = False
-        self.logger.error(f'3 Issue accessing dir: {dir_name} Exception: {e}')
+        self.logger.error(f'3 Issue accessing dir: {self.Path(path).name}')
     else:
       self.logger.error('4 Bad argument passed to _number_files_in_dir')
     return(file_count)
@@ -227,9 +292,8 @@ class irr_sched():
       path = self.paths.get_path('cur_irr_sched')
       directory = self.Path(path)
       if(directory.is_dir()):
-        for item in directory.iterdir():
-          if(item.is_file()):
-            item.unlink()
+        for name in self.paths.files(path):
+          self.Path(path, name).unlink()
       else:
         self.logger.error('6 Couldnt access "cur_irr_sched" directory')
         result = False
@@ -237,9 +301,8 @@ class irr_sched():
       path = self.paths.get_path('new_irr_sched')
       directory = self.Path(path)
       if(directory.is_dir()):
-        for item in directory.iterdir():
-          if(item.is_file()):
-            item.unlink()
+        for name in self.paths.files(path):
+          self.Path(path, name).unlink()
       else:
         self.logger.error('7 Couldnt access "new_irr_sched" directory')
         result = False
@@ -247,9 +310,8 @@ class irr_sched():
       path = self.paths.get_path('irr_event')
       directory = self.Path(path)
       if(directory.is_dir()):
-        for item in directory.iterdir():
-          if(item.is_file()):
-            item.unlink()
+        for name in self.paths.files(path):
+          self.Path(path, name).unlink()
       else:
         self.logger.error('8 Couldnt access "irr_event" directory')
         result = False
@@ -258,16 +320,16 @@ class irr_sched():
       path = self.paths.get_path('irr_ev_in_progress')
       directory = self.Path(path)
       if(directory.is_dir()):
-        for item in directory.iterdir():
-          if(item.is_file()):
-            if((item.name.split('_')[0] == 'pulse') and
-              (item.name.split('_')[1] == 'count')):
-              if(not self._move_file(item, 'orphans')):
-                result = False
-                self.logger.error('9 Couldnt move pulse count file: ' +
-                                  f'{item.name}')
-            else:
-              item.unlink()
+        for name in self.paths.files(path):
+          item = self.Path(path, name)
+          if((item.name.split('_')[0] == 'pulse') and
+            (item.name.split('_')[1] == 'count')):
+            if(not self._move_file(item, 'orphans')):
+              result = False
+              self.logger.error('9 Couldnt move pulse count file: ' +
+                                f'{item.name}')
+          else:
+            item.unlink()
       else:
         self.logger.error('10 Couldnt access "irr_ev_in_progress" directory')
         result = False
@@ -326,21 +388,21 @@ class irr_sched():
       try:
         directory = self.Path(path)
         if(directory.is_dir()):
-          for item in directory.iterdir():
-            if(item.is_file()):
-              full_path = path + self.paths.divider + item.name
-              if(not self.df.check_object(file_name=full_path)):
-                if(not self._move_file(item, 'corrupt_files')):
-                  self.logger.error('14 couldnt move corrupt file: ' +
-                                    f'{item.name}')
+          for name in self.paths.files(path):
+            item = self.Path(path, name)
+            full_path = path + self.paths.divider + item.name
+            if(not self.df.check_object(file_name=full_path)):
+              if(not self._move_file(item, 'corrupt_files')):
+                self.logger.error('14 couldnt move corrupt file: ' +
+                                  f'{item.name}')
+            else:
+              item_type = item.name.split('_')[3]
+              if(item_type == 'fixed'):
+                fixed_scheds.append(item.name)
+              elif(item_type == 'intel'):
+                intel_scheds.append(item.name)
               else:
-                item_type = item.name.split('_')[3]
-                if(item_type == 'fixed'):
-                  fixed_scheds.append(item.name)
-                elif(item_type == 'intel'):
-                  intel_scheds.append(item.name)
-                else:
-                  item.unlink()       # not a valid sched file name so delete it
+                item.unlink()       # not a valid sched file name so delete it
         if(len(fixed_scheds) > 1):
           result = self._software_reset()    # punt as we dont know which has precedence
         elif(len(fixed_scheds) == 1):
@@ -392,9 +454,8 @@ class irr_sched():
         dir_name = directory.name
         if(directory.is_dir()):
           result = True
-          for item in directory.iterdir():
-            if(item.is_file()):
-              item.unlink()
+          for name in self.paths.files(path):
+            self.Path(path, name).unlink()
       except Exception as e:
         result = False
         self.logger.error(f'16 Could not clear a directory: {dir_name}. ' +
@@ -663,24 +724,19 @@ class irr_sched():
     return(irr_ev_detail)
 
 
-  def irr_ev_should_be_underway(self):
+  def _irr_evs_in_window(self):
     """
-    Per the irrigation schedule currently in force, what irr ev, if
-    any, should be currently executing.
+    Per the irrigation schedule currently in force, find every irr ev
+    whose time window includes the current time.
 
     Returns:
       None         issue occured before determination could be made
-
-      False        an irrigation event should not be occuring
-      dict         the irrigation event that should be occuring now
-                      {irr_ev_date:  <yyyy-mm-dd> or 'any', 
-                       irr_ev_day:   <'day1', 'day2', 'day3'> or
-                                     <'sun', 'mon', 'tue', wed', 'thu',
-                                      'fri', 'sat'>,
-                       irr_ev_seq:   <int > 0>, 
-                       irr_sched_id: <int >= 0>}
+      False        no irrigation event should be occuring
+      []           list of (<irr ev from schedule>, <irr ev description>)
+                     in schedule order.  See irr_ev_should_be_underway()
+                     for the irr ev description
     """
-    self.logger.info('entering: irr_ev_should_be_underway()')
+    self.logger.info('entering: _irr_evs_in_window()')
 
     result    = None
     the_sched = self._read_curr_sched()
@@ -716,6 +772,7 @@ class irr_sched():
         
         #cycle through all irr evs, see if current time in their time window
         if(result == None):
+          result = []
           for event in irr_events:
             ev_date_time_start = (
               self.datetime(year=now_date_time.year,
@@ -730,21 +787,123 @@ class irr_sched():
             ev_seq = event['sequence']
 
             if(ev_date_time_start < now_date_time < ev_date_time_stop):
-              result = {'irr_ev_seq'   : ev_seq,
-                        'irr_sched_id' : the_sched_id,
-                        'irr_ev_day'   : irr_ev_day,
-                        'irr_ev_date'  : the_irr_ev_date}
-
-              break # no need to consider any other irr events
+              result.append((event,
+                             {'irr_ev_seq'   : ev_seq,
+                              'irr_sched_id' : the_sched_id,
+                              'irr_ev_day'   : irr_ev_day,
+                              'irr_ev_date'  : the_irr_ev_date}))
 
           # current time isnt within any irr ev time window 
-          if(result == None):
+          if(not result):
             result = False
       except Exception as e:
+        result = None
         self.logger.error(f'41 Exception: {e}')
     return(result)
 
 
+  def irr_ev_should_be_underway(self):
+    """
+    Per the irrigation schedule currently in force, what irr ev, if
+    any, should be currently executing.
+
+    Returns:
+      None         issue occured before determination could be made
+
+      False        an irrigation event should not be occuring
+      dict         the irrigation event that should be occuring now
+                      {irr_ev_date:  <yyyy-mm-dd> or 'any', 
+                       irr_ev_day:   <'day1', 'day2', 'day3'> or
+                                     <'sun', 'mon', 'tue', wed', 'thu',
+                                      'fri', 'sat'>,
+                       irr_ev_seq:   <int > 0>, 
+                       irr_sched_id: <int >= 0>}
+    """
+    self.logger.info('entering: irr_ev_should_be_underway()')
+
+    result = self._irr_evs_in_window()
+    if(result):
+      result = result[0][1]     # no need to consider any other irr events
+    return(result)
+
+
+  def irr_evs_should_be_underway(self):
+    """
+    Concurrent mode.  Per the irrigation schedule currently in force,
+    what group of irr evs, if any, should be currently executing.  Irr
+    evs whose time windows include the current time are admitted to 
+    the group, in schedule order, as long as the summed exp_flow of the
+    group stays within the pump's capacity (i.e., config['pump_gpm_max'])
+    and no two irr evs irrigate the same block.  An irr ev that is not
+    admitted gets its turn once a member of the group finishes.
+
+    Returns:
+      None         issue occured before determination could be made
+      False        no irrigation event should be occuring
+      []           list of irr ev descriptions; see 
+                     irr_ev_should_be_underway()
+    """
+    self.logger.info('entering: irr_evs_should_be_underway()')
+
+    result = self._irr_evs_in_window()
+    if(result):
+      group       = []
+      blocks      = []
+      summed_flow = 0
+      for event, description in result:
+        if((summed_flow + event['exp_flow'] <= self.config['pump_gpm_max']) and
+           (not event['block'] in blocks)):
+          group.append(description)
+          blocks.append(event['block'])
+          summed_flow += event['exp_flow']
+        else:
+          self.logger.info(f'irr ev seq {event["sequence"]} not admitted; ' +
+                           'pump capacity or block in use')
+      if(group):
+        result = group
+      else:
+        result = False
+        self.logger.error('94 No irr ev fits within pump capacity')
+    return(result)
+
+
+  def get_irr_evs_details(self, irr_ev_descriptions):
+    """
+    Concurrent mode.  Return the full set of detail for every irr ev in
+    a group, including the schedule id, date, and day needed by
+    irr_event.start_irr_ev().
+
+    Args:
+      irr_ev_descriptions([])   see irr_evs_should_be_underway()
+
+    Returns:
+      None      issue before attempt to retrieve detail
+      False     detail retrieval failed for one or more irr evs
+      []        list of dicts; see get_irr_ev_details() for contents
+    """
+    self.logger.info('entering: get_irr_evs_details()')
+
+    result = None
+    if(irr_ev_descriptions and (type(irr_ev_descriptions) == list)):
+      result = []
+      for description in irr_ev_descriptions:
+        detail = self.get_irr_ev_details(description)
+        if(not detail):
+          result = False
+          break
+        detail = dict(detail)
+        detail['sched_id'] = description['irr_sched_id']
+        detail['day']      = description['irr_ev_day']
+        if(description['irr_ev_date'] == 'any'):
+          detail['date'] = self.datetime.today().strftime('%Y-%m-%d')
+        else:
+          detail['date'] = description['irr_ev_date']
+        result.append(detail)
+    else:
+      self.logger.error('95 Bad parameter to get_irr_evs_details()')
+    return(result)
+
+
   def _move_new_irr_sched(self):
     """
     Called after a new irrigation schedule has been retrieved from the 
@@ -772,9 +931,8 @@ class irr_sched():
         try:
           directory = self.Path(new_path)
           if(directory.is_dir()):
-            for item in directory.iterdir():
-              new_sched = item
-              break # should only be 1 file in dir
+            new_sched = self.Path(new_path,
+                                  self.paths.files(new_path)[0]) # only 1 file
             if(self._clear_directory(self.paths.get_path('cur_irr_sched'))):
               if(self._move_file(new_sched, 'cur_irr_sched')):
                   result = True
@@ -964,18 +1122,14 @@ class irr_sched():
     if(path):
       try:
         directory  = self.Path(path)
-        for item in directory.iterdir():
-          if(item.is_file()):
-            with item.open('r') as fd:
-              contents = fd.read()
-              if(self.df.check_object(json_object=contents)):
-                the_dict = self.json.loads(contents)
-                the_sched = the_dict['data']
-              else:
-                the_sched = False
-                self.logger.error('66 Current irrigation schedule flat file ' +
-                                  'is corrupt')
-            break # should only be 1 file in dir; so why not break?
+        for name in self.paths.files(path):
+          item = self.Path(path, name)
+          the_sched = self.df.read_valid(str(item))  #cached; read only
+          if(not the_sched):
+            the_sched = False
+            self.logger.error('66 Current irrigation schedule flat file ' +
+                              'is corrupt')
+          break # should only be 1 file in dir; so why not break?
       except Exception as e:
         the_sched_info = False
         self.logger.error('67 Issue accessing irrigation schedule flat file.' +
@@ -1048,16 +1202,13 @@ class irr_sched():
 
     directory = self.Path(directory_path)
     if((directory_path) and (directory.is_dir())):
-      for file in directory.iterdir():
+      for name in self.paths.files(directory_path):
+        file = self.Path(directory_path, name)
         try:
-          with file.open('r') as fd:
-            contents = fd.read()
-            if(self.df.check_object(json_object=contents)):
-              the_dict = self.json.loads(contents)
-              the_sched = the_dict['data']
-            else:
-              the_sched = False
-              self.logger.error('73 Irrigation schedule in file is corrupt')
+          the_sched = self.df.read_valid(str(file))   #cached; read only
+          if(not the_sched):
+            the_sched = False
+            self.logger.error('73 Irrigation schedule in file is corrupt')
         except Exception as e:
           self.logger.error(f'74 Exception: :{e}')
         break  # should only be 1 file in dir; so why not break?
@@ -1226,11 +1377,9 @@ class irr_sched():
 
     result = None
     try:
-      credentials = self.boto3.get_credentials()
-      auth        = self.AWS4Auth(credentials.access_key, 
-                                  credentials.secret_key,
-                                  self.config['region'], 
-                                  'execute-api')
+      auth              = self._auth()
+      if(not auth):
+        raise ValueError('no AWS credentials to sign the request')
       endpoint          = self.config['get_sched']
       method            = 'GET'
       headers           = {}
@@ -1241,9 +1390,9 @@ class irr_sched():
 
       if(payload['sched'] and payload['ts']):
         try:
-          response = self.requests.request(method, endpoint, auth=auth, 
-                                           data=self.json.dumps(payload), 
-                                           headers=headers)
+          response = self._http().request(method, endpoint, auth=auth,
+                                          data=self.json.dumps(payload), 
+                                          headers=headers)
           status_code = response.status_code
           if(status_code == 200):
             try:
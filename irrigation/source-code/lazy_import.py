@@ -0,0 +1,94 @@
+"""
+Jaye Hicks 2021
+
+Obligatory legal disclaimer:
+  You are free to use this source code (this file and all other files
+  referenced in this file) "AS IS" WITHOUT WARRANTY OF ANY KIND, EITHER
+  EXPRESSED OR IMPLIED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+  THE ENTIRE RISK AS TO THE QUALITY AND PERFORMANCE OF THIS SOURCE CODE
+  IS WITH YOU.  SHOULD THE SOURCE CODE PROVE DEFECTIVE, YOU ASSUME THE
+  COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU
+  GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
+
+Objects of type lazy_import() stand in for a module (or a name in a
+module) imported at class level, deferring the import until the name
+is first used.  irr_cntrl.py is launched by cron every 5 minutes and
+most cycles neither call AWS nor irrigate; importing boto3, requests,
+requests_aws4auth, psutil and AWSIoTPythonSDK on those cycles costs
+more than the rest of the cycle on a PI 4.
+
+On first use the module is imported, the name is replaced on the class
+by the real module / object (so later use costs nothing extra) and the
+seconds spent importing are recorded in 'load_secs'.  If the import
+fails ImportError is raised where the name is used, which is inside
+the code path that needed it and its existing error handling.
+
+Usage:
+  class alarms():
+    import lazy_import
+    boto3    = lazy_import.lazy_import('boto3')
+    AWS4Auth = lazy_import.lazy_import('requests_aws4auth', 'AWS4Auth')
+
+  >>> import lazy_import
+  >>> lazy_import.lazy_import.load_secs
+  {'boto3': 0.412}
+"""
+
+class lazy_import():
+  import importlib
+  import sys
+  import time
+  import types
+
+  load_secs = {}       #module name -> secs to import; shared, per OS process
+
+
+  def __init__(self, module_name, attr_name=None):
+    """
+    Args:
+      module_name(str)  module to import (e.g., 'botocore.exceptions')
+      attr_name(str)    name within the module (e.g., 'ClientError');
+                          None stands in for the module itself
+    """
+    self.module_name = module_name
+    self.attr_name   = attr_name
+    self.name        = None
+
+
+  def __set_name__(self, owner, name):
+    self.name = name
+
+
+  def __get__(self, instance, owner):
+    """
+    Import on first use and replace this object, on the class that
+    declared it, with what was imported.
+    """
+    value = self.load()
+    if(self.name and (owner.__dict__.get(self.name) is self)):
+      if(isinstance(value, self.types.FunctionType)):
+        setattr(owner, self.name, staticmethod(value))  #else becomes a method
+      else:
+        setattr(owner, self.name, value)
+    return(value)
+
+
+  def load(self):
+    """
+    Returns:
+      the module, or the named object within the module
+
+    Raises:
+      ImportError       module not installed / wouldnt import
+      AttributeError    name not found in the module
+    """
+    start  = self.time.perf_counter()
+    loaded = self.module_name in self.sys.modules
+    module = self.importlib.import_module(self.module_name)
+    if(not loaded):
+      self.load_secs[self.module_name] = round(
+        self.time.perf_counter() - start, 4)
+    if(self.attr_name):
+      return(getattr(module, self.attr_name))
+    return(module)
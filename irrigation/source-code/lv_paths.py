@@ -19,11 +19,43 @@ across linux, windows, development environments, production
 environments, etc. requiring minimual code modification (e.g., set
 a class variable to 'debug' or 'prod').
 
+lv_paths() objects also answer questions about the files in those
+directories (e.g., how many files, which files start with a prefix)
+from an index of directory contents shared by every lv_paths() object
+in an OS process.  Control scripts ask the same questions about the
+same few directories many times per cron cycle (and a long running
+irrigation event asks every few seconds) so a directory is only read
+when it has changed:
+
+  - linux: each indexed directory is watched using inotify.  Pending
+    change notifications are applied to the index before each query;
+    if the kernel's notification queue overflowed the index is dropped
+    and directories are read again.
+  - otherwise (e.g., win32 development): a directory is read again
+    when its modification time has changed, or changed so recently
+    (i.e., within 'racy_secs') that a later change could carry the
+    same time stamp.
+
+Names starting with '.' (e.g., dura_file's temporary files) are left
+out of query results unless asked for.
+
+The directory tree can be moved (e.g., to a scratch directory when
+benchmarking) by setting the environment variable LV_PATHS_PREFIX to
+the path that replaces the platform's lonesome directory.  An OS
+process created by fork (e.g., a worker pool) starts with an empty
+index of its own.
+
 Usage:
   >>> import lv_paths
   >>> paths = lv_path.lv_paths()
   >>> paths.get_path('irr_sched')
   /home/pi/lonesome/control/irr_sched
+  >>> paths.files(paths.get_path('gals_disp'), prefix='gals_disp_')
+  ['gals_disp_2021_10_31_99_1_a.json']
+  >>> paths.count_files(paths.get_path('cur_irr_sched'))
+  1
+  >>> paths.oldest_file(paths.get_path('alarms'))
+  'alarm_under_2021_10_30_55_1.json'
 """
 
 class lv_paths():
@@ -34,6 +66,54 @@ class lv_paths():
   """
   import logging
   import sys
+  import os
+  import re
+  import struct
+  import threading
+  import time
+  import fnmatch
+  try:
+    import ctypes
+  except ImportError:
+    ctypes = None
+
+  #inotify(7) event masks
+  IN_MOVED_FROM   = 0x00000040
+  IN_MOVED_TO     = 0x00000080
+  IN_CREATE       = 0x00000100
+  IN_DELETE       = 0x00000200
+  IN_DELETE_SELF  = 0x00000400
+  IN_MOVE_SELF    = 0x00000800
+  IN_Q_OVERFLOW   = 0x00004000
+  IN_IGNORED      = 0x00008000
+  IN_ONLYDIR      = 0x01000000
+  IN_ISDIR        = 0x40000000
+  WATCH_MASK      = (IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+                     IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+  #directory index; shared by all lv_paths objects in an OS process
+  dir_index = {}                 #dir path -> [mtime_ns, {name : is file},
+                                 #             watched]
+  dir_watch = {}                 #inotify watch descriptor -> dir path
+  dir_lock  = threading.RLock()
+  dir_state = {'pid' : None, 'fd' : None, 'libc' : None,
+               'scans' : 0, 'hits' : 0}
+  racy_secs = 2
+  prefix_env = 'LV_PATHS_PREFIX'  #environment variable; overrides prefix
+  date_pattern = re.compile(r'(\d{4})_(\d{2})_(\d{2})(?:_(\d{2})_(\d{2}))?')
+
+  #a lock held by another thread when this OS process forks is never
+  #released in the child; the child gets a new one
+  if(hasattr(os, 'register_at_fork')):
+    os.register_at_fork(after_in_child=lambda: lv_paths._after_fork())
+
+
+  @classmethod
+  def _after_fork(cls):
+    """
+    Runs in a child OS process created by fork (see os.register_at_fork)
+    """
+    cls.dir_lock = cls.threading.RLock()
 
 
   def __init__(self):
@@ -54,6 +134,7 @@ class lv_paths():
         self.prefix   = '/home/pi/lonesome'
         self.divider  = '/' 
         self.platform = 'unix'
+      self.prefix = self.os.environ.get(self.prefix_env, self.prefix)
     except Exception as e:
       self.logger.error(f'1 Couldnt detect OS. Exception: {e}')
 
@@ -75,6 +156,7 @@ class lv_paths():
                        'bad_comms'          : '\\comms\\bad_comms',
                        'gals_disp'          : '\\comms\\gals_disp',
                        'orphans'            : '\\comms\\orphans',
+                       'mailboxes'          : '\\comms\\mailboxes',
                        'corrupt_files'      : '\\comms\\corrupt_files'}
       self.unix_dirs = {'root'              : '',
                        'control'            : '/control',
@@ -93,6 +175,7 @@ class lv_paths():
                        'bad_comms'          : '/comms/bad_comms',
                        'gals_disp'          : '/comms/gals_disp',
                        'orphans'            : '/comms/orphans',
+                       'mailboxes'          : '/comms/mailboxes',
                        'corrupt_files'      : '/comms/corrupt_files'}
 
 
@@ -120,4 +203,180 @@ class lv_paths():
         self.logger.error(f'3 Bad argument. Exception: {e}')
     else:
       self.logger.error('4 Bad argument type or empty.')
-    return(path)
\ No newline at end of file
+    return(path)
+
+
+  def _inotify(self):
+    """
+    Returns:
+      None       change notification is unavailable; use mtimes
+      int        this OS process's inotify file descriptor
+    """
+    state = self.dir_state
+    if(state['pid'] != self.os.getpid()):
+      if(state['fd'] != None):
+        try:
+          self.os.close(state['fd'])      #inherited from parent process
+        except Exception:
+          pass
+      self.dir_index.clear()
+      self.dir_watch.clear()
+      state.update({'pid' : self.os.getpid(), 'fd' : None, 'libc' : None})
+      if(self.ctypes and self.sys.platform.startswith('linux')):
+        try:
+          libc = self.ctypes.CDLL(None, use_errno=True)
+          fd   = libc.inotify_init1(self.os.O_NONBLOCK | self.os.O_CLOEXEC)
+          if(fd >= 0):
+            state['fd']   = fd
+            state['libc'] = libc
+        except Exception as e:
+          self.logger.error(f'5 inotify unavailable; using mtimes. ' +
+                            f'Exception: {e}')
+    return(state['fd'])
+
+
+  def _apply_events(self, fd):
+    """
+    Apply every pending change notification to the directory index.
+    """
+    while(True):
+      try:
+        events = self.os.read(fd, 64 * 1024)
+      except BlockingIOError:
+        break
+      offset = 0
+      while(offset < len(events)):
+        wd, mask, cookie, length = self.struct.unpack_from('iIII', events,
+                                                           offset)
+        name    = self.os.fsdecode(events[offset + 16:offset + 16 + length]
+                                   .rstrip(b'\0'))
+        offset += 16 + length
+
+        if(mask & self.IN_Q_OVERFLOW):
+          self.dir_index.clear()             #read every directory again
+          continue
+        path = self.dir_watch.get(wd)
+        if(mask & (self.IN_IGNORED | self.IN_DELETE_SELF | self.IN_MOVE_SELF)):
+          if(path):
+            self.dir_index.pop(path, None)
+            if(not mask & self.IN_IGNORED):
+              self.dir_state['libc'].inotify_rm_watch(fd, wd)
+            else:
+              del self.dir_watch[wd]
+          continue
+        entry = self.dir_index.get(path)
+        if(entry):
+          if(mask & (self.IN_CREATE | self.IN_MOVED_TO)):
+            entry[1][name] = ((not mask & self.IN_ISDIR) and
+                              self.os.path.isfile(self.os.path.join(path,
+                                                                    name)))
+          elif(mask & (self.IN_DELETE | self.IN_MOVED_FROM)):
+            entry[1].pop(name, None)
+
+
+  def _directory(self, path):
+    """
+    Returns the index entry of a directory, reading the directory only if
+    it may have changed since it was last read.  Call holding dir_lock.
+
+    Returns:
+      {}         file name -> True if a file (following symbolic links)
+    """
+    fd = self._inotify()
+    if(fd != None):
+      self._apply_events(fd)
+
+    entry = self.dir_index.get(path)
+    if(entry and entry[2]):
+      self.dir_state['hits'] += 1
+      return(entry[1])
+
+    stamp = self.os.stat(path).st_mtime_ns
+    if(entry and (entry[0] == stamp) and
+       (self.time.time_ns() - stamp > self.racy_secs * 1000000000)):
+      self.dir_state['hits'] += 1
+      return(entry[1])
+
+    watched = False
+    if(fd != None):
+      wd = self.dir_state['libc'].inotify_add_watch(fd, self.os.fsencode(path),
+                                                    self.WATCH_MASK)
+      if(wd >= 0):
+        self.dir_watch[wd] = path
+        watched = True
+    names = {}
+    with self.os.scandir(path) as entries:
+      for dir_entry in entries:
+        names[dir_entry.name] = dir_entry.is_file()
+    self.dir_index[path] = [stamp, names, watched]
+    self.dir_state['scans'] += 1
+    return(names)
+
+
+  def files(self, path, prefix='', pattern=None, hidden=False):
+    """
+    Args:
+      path(str)        fully qualified path to a directory
+      prefix(str)      only names starting with prefix
+      pattern(str)     only names matching a shell style pattern (e.g.,
+                         '*.jrnl')
+      hidden(bool)     include names starting with '.'
+
+    Returns:
+      None             directory doesnt exist or couldnt be read
+      []               sorted names of the matching files; directories,
+                         sockets, etc. are left out
+    """
+    self.logger.info('entering: files()')
+
+    result = None
+    if(path and (type(path) == str)):
+      try:
+        with self.dir_lock:
+          names = self._directory(self.os.path.normpath(path))
+          result = sorted(name for name, is_file in names.items()
+                          if(is_file and name.startswith(prefix) and
+                             (hidden or (not name.startswith('.'))) and
+                             ((not pattern) or
+                              self.fnmatch.fnmatchcase(name, pattern))))
+      except FileNotFoundError:
+        pass
+      except Exception as e:
+        self.logger.error(f'6 Could not index directory: {path}. ' +
+                          f'Exception: {e}')
+    else:
+      self.logger.error('7 Bad argument type or empty.')
+    return(result)
+
+
+  def count_files(self, path, prefix='', pattern=None):
+    """
+    Returns:
+      None             directory doesnt exist or couldnt be read
+      int              number of matching files (see files())
+    """
+    names = self.files(path, prefix, pattern)
+    return(None if(names == None) else len(names))
+
+
+  def oldest_file(self, path, prefix=''):
+    """
+    The file whose name holds the earliest date; the first
+    <yyyy>_<mm>_<dd> (optionally followed by _<hh>_<mm>) in the name
+    (e.g., 'gals_disp_2021_10_31_99_1_a.json').  Files without a date in
+    their name are ignored.
+
+    Returns:
+      None             no dated file or directory couldnt be read
+      str              name of the oldest file
+    """
+    oldest = None
+    oldest_date = None
+    for name in (self.files(path, prefix) or []):
+      match = self.date_pattern.search(name)
+      if(match):
+        date = tuple(int(part or 0) for part in match.groups())
+        if((oldest_date == None) or (date < oldest_date)):
+          oldest      = name
+          oldest_date = date
+    return(oldest)
@@ -0,0 +1,164 @@
+"""
+Jaye Hicks 2021
+
+Obligatory legal disclaimer:
+  You are free to use this source code (this file and all other files
+  referenced in this file) "AS IS" WITHOUT WARRANTY OF ANY KIND, EITHER
+  EXPRESSED OR IMPLIED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+  THE ENTIRE RISK AS TO THE QUALITY AND PERFORMANCE OF THIS SOURCE CODE
+  IS WITH YOU.  SHOULD THE SOURCE CODE PROVE DEFECTIVE, YOU ASSUME THE
+  COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU
+  GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
+
+Objects of type orphan_salvage() read batches of orphaned pulse count
+files on behalf of irr_event.send_orphaned_data().  After a long outage
+with several reboots the irr_ev_in_progress directory can hold the
+files of many irrigation events.  The files belonging to a single
+irrigation event (i.e., journal, pulse count file, and backup) form a
+group.  Groups are read by a pool of worker OS processes so that the
+hash checks and JSON parsing of different groups run on different PI 4
+cores.
+
+Within a group the files are tried, in order of preference, until one
+passes its integrity check: journal, pulse count file, backup.  Journals
+are replayed a record (i.e., a line) at a time.  Whatever is read is
+converted to the per-minute bucket format (see pulse_ledger.py) before
+being handed back, so only small data structures cross between OS
+processes.  Validating the data, calculating gallons dispensed, and
+writing gals_disp files is left to irr_event.
+
+Each group yields a dict:
+
+  {'root'       : '<file name root>',
+   'files'      : ['<file name>', ...],   #every file in the group
+   'used'       : '<file name>' or None,  #file the data came from
+   'corrupt'    : ['<file name>', ...],   #files that failed checks
+   'bytes'      : <int>,                  #bytes read
+   'pulse_data' : {...} or None}          #pulse count data structure
+
+Usage:
+  >>> import orphan_salvage
+  >>> groups = [{'root': 'pulse_count_2021_10_31_65_2',
+  >>>            'journal': 'pulse_count_2021_10_31_65_2.jrnl',
+  >>>            'file': None, 'backup': None}]
+  >>> orphan_salvage.orphan_salvage().read_groups(path, '/', groups)
+"""
+import json
+import os
+
+import dura_file
+import pulse_ledger
+import pulse_journal
+
+
+def read_pulse_group(path, divider, group):
+  """
+  Worker function; runs in a pool OS process.  Must live at module
+  level so that it can be handed to the pool.
+
+  Args:
+    path(str)        directory holding the orphaned files
+    divider(str)     platform specific path divider
+    group(dict)      {'root': <str>, 'journal': <file name or None>,
+                      'file': <file name or None>,
+                      'backup': <file name or None>}
+  Returns:
+    dict             see module doc string
+  """
+  df     = dura_file.dura_file()
+  result = {'root'       : group['root'],
+            'files'      : [],
+            'used'       : None,
+            'corrupt'    : [],
+            'bytes'      : 0,
+            'pulse_data' : None}
+
+  for kind in ('journal', 'file', 'backup'):
+    file_name = group.get(kind)
+    if(not file_name):
+      continue
+    result['files'].append(file_name)
+    if(result['used']):
+      continue                      #data already salvaged from the group
+
+    file_path  = path + divider + file_name
+    pulse_data = None
+    try:
+      result['bytes'] += os.path.getsize(file_path)
+      if(kind == 'journal'):
+        pulse_data = pulse_journal.pulse_journal(file_path).replay()
+      else:
+        with open(file_path, 'r') as fd:
+          contents = fd.read()
+        if(df.check_object(json_object=contents)):
+          pulse_data = json.loads(contents)['data']
+
+      if(pulse_data):
+        ledger = pulse_ledger.pulse_ledger()
+        if(ledger.load_pulse_data(pulse_data['pulses'])):
+          pulse_data['pulses'] = ledger.to_pulse_data()
+          pulse_data['format'] = 'buckets'
+        else:
+          pulse_data = None
+    except Exception:
+      pulse_data = None
+
+    if(pulse_data):
+      result['used']       = file_name
+      result['pulse_data'] = pulse_data
+    else:
+      result['corrupt'].append(file_name)
+  return(result)
+
+
+class orphan_salvage():
+  import logging
+  import os
+  from   concurrent.futures import ProcessPoolExecutor
+
+
+  def __init__(self, max_workers=None):
+    """
+    Args:
+      max_workers(int)     size of the worker pool; default is the
+                             number of CPU cores
+    """
+    self.logger = self.logging.getLogger(__name__)
+    self.logger.info('entering: __init__()')
+
+    self.max_workers = max_workers or self.os.cpu_count() or 1
+
+
+  def read_groups(self, path, divider, groups):
+    """
+    Read every group of orphaned pulse count files.  A single group is
+    read in this OS process; the cost of starting a pool is only paid
+    when there is a backlog.
+
+    Args:
+      path(str)        directory holding the orphaned files
+      divider(str)     platform specific path divider
+      groups([])       list of group dicts (see read_pulse_group())
+
+    Returns:
+      []               one result dict per group, in the order given
+    """
+    self.logger.info('entering: read_groups()')
+
+    results = []
+    workers = min(self.max_workers, len(groups))
+    if(workers > 1):
+      try:
+        with self.ProcessPoolExecutor(max_workers=workers) as pool:
+          results = list(pool.map(read_pulse_group,
+                                  [path] * len(groups),
+                                  [divider] * len(groups),
+                                  groups))
+      except Exception as e:
+        self.logger.error(f'1 Worker pool failed; reading groups one at a ' +
+                          f'time. Exception: {e}')
+        results = []
+    if(len(results) != len(groups)):
+      results = [read_pulse_group(path, divider, group) for group in groups]
+    return(results)
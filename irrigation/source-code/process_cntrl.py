@@ -53,10 +53,11 @@ class process_cntrl():
   import logging
   import os
   import sys
-  import psutil
 
   import lv_paths       # directory paths to locations used in irr man
   import dura_file      # file complete/correct guaranteed w hash value
+  import lazy_import    # psutil is imported on first use
+  psutil = lazy_import.lazy_import('psutil')
 
 
   def __init__(self):
@@ -73,7 +74,7 @@ class process_cntrl():
     else:
       self.logger.error('1 Couldnt establish dir path to process register.')
 
-    self.df = self.dura_file.dura_file()
+    self.df = self.dura_file.dura_file(binary=True)  #only read via dura_file
 
 
   def get_register(self):
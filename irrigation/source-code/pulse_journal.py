@@ -0,0 +1,350 @@
+"""
+Jaye Hicks 2021
+
+Obligatory legal disclaimer:
+  You are free to use this source code (this file and all other files
+  referenced in this file) "AS IS" WITHOUT WARRANTY OF ANY KIND, EITHER
+  EXPRESSED OR IMPLIED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+  THE ENTIRE RISK AS TO THE QUALITY AND PERFORMANCE OF THIS SOURCE CODE
+  IS WITH YOU.  SHOULD THE SOURCE CODE PROVE DEFECTIVE, YOU ASSUME THE
+  COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU
+  GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
+
+Objects of type pulse_journal() checkpoint the pulse data of an
+irrigation event to an append-only flat file (i.e., a journal) instead
+of rewriting the entire pulse count data structure at every checkpoint.
+A checkpoint appends only the pulses received since the previous
+checkpoint, so its cost does not grow with the length of the
+irrigation event and SD card wear is kept to a minimum.
+
+A journal is a text file holding one record per line.  Every record is
+a JSON object following the dura_file format, making every record self
+checksummed:
+
+  {"hash_info" : {...}, "data" : {...}}
+
+The first record is a header describing the irrigation event.  Every
+following record holds, for a single OS pid, the per-minute buckets of
+pulses received since the previous checkpoint.
+
+  {"type": "header", "whatami": "pulse_count", "format": "buckets",
+   "sched_id": <int>, "date": "<yyyy-mm-dd>", "day": "<str>",
+   "sequence": <int>, "block": "<letter>"}
+  {"type": "buckets", "pid": "<int - OS pid>",
+   "buckets": [[<int - epoch ts of minute>, <int - pulses>], ...]}
+
+A minute that is still open at checkpoint time shows up in two
+records; the second record only holds the pulses that arrived after
+the checkpoint.  Replaying a journal therefore adds up buckets, for
+each OS pid, that share a time stamp with the newest bucket already
+replayed.  This rebuilds the 'pulses' section of the pulse count data
+structure (see irr_event.py).  A power loss can leave a partially
+written final record; replay keeps every record up to the first one
+that fails its hash check.  The next checkpoint then compacts the
+journal, dropping the corrupt bytes; appending after them would leave
+every later record unreachable by replay.  Journals holding one cumulative data point
+per pulse (i.e., "type": "pulses" records) are still replayed.
+
+Periodically (i.e., every 'compact_every' appended records) the journal
+is compacted: it is rewritten as a header plus one record per OS pid.
+The compacted journal is written to a temporary file, flushed to disk
+and then renamed over the journal so that a power loss during
+compaction leaves either the old or the new journal in place.
+
+Journal files are named after the pulse count file they replace:
+
+  pulse_count_<yyyy_mm_dd>_<sched_id>_<sequence>.jrnl
+"""
+class pulse_journal():
+  import logging
+  import json
+  import os
+  from   pathlib import Path
+
+  import dura_file
+
+
+  def __init__(self, file_path, compact_every=48):
+    """
+    Args:
+      file_path(str)        fully qualified path to the journal file
+      compact_every(int)    number of appended records between
+                              compactions
+    """
+    self.logger = self.logging.getLogger(__name__)
+    self.logger.info('entering: __init__()')
+
+    self.df            = self.dura_file.dura_file()
+    self.file_path     = file_path
+    self.compact_every = compact_every
+    self.num_records   = 0      # records appended since last compaction
+    self.marks         = {}     # pid -> (index, pulses) of the newest
+                                #   bucket already journaled
+
+
+  def _encode_record(self, data):
+    """
+    Wrap a record in the dura_file format and encode it as one line.
+
+    Returns:
+      str          the record, terminated with a new line
+    """
+    hash_value = self.df.hash_string(self.json.dumps(data))
+    record = {'hash_info' : {'algorithm'  : 'sha256',
+                             'format'     : 'hexdigest',
+                             'hash_value' : hash_value},
+              'data'      : data}
+    return(self.json.dumps(record) + '\n')
+
+
+  def _write_records(self, file_path, lines, mode):
+    """
+    Write encoded records to a file and force them to disk.
+
+    Returns:
+      True           records written
+      False          error writing records
+    """
+    result = False
+    try:
+      with open(file_path, mode) as fd:
+        fd.write(''.join(lines))
+        fd.flush()
+        self.os.fsync(fd.fileno())
+      result = True
+    except Exception as e:
+      self.logger.error(f'1 Could not write journal: {file_path}. ' +
+                        f'Exception: {e}')
+    return(result)
+
+
+  def _header_record(self, header):
+    """
+    Build the header record from irr event details
+    """
+    data = {'type' : 'header'}
+    data.update(header)
+    data['whatami'] = 'pulse_count'
+    data['format']  = 'buckets'
+    return(data)
+
+
+  def _pid_records(self, ledger, from_marks):
+    """
+    Build one record for every OS pid holding pulses not yet journaled
+
+    Args:
+      ledger          pulse_ledger() object
+      from_marks(bool) True to only include pulses beyond self.marks
+
+    Returns:
+      ([], {})        list of records and the new marks
+    """
+    records   = []
+    new_marks = {}
+    for pid in list(ledger.pids):
+      key    = str(pid)
+      length = ledger.length(pid)
+      if(from_marks):
+        start, journaled = self.marks.get(key, (0, 0))
+      else:
+        start, journaled = (0, 0)
+      buckets = ledger.buckets(pid, start, length)
+      if(buckets):
+        new_marks[key] = (start + len(buckets) - 1, buckets[-1][1])
+        buckets[0][1] -= journaled
+        if(buckets[0][1] <= 0):
+          buckets.pop(0)
+        if(buckets):
+          records.append({'type'    : 'buckets',
+                          'pid'     : key,
+                          'buckets' : buckets})
+      elif(key in self.marks):
+        new_marks[key] = self.marks[key]
+    return(records, new_marks)
+
+
+  def checkpoint(self, ledger, header):
+    """
+    Append the pulses received since the last checkpoint.  Creates the
+    journal (header record first) if it does not exist yet and compacts
+    it every 'compact_every' appended records.
+
+    Args:
+      ledger          pulse_ledger() object holding the pulse data
+      header(dict)    irr event details: sched_id, date, day, sequence,
+                        and block
+
+    Returns:
+      True            checkpoint written
+      False           error writing checkpoint
+    """
+    self.logger.info('entering: checkpoint()')
+
+    result = False
+    try:
+      if(not self.Path(self.file_path).is_file()):
+        result = self.compact(ledger, header)
+      elif(self.num_records >= self.compact_every):
+        result = self.compact(ledger, header)
+      else:
+        records, new_marks = self._pid_records(ledger, True)
+        if(records):
+          lines = [self._encode_record(record) for record in records]
+          result = self._write_records(self.file_path, lines, 'a')
+          if(result):
+            self.marks.update(new_marks)
+            self.num_records += len(records)
+        else:
+          result = True
+    except Exception as e:
+      self.logger.error(f'2 Exception: {e}')
+    return(result)
+
+
+  def compact(self, ledger, header):
+    """
+    Rewrite the journal as a header followed by one record per OS pid.
+
+    Returns:
+      True            journal rewritten
+      False           error rewriting the journal; old journal untouched
+    """
+    self.logger.info('entering: compact()')
+
+    result    = False
+    temp_path = self.file_path + '.tmp'
+    try:
+      records, new_marks = self._pid_records(ledger, False)
+      lines = [self._encode_record(self._header_record(header))]
+      lines += [self._encode_record(record) for record in records]
+      if(self._write_records(temp_path, lines, 'w')):
+        self.os.replace(temp_path, self.file_path)
+        self.marks       = new_marks
+        self.num_records = 0
+        result = True
+    except Exception as e:
+      self.logger.error(f'3 Could not compact journal. Exception: {e}')
+    return(result)
+
+
+  def read_header(self, file_path=None):
+    """
+    Read only the header record of a journal.
+
+    Args:
+      file_path(str)  journal to read; default is this object's
+
+    Returns:
+      None            header missing or corrupt
+      dict            header record
+    """
+    self.logger.info('entering: read_header()')
+
+    header = None
+    if(not file_path):
+      file_path = self.file_path
+    try:
+      with open(file_path, 'r') as fd:
+        record = self.json.loads(fd.readline())
+      if(self.df.check_object(json_object=record)):
+        if(record['data'].get('type') == 'header'):
+          header = record['data']
+    except Exception as e:
+      self.logger.error(f'7 Could not read journal header: {file_path}. ' +
+                        f'Exception: {e}')
+    return(header)
+
+
+  def replay(self, file_path=None):
+    """
+    Rebuild the pulse count data structure from a journal.  Records
+    following the first corrupt record are ignored (e.g., the final
+    record was partially written when power was lost).  If this
+    object's own journal holds a corrupt record, the next checkpoint()
+    compacts it.
+
+    Args:
+      file_path(str)  journal to replay; default is this object's
+
+    Returns:
+      None            the journal does not exist
+      False           journal unreadable or header record corrupt
+      dict            pulse count data structure (see irr_event.py)
+    """
+    self.logger.info('entering: replay()')
+
+    pulse_data = None
+    if(not file_path):
+      file_path = self.file_path
+    try:
+      if(self.Path(file_path).is_file()):
+        pulse_data  = False
+        pid_buckets = {}
+        pid_order   = []
+        last_counts = {}    # pid -> cumulative count; "pulses" records
+        num_records = 0
+        corrupt     = False
+        with open(file_path, 'r') as fd:
+          for line_num, line in enumerate(fd):
+            try:
+              record = self.json.loads(line)
+              good   = self.df.check_object(json_object=record)
+            except Exception:
+              good   = False
+            if(not good):
+              self.logger.error(f'4 Corrupt record {line_num} in journal: ' +
+                                f'{file_path}; ignoring rest of journal')
+              corrupt = True
+              break
+
+            data = record['data']
+            if(line_num == 0):
+              if(data.get('type') != 'header'):
+                self.logger.error('5 Journal does not start with a header')
+                break
+              pulse_data = {'whatami'  : data['whatami'],
+                            'format'   : 'buckets',
+                            'sched_id' : data['sched_id'],
+                            'date'     : data['date'],
+                            'day'      : data['day'],
+                            'sequence' : data['sequence'],
+                            'block'    : data['block'],
+                            'pulses'   : []}
+            elif(data.get('type') in ('buckets', 'pulses')):
+              num_records += 1
+              pid = data['pid']
+              if(not pid in pid_buckets):
+                pid_buckets[pid] = []
+                pid_order.append(pid)
+              if(data['type'] == 'buckets'):
+                new_buckets = data['buckets']
+              else:
+                new_buckets = []
+                for ts, cumulative in data['points']:
+                  new_buckets.append([ts - (ts % 60),
+                                      cumulative - last_counts.get(pid, 0)])
+                  last_counts[pid] = cumulative
+              buckets = pid_buckets[pid]
+              for minute, pulses in new_buckets:
+                if(buckets and (buckets[-1][0] == minute)):
+                  buckets[-1][1] += pulses
+                else:
+                  buckets.append([minute, pulses])
+
+        if(pulse_data):
+          self.marks = {}
+          for pid in pid_order:
+            pulse_data['pulses'].append({pid : pid_buckets[pid]})
+            if(pid_buckets[pid]):
+              self.marks[pid] = (len(pid_buckets[pid]) - 1,
+                                 pid_buckets[pid][-1][1])
+          self.num_records = num_records
+          if(corrupt and (file_path == self.file_path)):
+            self.num_records = self.compact_every  #rewrite, dropping it
+    except Exception as e:
+      pulse_data = False
+      self.logger.error(f'6 Could not replay journal: {file_path}. ' +
+                        f'Exception: {e}')
+    return(pulse_data)
@@ -0,0 +1,292 @@
+"""
+Jaye Hicks 2021
+
+Obligatory legal disclaimer:
+  You are free to use this source code (this file and all other files
+  referenced in this file) "AS IS" WITHOUT WARRANTY OF ANY KIND, EITHER
+  EXPRESSED OR IMPLIED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+  THE ENTIRE RISK AS TO THE QUALITY AND PERFORMANCE OF THIS SOURCE CODE
+  IS WITH YOU.  SHOULD THE SOURCE CODE PROVE DEFECTIVE, YOU ASSUME THE
+  COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU
+  GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
+
+Objects of type pulse_ledger() hold, in memory, the water flow sensor
+pulses received during a single irrigation event.  The ledger is fed
+from the PI 4 GPIO callback thread so recording a pulse has to be
+cheap: no directory scans, no list walks, and no new Python objects
+per pulse.
+
+Pulses are counted into per-minute buckets.  Each OS pid that took
+part in managing the irrigation event gets two typed arrays, one for
+the epoch time stamp of the start of each minute and one for the
+number of pulses received during that minute.  Recording a pulse
+either increments the count of the newest bucket or starts a new
+bucket.  The arrays belonging to the OS pid that is currently managing
+the irrigation event are preallocated and grow by doubling, so
+recording a pulse is an O(1) store into an existing slot.  A 4 hour
+irrigation event needs at most 240 buckets regardless of flow rate.
+
+The ledger can be loaded from, and converted back to, the 'pulses'
+section of the pulse count data structure documented in irr_event.py:
+
+  [{'<int - OS pid>' : [[<int - epoch ts of minute>, <int - pulses>], ...]},
+   {'<int - OS pid>' : [[<int - epoch ts of minute>, <int - pulses>], ...]}]
+
+The legacy 'pulses' section, holding one cumulative data point per
+pulse, is still accepted when loading:
+
+  [{'<int - OS pid>' : [{'<int - epoch ts>' : <int - pulse data>}, ...]}]
+
+Only a single thread (i.e., the GPIO callback thread) may call record().
+Any number of threads may read from the ledger; readers take a snapshot
+of the number of buckets before touching the arrays.
+
+Usage:
+  >>> import pulse_ledger
+  >>> ledger = pulse_ledger.pulse_ledger('12345')
+  >>> ledger.record(1635696000)
+  >>> ledger.record(1635696004)
+  >>> ledger.record(1635696061)
+  >>> ledger.to_pulse_data()
+  [{'12345': [[1635696000, 2], [1635696060, 1]]}]
+  >>> ledger.total_pulses()
+  3
+"""
+class pulse_ledger():
+  import logging
+  from   array import array
+
+
+  def __init__(self, pid='', capacity=512):
+    """
+    Args:
+      pid(str)         OS pid of the process managing the irr event
+      capacity(int)    number of minutes to preallocate room for
+    """
+    self.logger = self.logging.getLogger(__name__)
+    self.logger.info('entering: __init__()')
+
+    self.type_code   = 'q'        # signed 64 bit ints
+    self.pid         = pid
+    self.pids        = []         # every OS pid in the ledger, in order
+    self.time_stamps = {}         # pid -> array of minute start time stamps
+    self.counts      = {}         # pid -> array of pulses per minute
+    self.lengths     = {}         # pid -> number of buckets in use
+    self.pulse_count = 0          # cumulative pulses for current pid
+    self._set_current_pid(pid, capacity)
+
+
+  def _set_current_pid(self, pid, capacity):
+    """
+    Preallocate the arrays used for the OS pid currently managing the
+    irrigation event.
+    """
+    self.logger.info('entering: _set_current_pid()')
+
+    self.capacity      = max(int(capacity), 16)
+    self._length       = 0
+    self._last_minute  = -1
+    self._cur_ts       = self.array(self.type_code, bytes(8 * self.capacity))
+    self._cur_counts   = self.array(self.type_code, bytes(8 * self.capacity))
+    self.time_stamps[pid] = self._cur_ts
+    self.counts[pid]      = self._cur_counts
+    self.lengths[pid]     = 0
+    if(not pid in self.pids):
+      self.pids.append(pid)
+
+
+  def _grow(self):
+    """
+    Double the room available in the arrays of the current OS pid.
+    Called rarely; amortized cost per pulse stays constant.
+    """
+    self.logger.info('entering: _grow()')
+
+    extra = bytes(8 * self.capacity)
+    self._cur_ts.frombytes(extra)
+    self._cur_counts.frombytes(extra)
+    self.capacity *= 2
+
+
+  def record(self, time_stamp):
+    """
+    Record a single pulse received from the water flow sensor.  This is
+    called from the GPIO callback thread and therefore does nothing
+    beyond storing, at most, two integers.
+
+    Args:
+      time_stamp(int)     epoch time stamp of the pulse
+    """
+    minute = time_stamp - (time_stamp % 60)
+    self.pulse_count += 1
+    if(minute == self._last_minute):
+      self._cur_counts[self._length - 1] += 1
+    else:
+      index = self._length
+      if(index == self.capacity):
+        self._grow()
+      self._cur_ts[index]     = minute
+      self._cur_counts[index] = 1
+      self._last_minute = minute
+      self._length = index + 1
+      self.lengths[self.pid] = self._length
+
+
+  def length(self, pid=None):
+    """
+    Returns:
+      int         number of buckets recorded for pid (default is the OS
+                    pid currently managing the irr event)
+    """
+    if(pid == None):
+      pid = self.pid
+    return(self.lengths.get(pid, 0))
+
+
+  def buckets(self, pid, start, stop):
+    """
+    Retrieve a slice of the buckets recorded for an OS pid.
+
+    Args:
+      pid(str)            OS pid
+      start(int)          index of the first bucket
+      stop(int)           index one past the last bucket
+
+    Returns:
+      []                  list of [<epoch ts of minute>, <pulses>]
+    """
+    stop = min(stop, self.lengths.get(pid, 0))
+    if(start >= stop):
+      return([])
+    return([[ts, count] for ts, count in
+                          zip(self.time_stamps[pid][start:stop],
+                              self.counts[pid][start:stop])])
+
+
+  def total_pulses(self):
+    """
+    Returns:
+      int         pulses recorded across all OS pids
+    """
+    total = 0
+    for pid in list(self.pids):
+      length = self.lengths.get(pid, 0)
+      total += sum(self.counts[pid][:length])
+    return(total)
+
+
+  def clear(self):
+    """
+    Drop all data for all OS pids and start over with the current pid.
+    """
+    self.logger.info('entering: clear()')
+
+    self.pids        = []
+    self.time_stamps = {}
+    self.counts      = {}
+    self.lengths     = {}
+    self.pulse_count = 0
+    self._set_current_pid(self.pid, self.capacity)
+
+
+  def _buckets_from_legacy(self, pid_data):
+    """
+    Convert the cumulative, one per pulse, data points of a single OS
+    pid into per-minute buckets.
+
+    Args:
+      pid_data([])        [{'<int - epoch ts>' : <int - pulse data>}, ...]
+
+    Returns:
+      (array, array)      minute start time stamps, pulses per minute
+    """
+    time_stamps = self.array(self.type_code)
+    counts      = self.array(self.type_code)
+    previous    = 0
+    for single_pulse in pid_data:
+      for ts, cumulative in single_pulse.items():
+        ts     = int(ts)
+        minute = ts - (ts % 60)
+        pulses = int(cumulative) - previous
+        previous = int(cumulative)
+        if(len(time_stamps) and (time_stamps[-1] == minute)):
+          counts[-1] += pulses
+        else:
+          time_stamps.append(minute)
+          counts.append(pulses)
+    return(time_stamps, counts)
+
+
+  def load_pulse_data(self, pulses):
+    """
+    Load the 'pulses' section of a pulse count data structure, in
+    either the bucket or the legacy format, into the ledger, replacing
+    anything that is already held.  If the data contains the current OS
+    pid, pulse counting continues on from the last bucket recorded for
+    it.
+
+    Args:
+      pulses([])          'pulses' section of pulse count data structure
+
+    Returns:
+      True                data loaded
+      False               malformed data; ledger left empty
+    """
+    self.logger.info('entering: load_pulse_data()')
+
+    result = True
+    self.clear()
+    self.pids = []                 # keep the order found in the data
+    try:
+      for pid_data in pulses:
+        for pid in pid_data:
+          entries = pid_data[pid]
+          if(len(entries) and (type(entries[0]) == dict)):
+            time_stamps, counts = self._buckets_from_legacy(entries)
+          else:
+            time_stamps = self.array(self.type_code,
+                                     [int(entry[0]) for entry in entries])
+            counts      = self.array(self.type_code,
+                                     [int(entry[1]) for entry in entries])
+          if(pid == self.pid):
+            capacity = max(self.capacity, 2 * len(time_stamps))
+            self._set_current_pid(pid, capacity)
+            self._cur_ts[0:len(time_stamps)]   = time_stamps
+            self._cur_counts[0:len(counts)]    = counts
+            self._length = len(time_stamps)
+            self.lengths[pid] = self._length
+            if(self._length):
+              self._last_minute = time_stamps[self._length - 1]
+              self.pulse_count  = sum(counts)
+          else:
+            if(not pid in self.pids):
+              self.pids.append(pid)
+            self.time_stamps[pid] = time_stamps
+            self.counts[pid]      = counts
+            self.lengths[pid]     = len(time_stamps)
+      if(not self.pid in self.pids):
+        self.pids.append(self.pid)
+    except Exception as e:
+      result = False
+      self.logger.error(f'1 Malformed pulse data. Exception: {e}')
+      self.clear()
+    return(result)
+
+
+  def to_pulse_data(self):
+    """
+    Convert the ledger into the 'pulses' section of the pulse count
+    data structure.  OS pids without any buckets are left out.
+
+    Returns:
+      []                  'pulses' section of pulse count data structure
+    """
+    self.logger.info('entering: to_pulse_data()')
+
+    pulses = []
+    for pid in list(self.pids):
+      length = self.lengths.get(pid, 0)     # snapshot before reading
+      if(length):
+        pulses.append({pid : self.buckets(pid, 0, length)})
+    return(pulses)
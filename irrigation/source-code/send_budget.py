@@ -0,0 +1,180 @@
+"""
+Jaye Hicks 2021
+
+Obligatory legal disclaimer:
+  You are free to use this source code (this file and all other files
+  referenced in this file) "AS IS" WITHOUT WARRANTY OF ANY KIND, EITHER
+  EXPRESSED OR IMPLIED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+  THE ENTIRE RISK AS TO THE QUALITY AND PERFORMANCE OF THIS SOURCE CODE
+  IS WITH YOU.  SHOULD THE SOURCE CODE PROVE DEFECTIVE, YOU ASSUME THE
+  COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU
+  GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
+
+Objects of type send_budget() are shared by the senders of outbound
+data (gals_disp, alarms, upload_files) while they run at the same time
+(see irr_cntrl._send_outbound_data()).  It provides:
+
+  - a time budget shared by all of the senders.  Once it is spent a
+    sender stops; what it didnt send stays in its directory / mailbox
+    and is sent on a later cycle, as it is when comms are down
+  - strict priority, senders are named highest priority first (e.g.,
+    gals_disp, alarms, upload_files).  While the link is slow (i.e.,
+    the last transmission by any sender took 'slow_secs' or longer) a
+    sender waits, before each transmission, until every higher
+    priority sender has finished
+  - per sender accounting of elapsed secs, transmissions, bytes sent
+    and slowest transmission; see report()
+
+A sender calls proceed() before each transmission and note() after it.
+
+Usage:
+  >>> import send_budget
+  >>> a_budget = send_budget.send_budget(120, ['gals_disp', 'alarms'])
+  >>> a_budget.start('alarms')
+  >>> if(a_budget.proceed('alarms')):
+  ...   a_budget.note('alarms', 0.4, 312)
+  >>> a_budget.finish('alarms', True)
+  >>> a_budget.report()['alarms']
+  {'result': True, 'secs': 0.41, 'items': 1, 'bytes': 312,
+   'slowest_secs': 0.4, 'waited_secs': 0.0, 'stopped': False}
+"""
+
+class send_budget():
+  import logging
+  import threading
+  import time
+
+
+  def __init__(self, budget_secs, order, slow_secs=5.0):
+    """
+    Args:
+      budget_secs(float)   secs all senders share, from now
+      order([])            sender names, highest priority first
+      slow_secs(float)     a transmission this slow means the link is slow
+    """
+    self.logger = self.logging.getLogger(__name__)
+
+    self.logger.info('entering: __init__()')
+    self.deadline  = self.time.monotonic() + budget_secs
+    self.order     = list(order)
+    self.slow_secs = slow_secs
+    self.last_secs = 0.0         #latest transmission, any sender
+    self.running   = set()
+    self.changed   = self.threading.Condition()
+    self.senders   = {name : {'result'       : None,
+                              'started'      : None,
+                              'secs'         : 0.0,
+                              'items'        : 0,
+                              'bytes'        : 0,
+                              'slowest_secs' : 0.0,
+                              'waited_secs'  : 0.0,
+                              'stopped'      : False}
+                      for name in self.order}
+
+
+  def remaining(self):
+    """
+    Returns:
+      float        secs left in the budget; 0 once it is spent
+    """
+    return(max(0.0, self.deadline - self.time.monotonic()))
+
+
+  def start(self, name):
+    """
+    A sender is about to run.  Until it finishes, lower priority
+    senders wait on it while the link is slow.
+    """
+    self.logger.info('entering: start()')
+
+    with self.changed:
+      self.running.add(name)
+      self.senders[name]['started'] = self.time.monotonic()
+
+
+  def finish(self, name, result):
+    """
+    Args:
+      name(str)         sender
+      result            the tri-state result of the sender's send()
+    """
+    self.logger.info('entering: finish()')
+
+    with self.changed:
+      self.running.discard(name)
+      sender = self.senders[name]
+      sender['result'] = result
+      if(sender['started'] != None):
+        sender['secs'] = self.time.monotonic() - sender['started']
+      self.changed.notify_all()
+
+
+  def _waiting_on(self, name):
+    """
+    Call holding 'changed'.
+
+    Returns:
+      bool         a higher priority sender is running and the link is
+                     slow
+    """
+    higher = self.order[:self.order.index(name)]
+    return((self.last_secs >= self.slow_secs) and
+           any((sender in self.running) for sender in higher))
+
+
+  def proceed(self, name):
+    """
+    Called by a sender before each transmission.  Waits while a higher
+    priority sender is running and the link is slow.
+
+    Returns:
+      True         go ahead with the transmission
+      False        budget spent; stop sending for this cycle
+    """
+    with self.changed:
+      started = self.time.monotonic()
+      while(self._waiting_on(name) and (self.remaining() > 0)):
+        self.changed.wait(self.remaining())
+      self.senders[name]['waited_secs'] += self.time.monotonic() - started
+      if(self.remaining() <= 0):
+        if(not self.senders[name]['stopped']):
+          self.senders[name]['stopped'] = True
+          self.logger.error(f'1 Time budget spent; {name} stopped sending')
+        return(False)
+    return(True)
+
+
+  def note(self, name, secs, num_bytes=0):
+    """
+    Called by a sender after each transmission.
+
+    Args:
+      name(str)         sender
+      secs(float)       how long the transmission took
+      num_bytes(int)    bytes sent
+    """
+    with self.changed:
+      sender = self.senders[name]
+      sender['items']        += 1
+      sender['bytes']        += num_bytes
+      sender['slowest_secs']  = max(sender['slowest_secs'], secs)
+      self.last_secs          = secs
+      self.changed.notify_all()
+
+
+  def report(self):
+    """
+    Returns:
+      {}           sender name -> result, secs, items, bytes,
+                     slowest_secs, waited_secs and stopped
+    """
+    with self.changed:
+      return({name : {'result'       : sender['result'],
+                      'secs'         : round(sender['secs'], 2),
+                      'items'        : sender['items'],
+                      'bytes'        : sender['bytes'],
+                      'slowest_secs' : round(sender['slowest_secs'], 2),
+                      'waited_secs'  : round(sender['waited_secs'], 2),
+                      'stopped'      : sender['stopped']}
+              for name, sender in self.senders.items()})
@@ -0,0 +1,251 @@
+"""
+Jaye Hicks 2021
+
+Obligatory legal disclaimer:
+  You are free to use this source code (this file and all other files
+  referenced in this file) "AS IS" WITHOUT WARRANTY OF ANY KIND, EITHER
+  EXPRESSED OR IMPLIED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+  WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+  THE ENTIRE RISK AS TO THE QUALITY AND PERFORMANCE OF THIS SOURCE CODE
+  IS WITH YOU.  SHOULD THE SOURCE CODE PROVE DEFECTIVE, YOU ASSUME THE
+  COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU
+  GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
+
+Objects of type stop_channel() provide an event driven control channel
+between the long running OS process that manages an irrigation event
+and the OS processes (i.e., executing irr_cntrl.py) that may ask it to
+shut down.  The channel is a Unix domain socket, named stop_irr.sock,
+that lives in the irr_event directory.
+
+The OS process managing the irrigation event calls listen().  A
+background thread accepts connections and, upon receiving a stop
+request, wakes the main thread that is blocked in wait().  The main
+thread closes the valves and calls valves_closed(), finishes shutting
+down the irrigation event, and then calls close().  The requesting OS
+process receives an acknowledgement at each of these two points:
+
+  requester             -> 'stop'
+  irr event OS process  <- 'closed'   (valves are closed)
+  irr event OS process  <- 'done'     (irr event shut down; files cleaned)
+
+The stop_irr.json semaphore file remains in use as a fallback for
+platforms without Unix domain sockets (e.g., win32 development) and for
+the case where the channel cannot be reached.
+
+Usage (OS process managing an irrigation event):
+  >>> import stop_channel
+  >>> channel = stop_channel.stop_channel()
+  >>> channel.listen()
+  >>> while(not channel.wait(10)):
+  >>>   ...
+  >>> ... close the valves ...
+  >>> channel.valves_closed()
+  >>> ... finish shutting down ...
+  >>> channel.close()
+
+Usage (OS process requesting a shutdown):
+  >>> import stop_channel
+  >>> stop_channel.stop_channel().request_stop()
+  True
+"""
+class stop_channel():
+  import logging
+  import socket
+  import threading
+  import time
+  from   pathlib import Path
+
+  import lv_paths
+
+
+  def __init__(self):
+    """
+    """
+    self.logger = self.logging.getLogger(__name__)
+    self.logger.info('entering: __init__()')
+
+    self.paths          = self.lv_paths.lv_paths()
+    self.socket_name    = 'stop_irr.sock'
+    self.socket_path    = None
+    self.server         = None
+    self.listener       = None
+    self.stop_requested = self.threading.Event()
+    self.closed         = self.threading.Event()
+    self.done           = self.threading.Event()
+    self.ack_wait_secs  = 120       #max time handler waits for each step
+
+    directory = self.paths.get_path('irr_event')
+    if(directory):
+      self.socket_path = directory + self.paths.divider + self.socket_name
+    else:
+      self.logger.error('1 Could not obtain directory path for irr event')
+
+
+  def _available(self):
+    """
+    Returns:
+      True           Unix domain sockets can be used on this platform
+      False          they cannot; callers fall back to semaphore file
+    """
+    return(bool(self.socket_path) and hasattr(self.socket, 'AF_UNIX'))
+
+
+  def listen(self):
+    """
+    Create the socket and start the background thread that accepts
+    stop requests.  Any socket file left behind by an OS process that
+    was taken down hard is removed first.
+
+    Returns:
+      None           channel not available on this platform
+      True           listening for stop requests
+      False          error creating the socket
+    """
+    self.logger.info('entering: listen()')
+
+    result = None
+    if(self._available()):
+      result = False
+      try:
+        stale = self.Path(self.socket_path)
+        if(stale.exists()):
+          stale.unlink()
+        self.server = self.socket.socket(self.socket.AF_UNIX,
+                                         self.socket.SOCK_STREAM)
+        self.server.bind(self.socket_path)
+        self.server.listen(1)
+        self.server.settimeout(1)     #lets the thread notice close()
+        self.listener = self.threading.Thread(target=self._accept_requests,
+                                              daemon=True)
+        self.listener.start()
+        result = True
+      except Exception as e:
+        self.logger.error(f'2 Could not create stop channel. Exception: {e}')
+        self.server = None
+    return(result)
+
+
+  def _accept_requests(self):
+    """
+    Runs in the background thread.  Handle stop requests until the
+    socket is closed.
+    """
+    self.logger.info('entering: _accept_requests()')
+
+    server = self.server
+    while(self.server and not self.done.is_set()):
+      try:
+        conn, address = server.accept()
+      except self.socket.timeout:
+        continue
+      except Exception:
+        break           #socket was closed
+      try:
+        with conn:
+          conn.settimeout(5)
+          request = conn.recv(64).decode().strip()
+          if(request == 'stop'):
+            self.logger.info('stop request received on stop channel')
+            self.stop_requested.set()
+            if(self.closed.wait(self.ack_wait_secs)):
+              conn.sendall(b'closed\n')
+              if(self.done.wait(self.ack_wait_secs)):
+                conn.sendall(b'done\n')
+                break
+          else:
+            self.logger.error(f'3 Unknown request on stop channel: {request}')
+      except Exception as e:
+        self.logger.error(f'4 Exception: {e}')
+
+
+  def wait(self, secs):
+    """
+    Block the calling thread for up to 'secs' seconds, returning early
+    if a stop request arrives.  Works whether or not listen() succeeded.
+
+    Returns:
+      True           a stop request has been received
+      False          time ran out without a stop request
+    """
+    return(self.stop_requested.wait(secs))
+
+
+  def valves_closed(self):
+    """
+    Acknowledge, to the requester, that all valves have been closed.
+    """
+    self.logger.info('entering: valves_closed()')
+    self.closed.set()
+
+
+  def close(self):
+    """
+    Acknowledge, to the requester, that the irrigation event has been
+    shut down then remove the socket.
+    """
+    self.logger.info('entering: close()')
+
+    self.closed.set()
+    self.done.set()
+    if(self.server):
+      server      = self.server
+      self.server = None
+      try:
+        if(self.stop_requested.is_set() and self.listener):
+          self.listener.join(5)   #let the requester receive 'done'
+        server.close()
+        self.Path(self.socket_path).unlink()
+      except Exception as e:
+        self.logger.error(f'5 Could not close stop channel. Exception: {e}')
+
+
+  def request_stop(self, timeout_secs=15):
+    """
+    Ask the OS process managing an irrigation event to shut down and
+    wait for it to acknowledge.
+
+    Args:
+      timeout_secs(int)    max time to wait for the shut down to finish
+
+    Returns:
+      None           no OS process is listening (or platform lacks Unix
+                       domain sockets); use the semaphore file
+      True           irr event shut down
+      False          request sent but shut down not acknowledged in time
+    """
+    self.logger.info('entering: request_stop()')
+
+    result = None
+    if(self._available() and self.Path(self.socket_path).exists()):
+      client = self.socket.socket(self.socket.AF_UNIX, self.socket.SOCK_STREAM)
+      try:
+        client.settimeout(timeout_secs)
+        client.connect(self.socket_path)
+        result = False
+      except Exception as e:
+        self.logger.info(f'stop channel not reachable: {e}')
+        client.close()
+
+      if(result == False):
+        replies  = ''
+        deadline = self.time.monotonic() + timeout_secs
+        try:
+          with client:
+            client.sendall(b'stop\n')
+            while(not 'done' in replies):
+              client.settimeout(max(deadline - self.time.monotonic(), 0.01))
+              data = client.recv(64)
+              if(not data):
+                break
+              replies += data.decode()
+        except Exception as e:
+          self.logger.error(f'6 No acknowledgement on stop channel. ' +
+                            f'Exception: {e}')
+        if('done' in replies):
+          result = True
+        elif('closed' in replies):
+          self.logger.error('7 Valves closed but irr event did not finish ' +
+                            'shutting down in time')
+        else:
+          self.logger.error('8 Stop request not acknowledged')
+    return(result)
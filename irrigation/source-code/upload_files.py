@@ -13,7 +13,7 @@ Obligatory legal disclaimer:
   COST OF ALL NECESSARY SERVICING, REPAIR OR CORRECTION. See the GNU 
   GENERAL PUBLIC LICENSE Version 3, 29 June 2007 for more details.
 
-NOTE: the identifier 'boto3' is overidden in the upload_files()
+NOTE: the boto3 session is created on first use; see upload_files._session()
 
 The majority of data transmitted to the AWS backend routes through
 the PI 4 file system.  Some are passed in through the an API Gwy API
@@ -40,26 +40,33 @@ enables the detection of troublesome files that resist processing
 and / or upload beyond a certain amount of time (i.e., threshold for
 processing / uploading).
 
-NOTE: the identifier 'boto3' is overidden in the class upload_files()
+NOTE: the boto3 session is created on first use; see upload_files._session()
 
 """
 class upload_files():
   import logging
-  import boto3
-  import boto3.session
-  from   botocore.exceptions import EndpointConnectionError
-  from   botocore.exceptions import ClientError
+  import time
   from   pathlib             import Path
   import lv_paths
 
+  import lazy_import    #heavy SDKs are imported on first use
+  boto3                   = lazy_import.lazy_import('boto3')
+  EndpointConnectionError = lazy_import.lazy_import('botocore.exceptions',
+                                                    'EndpointConnectionError')
+  ClientError             = lazy_import.lazy_import('botocore.exceptions',
+                                                    'ClientError')
+
 
   def __init__(self):
     """
-    NOTE: identifier 'boto3' overidden to refer to a boto3 session
+    NOTE: the boto3 session is created on first use; see _session()
     """
     self.logger = self.logging.getLogger(__name__)
 
     self.logger.info('entering: __init__()')
+    self.session = None      #boto3 session; see _session()
+    self.s3      = {}        #S3 client / resource; see _s3()
+    self.budget  = None      #shared time budget; see send()
     self.env     = 'debug'   #set to 'debug' or 'prod'
     self.paths   = self.lv_paths.lv_paths()
 
@@ -68,23 +75,17 @@ class upload_files():
                      'comms'   : 'lv-irr-man-bad-comms',
                      'orphans' : 'lv-irr-man-orphans',
                      'region'  : 'us-east-1'}
-      #overide identifier 'boto3' (session using IAM credentials below)
-      try:
-        self.boto3 = self.boto3.Session(
-          aws_access_key_id     = '1234567890123456789012', 
-          aws_secret_access_key = '12345678901234567890123456789012345678901',
-          region_name           = self.config['region'])
-      except Exception as e:
-        self.logger.error(f'1 Couldnt create boto3 session.  Exception: {e}')
+      #session using IAM credentials below
+      self.session_args = {
+        'aws_access_key_id'     : '1234567890123456789012',
+        'aws_secret_access_key' : '12345678901234567890123456789012345678901',
+        'region_name'           : self.config['region']}
     else: 
       self.config = {'corrupt' : 'lv-irr-man-corrupt-files',
                      'comms'   : 'lv-irr-man-bad-comms',
                      'region'  : 'us-east-1'}
-      #overide identifier 'boto3' (session using AWS CLI default profile)
-      try:
-        self.boto3 = self.boto3.session.Session()
-      except Exception as e:
-        self.logger.error(f'2 Couldnt create boto3 session. Exception: {e}')
+      #session using AWS CLI default profile
+      self.session_args = {}
 
     self._reset_status()
 
@@ -101,6 +102,66 @@ class upload_files():
     self.clean_bad  = []     # failed to delete these listed files
 
 
+  def _session(self):
+    """
+    The boto3 session, created on first use.  Creating it imports boto3
+    so it is not done in __init__(); most cron cycles never call AWS.
+
+    Returns:
+      None        boto3 session could not be created
+      session     boto3 session
+    """
+    self.logger.info('entering: _session()')
+
+    if(self.session == None):
+      if(self.session_args):
+        try:
+          self.session = self.boto3.Session(**self.session_args)
+        except Exception as e:
+          self.logger.error(f'1 Couldnt create boto3 session. ' +
+                            f'Exception: {e}')
+      else:
+        try:
+          self.session = self.boto3.session.Session()
+        except Exception as e:
+          self.logger.error(f'2 Couldnt create boto3 session. ' +
+                            f'Exception: {e}')
+    return(self.session)
+
+
+  def _s3(self, kind):
+    """
+    The S3 client or resource; created on first use and kept, with its
+    connection pool, for as long as this object lives (see
+    irr_cntrl.supervise()).
+
+    Args:
+      kind(str)      'client' or 'resource'
+    """
+    self.logger.info('entering: _s3()')
+
+    if(not kind in self.s3):
+      self.s3[kind] = getattr(self._session(), kind)('s3')
+    return(self.s3[kind])
+
+
+  def _proceed(self):
+    """
+    Returns:
+      True      go ahead with the next transmission
+      False     the shared time budget is spent (see send_budget.py)
+    """
+    return((self.budget == None) or self.budget.proceed('upload_files'))
+
+
+  def _note(self, secs, num_bytes):
+    """
+    Account for a transmission against the shared time budget
+    """
+    if(self.budget):
+      self.budget.note('upload_files', secs, num_bytes)
+
+
   def good_trans_cnt(self):
     self.logger.info('entering: good_trans_cnt()')    
     return(len(self.trans_good))
@@ -142,7 +203,7 @@ class upload_files():
 
     result = None
     try:
-      s3_access = self.boto3.client('s3')
+      s3_access = self._s3('client')
       s3_access.head_bucket(Bucket=bucket)
       result = True 
     except self.ClientError as e:
@@ -183,7 +244,7 @@ class upload_files():
     
     try:
       with path.open('rb') as file_contents:
-        s3_access  = self.boto3.resource('s3')
+        s3_access  = self._s3('resource')
         the_bucket = s3_access.Bucket(bucket)
         the_object = the_bucket.put_object(Key=name, Body=file_contents)
         the_object.wait_until_exists()   
@@ -217,9 +278,15 @@ class upload_files():
       bucket.strip()
       try:
         if(path.exists() and path.is_dir()):
-          for file in path.iterdir():
-            file_name = file.name
-            result = self._upload_file_to_s3(bucket, file)
+          for file_name in self.paths.files(str(path)):
+            if(not self._proceed()):
+              break
+            file = self.Path(path, file_name)
+            started   = self.time.monotonic()
+            result    = self._upload_file_to_s3(bucket, file)
+            if(result != None):
+              self._note(self.time.monotonic() - started,
+                         file.stat().st_size if(result) else 0)
             if(result):
               self.trans_good.append(file_name)
               try:
@@ -242,12 +309,17 @@ class upload_files():
       self.logger.error('10 Bad argument(s) passed to _upload_and_clean_up()')
 
 
-  def send(self):
+  def send(self, budget=None):
     """
     Attempt the transfer of all files requiring transfer to special
     purpose S3 buckets for future forensic analysis.  At present two
     categories of files are uploaded to special S3 buckets
 
+    Args:
+      budget(send_budget)  time budget shared with other senders; files
+                             not uploaded before it is spent are left
+                             for the next call
+
     Returns:
       None            something went wrong before transfer attempt
                         or nothing to transfer
@@ -257,6 +329,7 @@ class upload_files():
     self.logger.info('entering: send()')
 
     self._reset_status()
+    self.budget   = budget
     corrupt_path  = self.paths.get_path('corrupt_files')
     bad_path      = self.paths.get_path('bad_comms')
     orphans_path  = self.paths.get_path('orphans')